@@ -0,0 +1,245 @@
+"""
+回复验证用的多模式答案匹配
+
+把多个预期答案的规则一次编译成匹配引擎：
+  - exact:   归一化后（全角转半角、忽略大小写）的子串，所有子串编入同一个Aho-Corasick自动机
+  - numbers: 数值相等（"38,069.250" 与 "38069.25" 视为相同），文本中的数字一次提取后查表
+  - regex:   正则表达式，只对尚未满足的预期执行
+  - exclude: 排除子串（如模型名称、问题本身），包含任一排除子串的文本不能满足该预期；
+             排除子串与 exact 共用同一个自动机，一次扫描同时得到命中和排除
+
+每条文本只扫描一次，轮询时只处理新出现的文本，已满足的预期不再参与匹配，
+因此预期数量和轮询频率增加时匹配开销基本不变。
+
+用法:
+    matcher = AnswerMatcher([Expectation("answer", numbers=["38069.25"], exclude=["Deepseek", "123"])])
+    while not matcher.done:
+        matcher.scan(current_texts)
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import unicodedata
+from collections import deque
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+# 数字之间的千分位逗号
+THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、统一大小写并去掉千分位分隔符"""
+    return THOUSANDS_RE.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+
+def canonical_number(value: str) -> Optional[str]:
+    """数值的规范形式（去掉多余的0），无法解析时返回None"""
+    try:
+        d = Decimal(normalize_text(str(value)))
+    except InvalidOperation:
+        return None
+    if not d.is_finite():
+        return None
+    s = format(d.normalize(), "f")
+    return "0" if s in ("-0", "0") else s
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式子串匹配自动机"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, key: int):
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append(key)
+        self._built = False
+
+    def build(self):
+        """计算失败指针，并把失败链上的输出合并到每个状态"""
+        todo = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            todo.append(nxt)
+        while todo:
+            state = todo.popleft()
+            for ch, nxt in self._goto[state].items():
+                todo.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find(self, text: str) -> set:
+        """返回text中出现的所有模式的key"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class Expectation:
+    """一个预期答案：任一正向规则命中、且文本不含排除子串即视为满足"""
+
+    def __init__(self, key: str, exact: Iterable[str] = (), numbers: Iterable[str] = (),
+                 regex: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.key = key
+        self.exact = list(exact)
+        self.numbers = list(numbers)
+        self.regex = list(regex)
+        self.exclude = list(exclude)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Expectation":
+        """从题库条目创建：{"key": ..., "exact": [...], "numbers": [...], "regex": [...], "exclude": [...]}"""
+        return cls(data["key"], data.get("exact", ()), data.get("numbers", ()),
+                   data.get("regex", ()), data.get("exclude", ()))
+
+
+def expect_answer(key: str, answer: str, exclude: Iterable[str] = ()) -> Expectation:
+    """按预期答案的形式创建预期：可解析为数值的按数值匹配，否则按子串匹配"""
+    if canonical_number(answer) is not None:
+        return Expectation(key, numbers=[answer], exclude=exclude)
+    return Expectation(key, exact=[answer], exclude=exclude)
+
+
+class AnswerMatcher:
+    """编译后的多预期答案匹配引擎，增量处理新出现的文本"""
+
+    def __init__(self, expectations: List[Expectation]):
+        self.expectations = {e.key: e for e in expectations}
+        self._automaton = AhoCorasick()
+        self._patterns: List[Tuple[str, bool]] = []     # 模式序号 -> (预期key, 是否为排除子串)
+        self._numbers: Dict[str, List[str]] = {}        # 规范数值 -> 预期key列表
+        self._regex: Dict[str, List] = {}               # 预期key -> 已编译的正则
+
+        for e in expectations:
+            for pattern in e.exact:
+                self._add_pattern(e.key, normalize_text(pattern), False)
+            for pattern in e.exclude:
+                self._add_pattern(e.key, normalize_text(pattern), True)
+            for value in e.numbers:
+                number = canonical_number(value)
+                if number is None:
+                    raise ValueError(f"预期 {e.key} 的数值无法解析: {value}")
+                self._numbers.setdefault(number, []).append(e.key)
+            if e.regex:
+                self._regex[e.key] = [re.compile(p, re.IGNORECASE) for p in e.regex]
+        self._automaton.build()
+
+        self.matched: Dict[str, str] = {}   # 预期key -> 满足该预期的原始文本
+        self._seen = set()
+        self.scanned = 0                    # 实际扫描过的文本数
+
+    def _add_pattern(self, key: str, pattern: str, exclusion: bool):
+        self._automaton.add(pattern, len(self._patterns))
+        self._patterns.append((key, exclusion))
+
+    @property
+    def pending(self) -> List[str]:
+        return [k for k in self.expectations if k not in self.matched]
+
+    @property
+    def done(self) -> bool:
+        return len(self.matched) == len(self.expectations)
+
+    def match_text(self, text: str) -> List[str]:
+        """返回该文本满足的预期key（不记录状态）"""
+        norm = normalize_text(text)
+        hits = self._automaton.find(norm)
+        candidates, excluded = set(), set()
+        for idx in hits:
+            key, exclusion = self._patterns[idx]
+            (excluded if exclusion else candidates).add(key)
+        if self._numbers:
+            for token in NUMBER_RE.findall(norm):
+                keys = self._numbers.get(canonical_number(token))
+                if keys:
+                    candidates.update(keys)
+        for key, patterns in self._regex.items():
+            if key not in candidates and key not in excluded and key not in self.matched:
+                if any(p.search(norm) or p.search(text) for p in patterns):
+                    candidates.add(key)
+        return [k for k in candidates if k not in excluded]
+
+    def scan(self, texts: Iterable[str]) -> Dict[str, str]:
+        """处理一批文本中新出现的部分，返回本次新满足的预期 {key: 文本}"""
+        newly = {}
+        for text in texts:
+            if not text or text in self._seen:
+                continue
+            self._seen.add(text)
+            self.scanned += 1
+            for key in self.match_text(text):
+                if key not in self.matched:
+                    self.matched[key] = text
+                    newly[key] = text
+        return newly
+
+    def reset(self):
+        """清空匹配状态和已见文本（编译结果保留）"""
+        self.matched.clear()
+        self._seen.clear()
+        self.scanned = 0
+
+
+def main(argv=None):
+    """命令行入口：匹配性能自测"""
+    parser = argparse.ArgumentParser(description="多模式答案匹配性能自测")
+    parser.add_argument("--expectations", type=int, default=1000, help="预期答案数量")
+    parser.add_argument("--texts", type=int, default=200, help="每轮文本数量")
+    parser.add_argument("--polls", type=int, default=100, help="轮询次数")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    words = ["长城", "历史", "答案", "结果", "计算", "deepseek", "模型", "回复"]
+    expectations = [Expectation(f"e{i}", exact=[f"{rng.choice(words)}{i}"], numbers=[str(i * 1.25)],
+                                exclude=["Deepseek"]) for i in range(args.expectations)]
+    start = time.perf_counter()
+    matcher = AnswerMatcher(expectations)
+    compile_time = time.perf_counter() - start
+
+    texts = [f"{rng.choice(words)}{rng.randrange(args.expectations * 2)} 结果为 {rng.randrange(10 ** 6):,}.5"
+             for _ in range(args.texts)]
+    start = time.perf_counter()
+    for i in range(args.polls):
+        # 每轮出现少量新文本，其余与上一轮相同
+        matcher.scan(texts[: args.texts // 2 + i % (args.texts // 2)])
+    elapsed = time.perf_counter() - start
+    print(f"编译 {args.expectations} 个预期: {compile_time * 1000:.1f}ms")
+    print(f"{args.polls} 次轮询共扫描 {matcher.scanned} 条新文本，总耗时 {elapsed * 1000:.1f}ms，"
+          f"平均每次轮询 {elapsed / args.polls * 1000:.3f}ms，满足 {len(matcher.matched)} 个预期")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
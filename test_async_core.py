@@ -0,0 +1,157 @@
+"""
+基于asyncio的测试编排核心
+
+所有阻塞的UIA调用都在运行器的专用UIA线程（runner.uia）中顺序执行，保证COM对象始终在
+同一线程中使用；事件循环负责调度测试和后台活动（轮询、资源采样、截图、日志刷新等），
+等待应用回复时其他活动可以同时进行。测试结束或出错时，后台活动统一取消（结构化取消）。
+
+测试可以写成协程 `async def test_xxx(core) -> bool`，也可以是原有的同步方法，
+同步测试经过 runner.run_test 的重试和截止时间逻辑，同样在UIA线程中执行。
+"""
+
+import asyncio
+import contextlib
+import functools
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+
+
+def _init_uia_thread():
+    """UIA线程初始化：为该线程初始化COM（pywinauto的UIA后端依赖comtypes）"""
+    try:
+        import comtypes
+        comtypes.CoInitializeEx()
+    except Exception:
+        pass
+
+
+class AsyncTestCore:
+    """asyncio测试编排核心"""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.logger = runner.logger
+        self.uia_executor = runner.uia
+        # 运行 run_test 的重试循环的线程，不能占用UIA线程
+        self.control_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-control")
+        # 后台活动按作用域分组，作用域结束时取消其中的所有活动
+        self._scopes: List[List[asyncio.Task]] = [[]]
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        """在UIA线程中执行阻塞调用"""
+        return await self.loop.run_in_executor(self.uia_executor, functools.partial(fn, *args, **kwargs))
+
+    async def io(self, fn: Callable, *args, **kwargs):
+        """在默认线程池中执行与UIA无关的阻塞调用（文件读写、进程采样等）"""
+        return await self.loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    async def poll_until(self, predicate: Callable[[], object], timeout: float, interval: float = 0.5,
+                         on_uia: bool = True):
+        """周期性检查predicate直到返回真值或超时，等待期间让出事件循环；超时返回None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                value = await (self.call(predicate) if on_uia else self.io(predicate))
+                if value:
+                    return value
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.debug(f"轮询检查出错: {e}")
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+    def background(self, coro: Awaitable, name: str = "") -> asyncio.Task:
+        """启动后台活动，所在作用域（默认为整个会话）结束时自动取消"""
+        task = self.loop.create_task(coro)
+        task.activity_name = name or getattr(coro, "__name__", "background")
+        self._scopes[-1].append(task)
+        return task
+
+    @contextlib.asynccontextmanager
+    async def scope(self):
+        """后台活动作用域：async with core.scope(): 内启动的活动在退出时取消"""
+        self._scopes.append([])
+        try:
+            yield self
+        finally:
+            await self._cancel(self._scopes.pop())
+
+    def periodic(self, interval: float, fn: Callable, name: str = "", on_uia: bool = False) -> asyncio.Task:
+        """按固定间隔执行fn的后台活动，单次出错只记录日志不中断"""
+        async def _run():
+            next_at = self.loop.time()
+            while True:
+                try:
+                    await (self.call(fn) if on_uia else self.io(fn))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"后台活动 {name or fn.__name__} 出错: {e}")
+                next_at = max(next_at + interval, self.loop.time())
+                await asyncio.sleep(next_at - self.loop.time())
+        return self.background(_run(), name or getattr(fn, "__name__", "periodic"))
+
+    async def _cancel(self, tasks: List[asyncio.Task]):
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"后台活动 {task.activity_name} 异常结束: {e}")
+
+    async def run_one(self, test) -> bool:
+        """运行单个测试：协程测试在事件循环中执行，同步测试在UIA线程中执行，均经过重试逻辑"""
+        if inspect.iscoroutinefunction(test):
+            from test_time_budget import StepTimeout
+            loop = self.loop
+            config = self.runner.config
+            timeout = config.test_timeouts.get(test.__name__, config.test_timeout)
+
+            async def guarded():
+                # 协程测试超时时直接取消（其作用域内的后台活动随之取消），正在执行的UIA调用通过结束应用中止
+                try:
+                    return await asyncio.wait_for(test(self), timeout)
+                except asyncio.TimeoutError:
+                    await self.io(self.runner.recover_after_timeout)
+                    raise StepTimeout(f"{test.__name__} 超过 {timeout:g} 秒未完成，已取消")
+
+            @functools.wraps(test)
+            def shim():
+                return asyncio.run_coroutine_threadsafe(guarded(), loop).result()
+
+            shim.manages_deadline = True
+            # 外壳只等待事件循环中的协程，不能占用UIA线程（协程中的UIA调用要在那里执行）
+            return await loop.run_in_executor(self.control_executor,
+                                              functools.partial(self.runner.run_test, shim, _on_uia=False))
+        return await self.loop.run_in_executor(self.control_executor, self.runner.run_test, test)
+
+    async def run_tests(self, tests: List, stop_on_failure: bool = False) -> List[bool]:
+        """依次运行测试，后台活动在整个会话期间并发执行，结束时统一取消"""
+        self.loop = asyncio.get_running_loop()
+        results = []
+        try:
+            if self.runner.config.async_journal_flush_interval:
+                self.periodic(self.runner.config.async_journal_flush_interval, self.runner.journal.flush,
+                              name="journal-flush")
+            for test in tests:
+                passed = await self.run_one(test)
+                results.append(passed)
+                if stop_on_failure and not passed:
+                    break
+        finally:
+            await self._cancel(self._scopes[0])
+            self._scopes = [[]]
+            self.runner.journal.flush(fsync=True)
+        return results
+
+    def shutdown(self):
+        # UIA线程属于运行器，会话结束后继续使用
+        self.control_executor.shutdown(wait=False)
@@ -0,0 +1,310 @@
+"""
+常驻自动化服务
+
+每次单独运行测试脚本都要重新导入pywinauto、初始化日志并在全桌面搜索应用窗口。
+常驻服务只做一次这些工作：服务进程持有测试运行器（导入的后端、应用连接和窗口句柄缓存），
+客户端通过本地TCP连接发送请求，测试结果逐条推送回客户端，重复的短时运行无需再付出启动开销。
+请求按到达顺序在一个控制线程中依次处理，界面操作都在运行器的UIA线程（runner.uia）中执行。
+
+每个请求都要带令牌：服务端使用环境变量 SUXIAOBAN_DAEMON_TOKEN，未设置时启动时生成一个随机令牌
+写入 test_logs/daemon.token（仅当前用户可读），本机客户端自动读取。
+
+协议为每行一个JSON对象（NDJSON）：
+  请求: {"id": 1, "op": "run", "tests": ["test_ai_chat"], "token": "..."}
+        op 还可以是 ping / list / step（调用 STEP_METHODS 中的运行器方法）/ reset（丢弃缓存的连接）/ shutdown
+  推送: {"id": 1, "event": "result", "result": {...}}   每条测试结果
+        {"id": 1, "event": "done", "passed": true, "total": 1, "failed": 0, "elapsed": 12.3}
+        {"id": 1, "event": "error", "message": "..."}
+
+用法:
+    python test_automation_daemon.py serve [--port 8765]
+    python test_automation_daemon.py run test_ui_elements test_ai_chat
+    python test_automation_daemon.py ping | list | reset | shutdown
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import secrets
+import argparse
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+DEFAULT_PORT = 8765
+TOKEN_ENV = "SUXIAOBAN_DAEMON_TOKEN"
+TOKEN_FILE = Path(__file__).resolve().parent / "test_logs" / "daemon.token"
+
+# step 请求可以调用的运行器方法（只操作被测应用或读取状态，不执行安装包等外部程序）
+STEP_METHODS = frozenset({
+    "launch_application",
+    "reconnect_application",
+    "reset_connection",
+    "calibrate_timing",
+    "find_app_executable",
+    "find_installed_app_path",
+    "app_fingerprint",
+})
+
+
+def load_token() -> Optional[str]:
+    """客户端使用的令牌：环境变量优先，其次服务启动时写出的令牌文件"""
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        return token
+    try:
+        return TOKEN_FILE.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def create_token_file() -> str:
+    """生成随机令牌并写入令牌文件（仅当前用户可读写）"""
+    token = secrets.token_hex(16)
+    TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def send_message(wfile, message: Dict):
+    """写出一条NDJSON消息"""
+    wfile.write((json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+    wfile.flush()
+
+
+def read_messages(rfile) -> Iterator[Dict]:
+    """逐条读取NDJSON消息直到连接关闭，无法解析的行抛出ValueError"""
+    for line in rfile:
+        line = line.strip()
+        if line:
+            yield json.loads(line.decode("utf-8"))
+
+
+class AutomationDaemon:
+    """常驻自动化服务：请求在一个控制线程中依次处理，界面操作在运行器的UIA线程中执行"""
+
+    def __init__(self, runner_factory: Callable[[], object], host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None):
+        if not token:
+            raise ValueError(f"常驻服务需要令牌（设置环境变量 {TOKEN_ENV}）")
+        self.token = token
+        self.started_at = time.time()
+        # 请求按到达顺序执行；run_test 和 step 再把界面操作交给 runner.uia
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="daemon-control")
+        self.runner = self.executor.submit(runner_factory).result()
+        self.logger = self.runner.logger
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon._serve_connection(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def serve_forever(self):
+        host, port = self.address
+        self.logger.info(f"常驻自动化服务已启动: {host}:{port}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.executor.shutdown(wait=False)
+
+    def shutdown(self):
+        # serve_forever 所在线程之外调用
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def _serve_connection(self, rfile, wfile):
+        lock = threading.Lock()
+
+        def reply(message: Dict):
+            with lock:
+                send_message(wfile, message)
+
+        try:
+            for request in read_messages(rfile):
+                request_id = request.get("id")
+                if request.get("token") != self.token:
+                    reply({"id": request_id, "event": "error", "message": "token无效"})
+                    continue
+                try:
+                    self._handle(request, reply)
+                except Exception as e:
+                    reply({"id": request_id, "event": "error", "message": f"{type(e).__name__}: {e}"})
+        except (ValueError, ConnectionError, OSError) as e:
+            self.logger.warning(f"客户端连接异常结束: {e}")
+
+    def _tests(self) -> List[str]:
+        return sorted(n for n in dir(self.runner) if n.startswith("test_") and callable(getattr(self.runner, n)))
+
+    def _handle(self, request: Dict, reply: Callable[[Dict], None]):
+        op = request.get("op")
+        request_id = request.get("id")
+        if op == "ping":
+            reply({"id": request_id, "event": "pong", "uptime": round(time.time() - self.started_at, 3),
+                   "pid": os.getpid()})
+        elif op == "list":
+            reply({"id": request_id, "event": "tests", "tests": self._tests()})
+        elif op == "run":
+            self._run(request_id, request.get("tests") or [], reply)
+        elif op == "step":
+            name = request.get("method", "")
+            if name not in STEP_METHODS or not callable(getattr(self.runner, name, None)):
+                raise ValueError(f"不支持的方法: {name}（可用: {', '.join(sorted(STEP_METHODS))}）")
+            started = time.perf_counter()
+            method = getattr(self.runner, name)
+            value = self.executor.submit(self.runner.uia.call, method, *request.get("args", [])).result()
+            reply({"id": request_id, "event": "done", "value": value,
+                   "elapsed": round(time.perf_counter() - started, 3)})
+        elif op == "reset":
+            if hasattr(self.runner, "reset_connection"):
+                self.executor.submit(self.runner.reset_connection).result()
+            reply({"id": request_id, "event": "done"})
+        elif op == "shutdown":
+            reply({"id": request_id, "event": "done"})
+            self.shutdown()
+        else:
+            raise ValueError(f"未知请求: {op}")
+
+    def _run(self, request_id, names: List[str], reply: Callable[[Dict], None]):
+        unknown = [n for n in names if n not in self._tests()]
+        if unknown:
+            raise ValueError(f"未知测试: {', '.join(unknown)}")
+
+        results = []
+
+        def listener(result: Dict):
+            results.append(result)
+            reply({"id": request_id, "event": "result", "result": result})
+
+        def job():
+            self.runner.result_listeners.append(listener)
+            try:
+                for name in names:
+                    self.runner.run_test(getattr(self.runner, name))
+            finally:
+                self.runner.result_listeners.remove(listener)
+                self.runner.journal.flush()
+
+        started = time.perf_counter()
+        self.executor.submit(job).result()
+        final = [r for r in results if not r.get("retried") and not r.get("skipped")]
+        failed = sum(1 for r in final if not r["passed"] and not r.get("quarantined"))
+        reply({"id": request_id, "event": "done", "passed": failed == 0, "total": len(final), "failed": failed,
+               "elapsed": round(time.perf_counter() - started, 3)})
+
+
+class DaemonClient:
+    """常驻服务客户端（只依赖标准库，启动开销在毫秒级）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, token: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        self.sock = socket.create_connection((host, port), timeout=5)
+        self.sock.settimeout(timeout)
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+        self.token = token
+        self._next_id = 0
+
+    def request(self, op: str, **fields) -> Iterator[Dict]:
+        """发送请求并逐条返回该请求的推送消息，直到 done 或 error"""
+        self._next_id += 1
+        message = {"id": self._next_id, "op": op, **fields}
+        if self.token:
+            message["token"] = self.token
+        send_message(self.wfile, message)
+        for reply in read_messages(self.rfile):
+            if reply.get("id") != self._next_id:
+                continue
+            yield reply
+            if reply.get("event") in ("done", "error", "pong", "tests"):
+                return
+        raise ConnectionError("服务已关闭连接")
+
+    def close(self):
+        for f in (self.rfile, self.wfile):
+            f.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _default_runner():
+    """按平台创建测试套件运行器（服务进程中只创建一次）"""
+    from test_suxiaoban import TestConfig
+    from test_suxiaoban_suite import SuxiaobanTestSuite, CrossPlatformTestSuite
+
+    config = TestConfig()
+    return SuxiaobanTestSuite(config) if config.platform == "Windows" else CrossPlatformTestSuite(config)
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="灵犀·晓伴常驻自动化服务")
+    parser.add_argument("command", choices=("serve", "run", "ping", "list", "reset", "shutdown"))
+    parser.add_argument("tests", nargs="*", help="run 命令要执行的测试方法名")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    token = os.environ.get(TOKEN_ENV)
+
+    if args.command == "serve":
+        if not token:
+            token = create_token_file()
+            print(f"未设置 {TOKEN_ENV}，已生成令牌: {TOKEN_FILE}")
+        AutomationDaemon(_default_runner, host=args.host, port=args.port, token=token).serve_forever()
+        return 0
+
+    token = load_token()
+    started = time.perf_counter()
+    try:
+        client = DaemonClient(args.host, args.port, token=token)
+    except OSError as e:
+        print(f"无法连接常驻服务 {args.host}:{args.port}: {e}（请先运行 serve）")
+        return 2
+
+    exit_code = 0
+    with client:
+        fields = {"tests": args.tests} if args.command == "run" else {}
+        for reply in client.request(args.command, **fields):
+            event = reply.get("event")
+            if event == "result":
+                r = reply["result"]
+                status = "PASS" if r["passed"] else ("RETRY" if r.get("retried") else
+                                                     "SKIP" if r.get("skipped") else "FAIL")
+                print(f"[{status}] {r['name']}: {r.get('message', '')} ({r.get('duration', 0):.2f}s)")
+            elif event == "error":
+                print(f"错误: {reply['message']}")
+                exit_code = 1
+            elif event == "done" and args.command == "run":
+                print(f"完成: {reply['total']} 个结果, 失败 {reply['failed']}, 服务端耗时 {reply['elapsed']:.2f}s")
+                exit_code = 0 if reply["passed"] else 1
+            elif event == "pong":
+                print(f"服务运行中 (PID {reply['pid']}, 已运行 {reply['uptime']:.0f}s), "
+                      f"往返 {(time.perf_counter() - started) * 1000:.1f}ms")
+            elif event == "tests":
+                print("\n".join(reply["tests"]))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,672 @@
+"""
+分布式执行：协调器 + 多台测试机上的工作进程
+
+协调器维护测试任务队列，工作进程（包装 WindowsTestRunner / CrossPlatformTestRunner 的测试套件）
+通过TCP连接领取任务，测试结果和截图等附件逐条推送回协调器，全部完成后合并为一份报告。
+  - 任务分配：工作进程加入时，未分配的任务按历史耗时（从长到短）分到各工作进程的本地队列，
+    工作进程只能领取自己支持的测试（Windows和其他平台的测试套件不同）；
+    本地队列为空时从任务最多的其他工作进程队列末尾"窃取"任务，后加入或较快的机器自动分担
+  - 心跳：工作进程在后台线程定期发送心跳，超过 heartbeat_timeout 没有心跳或连接断开时判定失联，
+    正在运行的和排队中的任务重新入队；同一任务最多尝试 max_attempts 次，之后记为失败
+  - 失联后才送达的结果（工作进程其实还活着）会被丢弃，每个任务只采用一次执行的结果
+  - 超过 worker_wait_timeout 仍没有任何在线工作进程支持的任务记为失败，不会无限等待
+  - 工作进程名称只能由字母、数字和 . _ - 组成（附件按名称分目录保存）；没有令牌时只允许监听本机回环地址
+
+协议与常驻服务相同（每行一个JSON对象，见 test_automation_daemon）：
+  工作进程 -> 协调器: hello / pull / heartbeat / result / artifact / done
+  协调器 -> 工作进程: welcome / job / wait / finished / error
+
+用法:
+    python test_distributed.py coordinate --tests test_ui_elements,test_ai_chat [--port 8766]
+    python test_distributed.py coordinate --tags basic                # 按标签选出任务
+    python test_distributed.py work --host 192.168.1.10 [--name vm-01]  # 在每台测试机上运行
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import socket
+import ipaddress
+import logging
+import argparse
+import platform
+import threading
+import socketserver
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from test_automation_daemon import TOKEN_ENV, read_messages, send_message
+
+DEFAULT_COORDINATOR_PORT = 8766
+MAX_ARTIFACT_BYTES = 20 * 1024 * 1024
+ARTIFACT_FIELDS = ("screenshot",)   # 结果中引用运行目录内文件的字段，文件随结果一起传回
+WORKER_NAME = re.compile(r"[A-Za-z0-9._-]+")
+
+
+def valid_worker_name(name: str) -> bool:
+    """工作进程名称用作附件目录名，只允许字母、数字和 . _ -（不能是 . 或 ..）"""
+    return bool(WORKER_NAME.fullmatch(name)) and name not in (".", "..")
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Job:
+    """一个测试任务（一个测试方法）"""
+
+    def __init__(self, job_id: int, test: str, estimate: float = 0.0):
+        self.id = job_id
+        self.test = test
+        self.estimate = estimate
+        self.state = "queued"         # queued / running / done
+        self.worker = None            # 当前持有该任务（排队或运行中）的工作进程
+        self.attempts = 0
+        self.results: List[Dict] = []
+        self.passed = None
+
+    def to_dict(self) -> Dict:
+        return {"id": self.id, "test": self.test, "state": self.state, "worker": self.worker,
+                "attempts": self.attempts, "passed": self.passed}
+
+
+class WorkerState:
+    """协调器一侧记录的工作进程状态"""
+
+    def __init__(self, name: str, host: str, tests: Iterable[str], reply):
+        self.name = name
+        self.host = host
+        self.tests = set(tests)
+        self.reply = reply
+        self.queue = deque()          # 已分配但还未开始的任务ID
+        self.running = None           # 正在运行的任务ID
+        self.last_seen = time.monotonic()
+        self.alive = True
+        self.completed = 0
+        self.stolen = 0               # 从其他工作进程队列中窃取的任务数
+
+    def load(self, jobs: Dict[int, Job]) -> float:
+        return sum(jobs[j].estimate for j in self.queue)
+
+
+class Coordinator:
+    """任务协调器：分配任务、跟踪心跳、重新分配失联工作进程的任务、合并结果"""
+
+    def __init__(self, tests: Iterable[str], host: str = "0.0.0.0", port: int = DEFAULT_COORDINATOR_PORT,
+                 token: Optional[str] = None, estimates: Optional[Dict[str, float]] = None,
+                 heartbeat_interval: float = 5.0, heartbeat_timeout: float = 30.0, max_attempts: int = 2,
+                 output_dir: Optional[Path] = None, default_estimate: float = 60.0,
+                 worker_wait_timeout: float = 300.0, logger=None):
+        if not token and not is_loopback(host):
+            raise ValueError(f"监听非回环地址 {host} 时必须设置令牌（环境变量 {TOKEN_ENV}）")
+        estimates = estimates or {}
+        self.jobs: Dict[int, Job] = {i: Job(i, t, estimates.get(t, default_estimate))
+                                     for i, t in enumerate(tests, 1)}
+        self.pending = deque(self.jobs)     # 还未分配给任何工作进程的任务
+        self.workers: Dict[str, WorkerState] = {}
+        self.token = token
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.worker_wait_timeout = worker_wait_timeout  # 任务等待可执行它的工作进程的最长时间
+        self._unassignable_since = None
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.logger = logger or logging.getLogger(__name__)
+        self.started_at = time.time()
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._serve_connection(self.rfile, self.wfile, self.client_address[0])
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    # ---- 运行控制 ----
+
+    def start(self):
+        """在后台线程中接受连接并监控心跳"""
+        threading.Thread(target=self.server.serve_forever, name="coordinator", daemon=True).start()
+        threading.Thread(target=self._monitor, name="coordinator-monitor", daemon=True).start()
+        host, port = self.address
+        self.logger.info(f"协调器已启动: {host}:{port}，共 {len(self.jobs)} 个任务")
+
+    def finished(self) -> bool:
+        return all(job.state == "done" for job in self.jobs.values())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待全部任务完成，超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self.finished():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 1.0)
+        return True
+
+    def shutdown(self):
+        self._stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ---- 连接处理 ----
+
+    def _serve_connection(self, rfile, wfile, peer: str):
+        lock = threading.Lock()
+
+        def reply(message: Dict):
+            with lock:
+                send_message(wfile, message)
+
+        worker = None
+        try:
+            for message in read_messages(rfile):
+                op = message.get("op")
+                if worker is None:
+                    if op != "hello" or (self.token and message.get("token") != self.token):
+                        reply({"event": "error", "message": "需要先发送 hello（token无效或缺失）"})
+                        return
+                    worker = self._register(message, peer, reply)
+                    if worker is None:
+                        return
+                    continue
+                with self._cond:
+                    worker.last_seen = time.monotonic()
+                if op == "heartbeat":
+                    continue
+                if op == "pull":
+                    reply(self._next_job(worker))
+                elif op == "result":
+                    self._on_result(worker, message)
+                elif op == "artifact":
+                    self._on_artifact(worker, message)
+                elif op == "done":
+                    self._on_done(worker, message)
+                else:
+                    reply({"event": "error", "message": f"未知请求: {op}"})
+        except (ValueError, ConnectionError, OSError) as e:
+            self.logger.warning(f"工作进程连接异常结束 ({peer}): {e}")
+        finally:
+            if worker is not None:
+                self._lose(worker, "连接断开")
+
+    def _register(self, message: Dict, peer: str, reply) -> Optional[WorkerState]:
+        name = message.get("worker") or peer.replace(":", "-")
+        if not isinstance(name, str) or not valid_worker_name(name):
+            reply({"event": "error", "message": f"工作进程名称无效（只能包含字母、数字和 . _ -）: {name!r}"})
+            return None
+        with self._cond:
+            existing = self.workers.get(name)
+            if existing and existing.alive:
+                reply({"event": "error", "message": f"工作进程名称已被使用: {name}"})
+                return None
+            worker = WorkerState(name, peer, message.get("tests", []), reply)
+            self.workers[name] = worker
+            self._distribute()
+            assigned = len(worker.queue)
+        self.logger.info(f"工作进程加入: {name} ({peer}, {message.get('platform', '')})，"
+                         f"支持 {len(worker.tests)} 个测试，分配 {assigned} 个任务")
+        reply({"event": "welcome", "heartbeat_interval": self.heartbeat_interval})
+        return worker
+
+    # ---- 任务分配 ----
+
+    def _distribute(self):
+        """把未分配的任务按耗时从长到短分给当前负载最小且支持该测试的工作进程（调用方持有锁）"""
+        live = [w for w in self.workers.values() if w.alive]
+        remaining = deque()
+        for job_id in sorted(self.pending, key=lambda j: -self.jobs[j].estimate):
+            candidates = [w for w in live if self.jobs[job_id].test in w.tests]
+            if not candidates:
+                remaining.append(job_id)
+                continue
+            worker = min(candidates, key=lambda w: (w.load(self.jobs), w.running is not None))
+            worker.queue.append(job_id)
+            self.jobs[job_id].worker = worker.name
+        self.pending = remaining
+
+    def _steal(self, thief: WorkerState) -> Optional[int]:
+        """从排队任务最多的其他工作进程队列末尾取一个本进程支持的任务（调用方持有锁）"""
+        victims = sorted((w for w in self.workers.values() if w is not thief and w.alive and w.queue),
+                         key=lambda w: w.load(self.jobs), reverse=True)
+        for victim in victims:
+            for job_id in reversed(victim.queue):
+                if self.jobs[job_id].test in thief.tests:
+                    victim.queue.remove(job_id)
+                    thief.stolen += 1
+                    self.logger.info(f"{thief.name} 从 {victim.name} 窃取任务 #{job_id} {self.jobs[job_id].test}")
+                    return job_id
+        return None
+
+    def _next_job(self, worker: WorkerState) -> Dict:
+        with self._cond:
+            if not worker.alive:
+                return {"event": "error", "message": "工作进程已被判定失联，请重新连接"}
+            if self.finished():
+                return {"event": "finished"}
+            self._distribute()
+            job_id = worker.queue.popleft() if worker.queue else self._steal(worker)
+            if job_id is None:
+                # 其他工作进程的任务仍在运行，失联时会重新入队
+                return {"event": "wait", "retry": min(self.heartbeat_interval, 1.0)}
+            job = self.jobs[job_id]
+            job.state, job.worker = "running", worker.name
+            job.attempts += 1
+            job.results = []
+            worker.running = job_id
+        self.logger.info(f"任务 #{job.id} {job.test} -> {worker.name}（第{job.attempts}次）")
+        return {"event": "job", "job": job.id, "test": job.test}
+
+    def _owned(self, worker: WorkerState, job_id) -> Optional[Job]:
+        """工作进程当前持有的运行中任务；失联后迟到的消息返回None（调用方持有锁）"""
+        job = self.jobs.get(job_id)
+        if job is None or not worker.alive or worker.running != job_id or job.state != "running":
+            return None
+        return job
+
+    # ---- 结果接收 ----
+
+    def _on_result(self, worker: WorkerState, message: Dict):
+        with self._cond:
+            job = self._owned(worker, message.get("job"))
+            if job is None:
+                return
+            result = dict(message["result"], worker=worker.name, job=job.id)
+            job.results.append(result)
+
+    def _on_artifact(self, worker: WorkerState, message: Dict):
+        with self._cond:
+            if self._owned(worker, message.get("job")) is None or not self.output_dir:
+                return
+        name = Path(str(message.get("name", ""))).name
+        data = message.get("data", "")
+        if not name or name in (".", "..") or not isinstance(data, str):
+            return
+        if len(data) > (MAX_ARTIFACT_BYTES + 2) // 3 * 4:
+            self.logger.warning(f"{worker.name} 传回的附件过大，已丢弃: {name}")
+            return
+        root = self.output_dir.resolve()
+        path = (root / worker.name / name).resolve()
+        try:
+            path.relative_to(root)
+        except ValueError:
+            self.logger.warning(f"{worker.name} 传回的附件路径在输出目录之外，已丢弃: {name}")
+            return
+        try:
+            content = base64.b64decode(data, validate=True)
+        except ValueError:
+            self.logger.warning(f"{worker.name} 传回的附件无法解码，已丢弃: {name}")
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    def _on_done(self, worker: WorkerState, message: Dict):
+        with self._cond:
+            job = self._owned(worker, message.get("job"))
+            if job is None:
+                return
+            job.state, job.passed = "done", bool(message.get("passed"))
+            worker.running = None
+            worker.completed += 1
+            if message.get("error"):
+                job.results.append(self._failure(job, worker.name, f"工作进程执行出错: {message['error']}"))
+            self._cond.notify_all()
+        self.logger.info(f"任务 #{job.id} {job.test} 完成于 {worker.name}: {'通过' if job.passed else '失败'}")
+
+    @staticmethod
+    def _failure(job: Job, worker: Optional[str], message: str) -> Dict:
+        return {"name": job.test, "test": job.test, "passed": False, "message": message,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "duration": 0, "worker": worker, "job": job.id}
+
+    # ---- 失联处理 ----
+
+    def _monitor(self):
+        while not self._stopped.wait(self.heartbeat_interval / 2):
+            now = time.monotonic()
+            with self._cond:
+                stale = [w for w in self.workers.values() if w.alive and now - w.last_seen > self.heartbeat_timeout]
+            for worker in stale:
+                self._lose(worker, f"超过 {self.heartbeat_timeout:g}s 没有心跳")
+            self._fail_unassignable(now)
+
+    def _fail_unassignable(self, now: float):
+        """没有任何在线工作进程支持的任务等待超过 worker_wait_timeout 后记为失败"""
+        with self._cond:
+            live = [w for w in self.workers.values() if w.alive]
+            stuck = [j for j in self.pending if not any(self.jobs[j].test in w.tests for w in live)]
+            if not stuck:
+                self._unassignable_since = None
+                return
+            if self._unassignable_since is None:
+                self._unassignable_since = now
+                return
+            if now - self._unassignable_since < self.worker_wait_timeout:
+                return
+            reason = (f"{self.worker_wait_timeout:g}s 内没有可执行该测试的工作进程" if live
+                      else f"{self.worker_wait_timeout:g}s 内没有工作进程加入")
+            for job_id in stuck:
+                job = self.jobs[job_id]
+                job.results = [self._failure(job, None, reason)]
+                job.state, job.passed = "done", False
+                self.pending.remove(job_id)
+            self._unassignable_since = None
+            self._cond.notify_all()
+        self.logger.warning(f"{len(stuck)} 个任务{reason}，记为失败: "
+                            f"{', '.join(self.jobs[j].test for j in stuck)}")
+
+    def _lose(self, worker: WorkerState, reason: str):
+        """判定工作进程失联：运行中和排队中的任务重新入队，超过尝试次数的记为失败"""
+        with self._cond:
+            if not worker.alive:
+                return
+            worker.alive = False
+            requeued = list(worker.queue)
+            worker.queue.clear()
+            if worker.running is not None:
+                job = self.jobs[worker.running]
+                worker.running = None
+                if job.attempts >= self.max_attempts:
+                    job.state, job.passed = "done", False
+                    job.results = [self._failure(job, worker.name,
+                                                 f"工作进程 {worker.name} 失联（{reason}），已尝试 {job.attempts} 次")]
+                else:
+                    requeued.insert(0, job.id)
+            for job_id in requeued:
+                job = self.jobs[job_id]
+                job.state, job.worker, job.results = "queued", None, []
+            # 重新入队的任务排在最前，优先分配
+            self.pending.extendleft(reversed(requeued))
+            self._distribute()
+            self._cond.notify_all()
+        if requeued:
+            self.logger.warning(f"工作进程失联: {worker.name}（{reason}），{len(requeued)} 个任务重新入队")
+        elif not self._stopped.is_set():
+            self.logger.info(f"工作进程已断开: {worker.name}（{reason}）")
+
+    # ---- 合并结果 ----
+
+    def fail_unfinished(self, reason: str):
+        """结束前把未完成的任务记为失败（没有可用的工作进程或超时）"""
+        with self._cond:
+            for job in self.jobs.values():
+                if job.state != "done":
+                    job.results = [self._failure(job, job.worker, reason)]
+                    job.state, job.passed = "done", False
+            self._cond.notify_all()
+
+    def results(self) -> List[Dict]:
+        """按任务顺序合并的结果，附件字段改为相对合并报告目录的路径"""
+        merged = []
+        with self._cond:
+            for job in self.jobs.values():
+                for result in job.results:
+                    result = dict(result)
+                    for field in ARTIFACT_FIELDS:
+                        if result.get(field) and result.get("worker"):
+                            result[field] = f"{result['worker']}/{Path(result[field]).name}"
+                    merged.append(result)
+        return merged
+
+    def summary(self) -> Dict:
+        with self._cond:
+            return {
+                "jobs": len(self.jobs),
+                "passed": sum(1 for j in self.jobs.values() if j.passed),
+                "failed": sum(1 for j in self.jobs.values() if j.passed is False),
+                "elapsed": round(time.time() - self.started_at, 3),
+                "workers": {w.name: {"host": w.host, "completed": w.completed, "stolen": w.stolen, "alive": w.alive}
+                            for w in self.workers.values()},
+            }
+
+    def write_report(self, formats=("html", "json", "junit")) -> Dict[str, str]:
+        """写出合并后的结果日志和报告"""
+        from test_report_generator import TestReportGenerator
+        from test_result_journal import ResultJournal
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        results = self.results()
+        with ResultJournal(self.output_dir / "results.ndjson") as journal:
+            for result in results:
+                journal.append(result)
+        with open(self.output_dir / "distributed_summary.json", "w", encoding="utf-8") as f:
+            json.dump({**self.summary(), "jobs_detail": [j.to_dict() for j in self.jobs.values()]},
+                      f, ensure_ascii=False, indent=2)
+        return TestReportGenerator(self.output_dir).generate_all_reports(results, formats)
+
+
+class DistributedWorker:
+    """工作进程：从协调器领取任务，用本机的测试运行器执行，推送结果和附件
+
+    任务通过 runner.run_cases 调度，界面测试在运行器的UIA线程中执行；心跳由后台线程发送
+    """
+
+    def __init__(self, runner, host: str, port: int = DEFAULT_COORDINATOR_PORT, name: Optional[str] = None,
+                 token: Optional[str] = None):
+        self.runner = runner
+        self.logger = runner.logger
+        self.name = name or re.sub(r"[^A-Za-z0-9._-]", "_", f"{platform.node()}-{os.getpid()}")
+        self.sock = socket.create_connection((host, port), timeout=10)
+        self.sock.settimeout(None)
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+        self.token = token
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def send(self, message: Dict):
+        with self._lock:
+            send_message(self.wfile, message)
+
+    def _receive(self) -> Dict:
+        for message in read_messages(self.rfile):
+            return message
+        raise ConnectionError("协调器已关闭连接")
+
+    def tests(self) -> List[str]:
+        from test_scheduler import CaseScheduler
+
+        return CaseScheduler(self.runner).select()
+
+    def _heartbeat(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.send({"op": "heartbeat"})
+            except OSError:
+                return
+
+    def serve(self) -> int:
+        """领取并执行任务直到协调器通知全部完成，返回执行的任务数"""
+        self.send({"op": "hello", "worker": self.name, "tests": self.tests(), "platform": platform.system(),
+                   "token": self.token})
+        welcome = self._receive()
+        if welcome.get("event") != "welcome":
+            raise ConnectionError(f"协调器拒绝连接: {welcome.get('message')}")
+        threading.Thread(target=self._heartbeat, args=(welcome["heartbeat_interval"],),
+                         name="worker-heartbeat", daemon=True).start()
+        executed = 0
+        try:
+            while True:
+                self.send({"op": "pull"})
+                reply = self._receive()
+                event = reply.get("event")
+                if event == "finished":
+                    return executed
+                if event == "wait":
+                    time.sleep(reply.get("retry", 1.0))
+                elif event == "job":
+                    self._run_job(reply["job"], reply["test"])
+                    executed += 1
+                else:
+                    raise ConnectionError(f"协调器返回错误: {reply.get('message')}")
+        finally:
+            self._stop.set()
+            self.close()
+
+    def _run_job(self, job_id: int, test: str):
+        """通过调度器运行单个测试（前提测试自动加入，本次会话中已通过的前提测试不再重复）"""
+        self.logger.info(f"执行任务 #{job_id}: {test}")
+
+        def listener(result: Dict):
+            self.send({"op": "result", "job": job_id, "result": result})
+            for field in ARTIFACT_FIELDS:
+                if result.get(field):
+                    self._send_artifact(job_id, self.runner.config.log_dir / result[field])
+
+        self.runner.result_listeners.append(listener)
+        error = None
+        try:
+            outcomes = self.runner.run_cases(names=[test])
+            passed = bool(outcomes.get(test))
+        except Exception as e:
+            passed, error = False, f"{type(e).__name__}: {e}"
+        finally:
+            self.runner.result_listeners.remove(listener)
+        self.send({"op": "done", "job": job_id, "passed": passed, "error": error})
+
+    def _send_artifact(self, job_id: int, path: Path):
+        try:
+            if path.stat().st_size > MAX_ARTIFACT_BYTES:
+                self.logger.warning(f"附件过大，未传回协调器: {path}")
+                return
+            data = base64.b64encode(path.read_bytes()).decode("ascii")
+        except OSError as e:
+            self.logger.warning(f"读取附件失败: {e}")
+            return
+        self.send({"op": "artifact", "job": job_id, "name": path.name, "data": data})
+
+    def close(self):
+        for f in (self.rfile, self.wfile):
+            try:
+                f.close()
+            except OSError:
+                pass
+        self.sock.close()
+
+
+def distributable_tests(runner, tags: Optional[Iterable[str]] = None) -> List[str]:
+    """按标签选出可以单独分发的测试
+
+    前提测试（安装、启动）由每个工作进程按需运行，卸载等收尾测试会影响同一台机器上的后续任务，都不单独分发
+    """
+    from test_scheduler import CaseScheduler
+
+    scheduler = CaseScheduler(runner)
+    return _without_prerequisites(scheduler.select(tags=tags), scheduler.cases)
+
+
+def registered_tests(config, tags: Optional[Iterable[str]] = None) -> List[str]:
+    """不创建运行器，从Windows和其他平台测试套件类的 @case 注册信息中选出可分发的测试（两者的并集）
+
+    协调器所在机器的平台和已安装的依赖（如PyAutoGUI）与工作进程无关；启用条件（when）按 config 判断。
+    只有某个平台支持的测试由该平台的工作进程领取
+    """
+    from types import SimpleNamespace
+    from test_scheduler import registered_cases
+    from test_suxiaoban_suite import CrossPlatformTestSuite, SuxiaobanTestSuite
+
+    holder = SimpleNamespace(config=config)
+    tags = set(tags or ())
+    tests = []
+    for cls in (SuxiaobanTestSuite, CrossPlatformTestSuite):
+        cases = registered_cases(cls)
+        selected = [n for n, info in cases.items() if (not tags or info.tags & tags) and info.enabled(holder)]
+        tests.extend(n for n in _without_prerequisites(selected, cases) if n not in tests)
+    return tests
+
+
+def _without_prerequisites(selected: List[str], cases: Dict) -> List[str]:
+    """去掉作为其他所选测试前提的测试和收尾测试"""
+    prerequisites = {dep for n in selected for dep in cases[n].depends + cases[n].after}
+    return [n for n in selected if n not in prerequisites and not cases[n].final]
+
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def main(argv=None):
+    """命令行入口"""
+    from test_automation_daemon import _default_runner
+
+    parser = argparse.ArgumentParser(description="灵犀·晓伴分布式测试执行")
+    parser.add_argument("command", choices=("coordinate", "work"))
+    parser.add_argument("--host", default=None, help="协调器监听地址（coordinate，默认0.0.0.0）或协调器地址（work）")
+    parser.add_argument("--port", type=int, default=DEFAULT_COORDINATOR_PORT)
+    parser.add_argument("--tests", help="要分发的测试方法名（逗号分隔）")
+    parser.add_argument("--tags", help="按标签选出要分发的测试（逗号分隔）")
+    parser.add_argument("--name", help="工作进程名称（默认 主机名-PID）")
+    parser.add_argument("--heartbeat-timeout", type=float, default=30.0)
+    parser.add_argument("--max-attempts", type=int, default=2, help="同一任务因工作进程失联最多尝试的次数")
+    parser.add_argument("--timeout", type=float, default=None, help="整次分布式运行的超时（秒）")
+    parser.add_argument("--worker-wait", type=float, default=300.0,
+                        help="任务等待可执行它的工作进程的最长时间（秒），超过后记为失败")
+    args = parser.parse_args(argv)
+    token = os.environ.get(TOKEN_ENV)
+
+    if args.command == "work":
+        runner = _default_runner()
+        try:
+            worker = DistributedWorker(runner, args.host or "127.0.0.1", args.port, args.name, token)
+        except OSError as e:
+            print(f"无法连接协调器 {args.host}:{args.port}: {e}")
+            return 2
+        executed = worker.serve()
+        runner.logger.info(f"全部任务已完成，本机执行了 {executed} 个")
+        return 0
+
+    from test_report_analyzer import RunHistoryAnalyzer
+    from test_suxiaoban import TestConfig
+
+    config = TestConfig()
+    tests = _split(args.tests) or registered_tests(config, _split(args.tags))
+    estimates = {name: h["mean_duration"] for name, h in
+                 RunHistoryAnalyzer(config.base_log_dir).method_history().items() if h.get("mean_duration")}
+    try:
+        coordinator = Coordinator(tests, host=args.host or "0.0.0.0", port=args.port, token=token,
+                                  estimates=estimates, heartbeat_timeout=args.heartbeat_timeout,
+                                  max_attempts=args.max_attempts, worker_wait_timeout=args.worker_wait,
+                                  output_dir=config.base_log_dir / f"distributed_{config.timestamp}",
+                                  logger=config.logger)
+    except ValueError as e:
+        config.logger.error(str(e))
+        return 2
+    coordinator.start()
+    try:
+        if not coordinator.wait(args.timeout):
+            coordinator.fail_unfinished("分布式运行超时，任务未完成")
+    except KeyboardInterrupt:
+        coordinator.fail_unfinished("运行被中断")
+    finally:
+        coordinator.shutdown()
+
+    summary = coordinator.summary()
+    coordinator.write_report()
+    config.logger.info(f"共 {summary['jobs']} 个任务，通过 {summary['passed']}，失败 {summary['failed']}，"
+                       f"用时 {summary['elapsed']:.1f}s")
+    for name, w in summary["workers"].items():
+        config.logger.info(f"  {name} ({w['host']}): 完成 {w['completed']} 个，窃取 {w['stolen']} 个")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,7 +38,7 @@ def example_3_full_test_with_report():
     runner.run_custom_tests()
     
     report_gen = TestReportGenerator(config.log_dir)
-    report_gen.generate_all_reports(runner.test_results)
+    report_gen.generate_all_reports(config.result_journal)
 
 
 def example_4_specific_test():
@@ -70,14 +70,14 @@ def example_5_continuous_testing():
     test_count = 3
     print(f"将进行 {test_count} 次循环测试\n")
     
-    all_results = []
-    
+    # 复用同一个运行器：后端导入和窗口连接（含窗口句柄缓存）只做一次；
+    # 每次循环的结果都追加到同一个结果日志中，无需在内存中累积。
+    # 多次单独运行脚本时，可以改用常驻服务: python test_automation_daemon.py serve / run ...
+    runner = SuxiaobanTestSuite(config)
     for i in range(test_count):
         print(f"\n=== 第 {i+1}/{test_count} 次测试 ===\n")
         
-        runner = SuxiaobanTestSuite(config)
         runner.run_all_tests()
-        all_results.extend(runner.test_results)
         
         if i < test_count - 1:
             print("\n等待5秒后继续...\n")
@@ -87,7 +87,34 @@ def example_5_continuous_testing():
     print("\n=== 所有测试完成 ===\n")
     
     report_gen = TestReportGenerator(config.log_dir)
-    report_gen.generate_all_reports(all_results)
+    report_gen.generate_all_reports(config.result_journal)
+
+
+def example_6_startup_benchmark():
+    """示例6: 启动时间基准测试（冷/热启动）"""
+    print("\n=== 示例6: 启动时间基准测试 ===\n")
+    
+    config = TestConfig()
+    runner = WindowsTestRunner(config)
+    
+    runner.test_startup_time(runs=5, cold=False)
+    runner.print_summary()
+
+
+def example_7_async_orchestration():
+    """示例7: asyncio编排（同步测试与协程测试混合运行）"""
+    print("\n=== 示例7: asyncio编排 ===\n")
+    
+    config = TestConfig()
+    runner = SuxiaobanTestSuite(config)
+    
+    # 启动也在UIA线程中执行，保证后续UIA调用与连接在同一线程
+    runner.run_async([
+        runner.launch_application,
+        runner.test_file_menu,
+        runner.test_app_stability_async,
+    ], stop_on_failure=True)
+    runner.print_summary()
 
 
 def main():
@@ -101,7 +128,9 @@ def main():
         ("自定义测试", example_2_custom_test),
         ("完整测试 + 报告", example_3_full_test_with_report),
         ("特定测试", example_4_specific_test),
-        ("连续测试", example_5_continuous_testing)
+        ("连续测试", example_5_continuous_testing),
+        ("启动时间基准", example_6_startup_benchmark),
+        ("asyncio编排", example_7_async_orchestration)
     ]
     
     print("\n请选择要运行的示例:")
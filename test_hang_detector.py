@@ -0,0 +1,148 @@
+"""
+UI线程卡顿检测（心跳）
+
+后台线程按固定间隔向应用主窗口发送 WM_NULL 消息并等待处理完成，记录每次往返延迟。
+延迟超过阈值（或超时无响应）即判定为卡顿，同一次卡顿只截图一次。
+运行器在记录每条测试结果时取出期间的心跳统计和卡顿事件，附加到该测试结果上；
+每次卡顿只出现在一条结果中，取出时仍在持续的卡顿标记为 ongoing，结束后不再重复取出。
+"""
+
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from test_stats import describe
+from test_window_utils import get_window_rect, is_window, is_window_responsive
+
+
+class HangDetector:
+    """主窗口心跳与卡顿检测"""
+
+    def __init__(self, hwnd_provider: Callable[[], Optional[int]], interval: float = 1.0,
+                 hang_threshold_ms: float = 500.0, probe_timeout_ms: int = 5000,
+                 screenshot_dir: Optional[Path] = None, logger=None):
+        self.hwnd_provider = hwnd_provider          # 返回当前主窗口句柄
+        self.interval = interval
+        self.hang_threshold_ms = hang_threshold_ms
+        self.probe_timeout_ms = probe_timeout_ms    # 单次探测最长等待，超时即视为无响应
+        self.screenshot_dir = Path(screenshot_dir) if screenshot_dir else None
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._latencies: List[float] = []
+        self._hangs: List[Dict] = []
+        self._recent = deque(maxlen=600)            # 最近的延迟样本（毫秒），用于实时查看
+        self._current: Optional[Dict] = None        # 正在持续的卡顿事件
+        self._reported = set()                      # 持续中已被取出过的卡顿事件ID
+        self._in_hang = False
+        self._hang_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="hang-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.probe_timeout_ms / 1000 + self.interval + 1)
+            self._thread = None
+
+    def _loop(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            hwnd = self.hwnd_provider()
+            # 窗口已关闭（如应用被结束）时不算卡顿
+            if hwnd and is_window(hwnd):
+                self.probe(hwnd)
+            next_at += self.interval
+            # 探测本身可能耗时较长（卡顿时），落后时从当前时间重新计时
+            next_at = max(next_at, time.monotonic())
+            self._stop.wait(next_at - time.monotonic())
+
+    def probe(self, hwnd: int) -> float:
+        """探测一次，返回往返延迟（毫秒），无响应时返回探测超时值"""
+        responded, elapsed = is_window_responsive(hwnd, timeout_ms=self.probe_timeout_ms)
+        latency_ms = elapsed * 1000 if responded else float(self.probe_timeout_ms)
+        hung = not responded or latency_ms >= self.hang_threshold_ms
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self._recent.append(latency_ms)
+            started = hung and not self._in_hang
+            if started:
+                self._hang_count += 1
+                hang_id = self._hang_count
+            elif hung and self._current:
+                # 同一次卡顿持续中，只更新最大延迟
+                self._current["latency_ms"] = max(self._current["latency_ms"], round(latency_ms, 1))
+                self._current["responded"] = self._current["responded"] and responded
+            elif not hung:
+                self._current = None
+            self._in_hang = hung
+
+        if started:
+            if self.logger:
+                self.logger.warning(f"检测到界面卡顿: 心跳延迟 {latency_ms:.0f}ms{'（无响应）' if not responded else ''}")
+            # 截图完成后事件才可以被取出，取出的事件总是带着截图
+            screenshot = self._capture(hwnd, hang_id)
+            with self._lock:
+                event = {
+                    "id": hang_id,
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "latency_ms": round(latency_ms, 1),
+                    "responded": responded,
+                    "screenshot": screenshot,
+                }
+                self._hangs.append(event)
+                if self._in_hang:
+                    self._current = event
+        return latency_ms
+
+    def _capture(self, hwnd: int, hang_id: int) -> Optional[str]:
+        """截取卡顿窗口区域（屏幕像素，不依赖被卡住的UI线程）"""
+        if not self.screenshot_dir:
+            return None
+        try:
+            from PIL import ImageGrab
+            path = self.screenshot_dir / f"hang_{time.strftime('%Y%m%d_%H%M%S')}_{hang_id}.png"
+            ImageGrab.grab(bbox=get_window_rect(hwnd)).save(str(path))
+            return path.name
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"卡顿截图失败: {e}")
+            return None
+
+    def drain(self) -> Dict:
+        """取出上次调用以来的心跳统计和卡顿事件，每次卡顿只取出一次"""
+        with self._lock:
+            latencies, self._latencies = self._latencies, []
+            events, self._hangs = self._hangs, []
+            hangs = []
+            for event in events:
+                if event is self._current:
+                    # 卡顿仍在持续：第一次取出时标记为 ongoing，事件保留以便继续更新最大延迟
+                    self._hangs.append(event)
+                    if event["id"] not in self._reported:
+                        self._reported.add(event["id"])
+                        hangs.append(dict(event, ongoing=True))
+                elif event["id"] in self._reported:
+                    self._reported.discard(event["id"])
+                else:
+                    hangs.append(dict(event))
+        stats = describe(latencies)
+        return {
+            "heartbeats": stats["count"],
+            "max_ms": round(stats["max"], 1) if stats["count"] else None,
+            "p95_ms": round(stats["p95"], 1) if stats["count"] else None,
+            "hangs": hangs,
+        }
+
+    def recent_latencies(self) -> List[float]:
+        with self._lock:
+            return list(self._recent)
@@ -0,0 +1,190 @@
+"""
+安装占用与安装耗时基准
+
+安装/卸载循环结束后记录：
+  - 安装、卸载的端到端耗时
+  - 安装目录的占用：文件数、总字节数、最大的若干个文件（多线程 os.scandir 并行遍历）
+  - 卸载后安装目录中残留的文件
+结果按版本保存在 install_history.json 中，并与上一个构建的数据比较，
+安装包膨胀、安装变慢等用户能感知的回退可以在测试中直接发现。
+
+用法:
+    python test_install_footprint.py "C:\\Users\\...\\AppData\\Local\\Suxiaoban" [--top 10]
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from test_installer_cache import version_key
+
+# 参与版本间比较的指标
+COMPARED_METRICS = ("install_seconds", "uninstall_seconds", "total_bytes", "file_count")
+
+
+class Footprint:
+    """目录占用统计"""
+
+    def __init__(self, root: Path, file_count: int = 0, dir_count: int = 0, total_bytes: int = 0,
+                 largest: Optional[List[Tuple[int, str]]] = None, elapsed: float = 0.0):
+        self.root = Path(root)
+        self.file_count = file_count
+        self.dir_count = dir_count
+        self.total_bytes = total_bytes
+        self.largest = largest or []    # [(字节数, 相对路径)]，从大到小
+        self.elapsed = elapsed
+
+    def to_dict(self) -> Dict:
+        return {
+            "file_count": self.file_count,
+            "dir_count": self.dir_count,
+            "total_bytes": self.total_bytes,
+            "largest": [{"path": path, "bytes": size} for size, path in self.largest],
+            "scan_seconds": round(self.elapsed, 3),
+        }
+
+
+def _scan_dir(path: str, top: int) -> Tuple[int, int, List[Tuple[int, str]], List[str]]:
+    """扫描单个目录（不递归），返回 (文件数, 字节数, 最大文件, 子目录)"""
+    files, total, largest, subdirs = 0, 0, [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        size = entry.stat(follow_symlinks=False).st_size
+                        files += 1
+                        total += size
+                        if len(largest) < top:
+                            heapq.heappush(largest, (size, entry.path))
+                        elif size > largest[0][0]:
+                            heapq.heapreplace(largest, (size, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, total, largest, subdirs
+
+
+def scan_tree(root: Path, top: int = 10, workers: Optional[int] = None) -> Footprint:
+    """并行遍历目录树：每个目录作为一个任务，子目录在其父目录扫描完成后提交"""
+    root = Path(root)
+    started = time.perf_counter()
+    footprint = Footprint(root)
+    if not root.is_dir():
+        return footprint
+
+    largest: List[Tuple[int, str]] = []
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="footprint") as pool:
+        pending = {pool.submit(_scan_dir, str(root), top)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, total, dir_largest, subdirs = future.result()
+                footprint.file_count += files
+                footprint.total_bytes += total
+                footprint.dir_count += len(subdirs)
+                largest = heapq.nlargest(top, largest + dir_largest)
+                pending.update(pool.submit(_scan_dir, d, top) for d in subdirs)
+
+    footprint.largest = [(size, os.path.relpath(path, root)) for size, path in largest]
+    footprint.elapsed = time.perf_counter() - started
+    return footprint
+
+
+def find_leftovers(root: Path, limit: int = 50) -> List[str]:
+    """卸载后安装目录中残留的文件（相对路径，最多 limit 个）"""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    leftovers = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            leftovers.append(os.path.relpath(os.path.join(dirpath, name), root))
+            if len(leftovers) >= limit:
+                return leftovers
+    return leftovers
+
+
+class InstallHistory:
+    """按版本保存的安装/卸载记录"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.records: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self.records = {}
+
+    def update(self, version: str, **fields) -> Dict:
+        record = self.records.setdefault(version or "unknown", {})
+        record.update(fields)
+        record["updated"] = time.time()
+        return record
+
+    def previous(self, version: str) -> Optional[Tuple[str, Dict]]:
+        """比当前版本旧的最新一个版本的记录；没有更旧的版本时返回None"""
+        older = [v for v in self.records if v != version and version_key(v) < version_key(version)]
+        if not older:
+            return None
+        v = max(older, key=version_key)
+        return v, self.records[v]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def compare(current: Dict, previous: Dict, max_growth_pct: Dict[str, float]) -> Tuple[Dict[str, float], List[str]]:
+    """与上一个构建比较，返回 (各指标变化百分比, 超过阈值的指标说明)"""
+    changes, regressions = {}, []
+    for metric in COMPARED_METRICS:
+        old, new = previous.get(metric), current.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        changes[metric] = round(change, 1)
+        limit = max_growth_pct.get(metric)
+        if limit is not None and change > limit:
+            regressions.append(f"{metric} {old:g} -> {new:g} (+{change:.1f}%，阈值 {limit:g}%)")
+    return changes, regressions
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.1f}{unit}" if unit != "B" else f"{int(n)}B"
+        n /= 1024
+
+
+def main(argv=None):
+    """命令行入口：统计任意目录的占用"""
+    parser = argparse.ArgumentParser(description="安装目录占用统计")
+    parser.add_argument("path", help="要统计的目录")
+    parser.add_argument("--top", type=int, default=10, help="列出最大的文件数量")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    footprint = scan_tree(Path(args.path), args.top, args.workers)
+    print(f"{footprint.root}: {footprint.file_count} 个文件, {footprint.dir_count} 个目录, "
+          f"共 {_format_bytes(footprint.total_bytes)} (遍历耗时 {footprint.elapsed:.2f}s)")
+    for size, path in footprint.largest:
+        print(f"  {_format_bytes(size):>10}  {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
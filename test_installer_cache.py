@@ -0,0 +1,216 @@
+"""
+安装包管理与解压缓存
+
+package/ 目录（通常是共享的构建投放目录）中可能同时有多个版本的安装包：
+  - 按文件名中解析出的版本号选择最新的构建（1.10.0 > 1.9.2，正式版 > 同版本的 beta）
+  - 流式计算SHA-256（不把整个安装包读入内存），存在 <安装包>.sha256 时与之核对
+  - 按内容哈希解压到缓存目录，同一个安装包只解压一次，之后的安装/卸载循环直接复用；
+    缓存按最近使用时间淘汰，只保留最近的若干个
+
+用法:
+    python test_installer_cache.py            # 显示最新的安装包并准备解压缓存
+    python test_installer_cache.py --list     # 列出缓存内容
+    python test_installer_cache.py --clear    # 清空缓存
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import hashlib
+import zipfile
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+HASH_CHUNK_SIZE = 1024 * 1024
+INDEX_NAME = "index.json"
+
+
+def version_key(version: str) -> tuple:
+    """版本号排序键：数字段按数值比较，字母段（beta、rc等）排在同版本正式版之前"""
+    key = []
+    for part in re.findall(r"\d+|[A-Za-z]+", version):
+        key.append((2, int(part), "") if part.isdigit() else (0, 0, part.lower()))
+    key.append((1, 0, ""))
+    return tuple(key)
+
+
+def installer_version(name: str, pattern: str = "suxiaoban-*-setup.exe.zip") -> Optional[str]:
+    """从安装包文件名中取出版本（pattern 中 * 匹配的部分），不匹配时返回None"""
+    m = re.match(fnmatch.translate(pattern).replace(".*", "(.*)", 1), name, re.IGNORECASE)
+    return m.group(1) if m else None
+
+
+def find_installers(package_dir: Path, pattern: str = "suxiaoban-*-setup.exe.zip") -> List[Tuple[str, Path]]:
+    """按版本从新到旧列出匹配的安装包 [(版本, 路径)]"""
+    found = []
+    with os.scandir(package_dir) as it:
+        for entry in it:
+            version = installer_version(entry.name, pattern)
+            if version is not None and entry.is_file():
+                found.append((version, Path(entry.path), entry.stat().st_mtime))
+    # 版本相同时，修改时间较新的优先
+    found.sort(key=lambda item: (version_key(item[0]), item[2]), reverse=True)
+    return [(version, path) for version, path, _ in found]
+
+
+def file_sha256(path: Path, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """流式计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expected_sha256(path: Path) -> Optional[str]:
+    """读取安装包旁的 .sha256 校验文件（sha256sum 格式或只有哈希值），不存在时返回None"""
+    checksum_file = Path(f"{path}.sha256")
+    try:
+        text = checksum_file.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return text.split()[0].lower() if text else None
+
+
+class InstallerCache:
+    """按安装包内容哈希组织的解压缓存（LRU淘汰）"""
+
+    def __init__(self, cache_dir: Path, max_entries: int = 3, logger=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.logger = logger
+        self.index_path = self.cache_dir / INDEX_NAME
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        # 只保留实际存在的解压目录
+        return {h: e for h, e in index.items() if (self.cache_dir / h).is_dir()}
+
+    def _save_index(self, index: Dict[str, Dict]):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def entries(self) -> List[Tuple[str, Dict]]:
+        """缓存条目，最近使用的在前"""
+        return sorted(self._load_index().items(), key=lambda item: item[1].get("last_used", 0), reverse=True)
+
+    def verify(self, archive: Path) -> str:
+        """计算安装包哈希并与校验文件核对，不一致时抛出ValueError"""
+        started = time.perf_counter()
+        digest = file_sha256(archive)
+        expected = expected_sha256(archive)
+        if expected and expected != digest:
+            raise ValueError(f"安装包校验失败: {archive.name} 期望 {expected}，实际 {digest}")
+        self._log(f"安装包SHA-256: {digest[:16]}… ({time.perf_counter() - started:.2f}s"
+                  f"{'，已与校验文件核对' if expected else ''})")
+        return digest
+
+    def extract(self, archive: Path, version: str = "") -> Path:
+        """返回安装包解压后的目录，缓存中已有同一内容时直接复用"""
+        archive = Path(archive)
+        digest = self.verify(archive)
+        target = self.cache_dir / digest
+        index = self._load_index()
+
+        if target.is_dir():
+            self._log(f"复用已解压的安装包: {target}")
+        else:
+            started = time.perf_counter()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_dir = self.cache_dir / f".{digest}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            with zipfile.ZipFile(archive) as zf:
+                zf.extractall(tmp_dir)
+            # 解压完成后再改名，中断的解压不会被当作有效缓存
+            os.replace(tmp_dir, target)
+            self._log(f"安装包已解压到缓存: {target} ({time.perf_counter() - started:.2f}s)")
+
+        entry = index.get(digest, {})
+        entry.update({"source": archive.name, "version": version, "last_used": time.time()})
+        if "size" not in entry:
+            # 只在新建条目时统计一次，命中缓存时不再遍历解压目录
+            entry["size"] = sum(f.stat().st_size for f in target.rglob("*") if f.is_file())
+        index[digest] = entry
+        self._evict(index, keep=digest)
+        self._save_index(index)
+        return target
+
+    def _evict(self, index: Dict[str, Dict], keep: str):
+        """删除最久未使用的条目，直到不超过 max_entries"""
+        by_age = sorted((h for h in index if h != keep), key=lambda h: index[h].get("last_used", 0))
+        while len(index) > self.max_entries and by_age:
+            digest = by_age.pop(0)
+            shutil.rmtree(self.cache_dir / digest, ignore_errors=True)
+            self._log(f"淘汰安装包缓存: {index[digest].get('source')} ({digest[:16]}…)")
+            del index[digest]
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    @staticmethod
+    def find_setup_exe(extracted_dir: Path) -> Optional[Path]:
+        """在解压目录中查找安装程序（优先文件名含 setup 的exe）"""
+        executables = sorted(Path(extracted_dir).rglob("*.exe"), key=lambda p: (len(p.parts), p.name))
+        for exe in executables:
+            if "setup" in exe.name.lower():
+                return exe
+        return executables[0] if executables else None
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="安装包选择与解压缓存")
+    parser.add_argument("--package-dir", default=str(Path(__file__).parent / "package"))
+    parser.add_argument("--cache-dir", default=str(Path(__file__).parent / "installer_cache"))
+    parser.add_argument("--pattern", default="suxiaoban-*-setup.exe.zip")
+    parser.add_argument("--max-entries", type=int, default=3)
+    parser.add_argument("--list", action="store_true", help="列出缓存内容")
+    parser.add_argument("--clear", action="store_true", help="清空缓存")
+    args = parser.parse_args(argv)
+
+    cache = InstallerCache(args.cache_dir, args.max_entries)
+    if args.clear:
+        cache.clear()
+        print(f"已清空: {cache.cache_dir}")
+        return 0
+    if args.list:
+        for digest, entry in cache.entries():
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.get("last_used", 0)))
+            print(f"{digest[:16]}  {entry.get('version', ''):<12} {entry.get('size', 0) / 1e6:8.1f}MB  "
+                  f"{used}  {entry.get('source', '')}")
+        return 0
+
+    try:
+        installers = find_installers(Path(args.package_dir), args.pattern)
+    except OSError as e:
+        print(f"无法读取安装包目录: {e}")
+        return 2
+    if not installers:
+        print(f"未找到安装包: {args.package_dir}/{args.pattern}")
+        return 1
+    version, archive = installers[0]
+    print(f"最新安装包: {archive.name} (版本 {version}，共 {len(installers)} 个候选)")
+    extracted = cache.extract(archive, version)
+    print(f"解压目录: {extracted}")
+    print(f"安装程序: {cache.find_setup_exe(extracted)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+输入到界面更新的延迟探测
+
+发送一次按键或点击并精确记录时间，随后高频轮询目标控件，直到界面反映出变化，
+两者之差即为一次输入延迟样本。重复多次得到延迟直方图，可分别在空闲时和
+回复流式生成期间测量（用户反馈界面卡顿主要发生在后者）。
+
+测量分辨率受一次控件读取（跨进程UIA调用）的耗时限制，结果中的 read_cost 给出该值。
+"""
+
+import time
+from typing import Callable, Dict, List, Optional
+
+from test_stats import describe
+
+# 直方图桶上限（毫秒），16/33ms 分别对应 60/30 FPS 的一帧
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 16, 33, 50, 100, 200, 500, 1000, float("inf"))
+
+
+def histogram(values_ms: List[float], buckets=HISTOGRAM_BUCKETS_MS) -> Dict[str, int]:
+    """按桶统计样本数，键为桶上限（"le_16" 表示 <=16ms）"""
+    counts = {f"le_{b:g}": 0 for b in buckets}
+    for v in values_ms:
+        for b in buckets:
+            if v <= b:
+                counts[f"le_{b:g}"] += 1
+                break
+    return counts
+
+
+def read_control_value(control) -> str:
+    """读取控件当前文本：优先使用UIA ValuePattern（单次跨进程调用），否则回退到window_text"""
+    try:
+        return control.iface_value.CurrentValue
+    except Exception:
+        return control.window_text()
+
+
+class InputLatencyProbe:
+    """输入延迟探测器"""
+
+    def __init__(self, poll_interval: float = 0.0, timeout: float = 2.0):
+        self.poll_interval = poll_interval  # 轮询间隔，0表示忙等以获得最高分辨率
+        self.timeout = timeout              # 单次输入等待界面变化的超时
+
+    def measure_read_cost(self, read_state: Callable[[], object], repeat: int = 20) -> float:
+        """测量一次状态读取的平均耗时（即测量分辨率）"""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            read_state()
+        return (time.perf_counter() - start) / repeat
+
+    def sample(self, send_input: Callable[[], None], read_state: Callable[[], object],
+               changed: Optional[Callable[[object, object], bool]] = None) -> Optional[float]:
+        """测量一次输入延迟（秒），超时返回None
+
+        changed(before, now) 判断界面是否已反映输入，默认为状态发生变化
+        """
+        changed = changed or (lambda before, now: now != before)
+        before = read_state()
+        t0 = time.perf_counter()
+        send_input()
+        deadline = t0 + self.timeout
+        while True:
+            now = read_state()
+            t = time.perf_counter()
+            if changed(before, now):
+                return t - t0
+            if t > deadline:
+                return None
+            if self.poll_interval:
+                time.sleep(self.poll_interval)
+
+    def run(self, send_input: Callable[[], None], read_state: Callable[[], object], samples: int = 50,
+            reset: Optional[Callable[[], None]] = None, gap: float = 0.05,
+            keep_going: Optional[Callable[[], bool]] = None) -> Dict:
+        """重复测量，返回统计、直方图和原始样本（毫秒）
+
+        reset 在每次测量后恢复界面状态（如删除刚输入的字符），不计入测量；
+        keep_going 返回False时提前结束（如流式回复已结束）
+        """
+        read_cost = self.measure_read_cost(read_state)
+        values_ms, timeouts = [], 0
+        for _ in range(samples):
+            if keep_going and not keep_going():
+                break
+            latency = self.sample(send_input, read_state)
+            if latency is None:
+                timeouts += 1
+            else:
+                values_ms.append(latency * 1000)
+            if reset:
+                reset()
+            time.sleep(gap)
+        return {
+            "samples_ms": [round(v, 3) for v in values_ms],
+            "timeouts": timeouts,
+            "read_cost_ms": round(read_cost * 1000, 3),
+            "stats": describe(values_ms),
+            "histogram": histogram(values_ms),
+        }
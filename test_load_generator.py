@@ -0,0 +1,435 @@
+"""
+多会话并发对话负载生成
+
+以 test_ai_chat 的提问流程为基础，同时驱动M个对话会话，统计每个请求的延迟和错误率，
+并给出不同并发度下吞吐量与延迟的关系，用于评估后端容量：
+  - 闭环（closed）：每个会话收到回复（及思考时间）后再发下一个问题，并发度即会话数
+  - 开环（open）：按泊松过程以固定速率到达请求，由M个会话处理，延迟包含排队时间，
+    不会因为系统变慢而自动降低压力
+
+会话可以是应用实例中的对话窗口（UiaChatSession，每个实例一个会话），
+也可以直接访问HTTP接口（HttpChatSession）；CI中配合本地模拟后端 SimulatedChatBackend 运行。
+真实的鼠标键盘输入是全局的，UiaChatSession 的界面操作都交给同一个UIA线程执行：
+切换焦点、输入和发送作为一个整体依次进行，只有等待回复的轮询在各会话之间并发。
+
+用法:
+    python test_load_generator.py --simulate --levels 1,2,4,8 --duration 10
+    python test_load_generator.py --url http://127.0.0.1:8000/chat --mode open --rate 2 --levels 4
+"""
+
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from test_answer_matcher import AnswerMatcher, expect_answer
+from test_stats import describe
+
+DRAIN_MARGIN = 10.0         # 开环负载排空时间：会话超时之外再多等的秒数
+
+# (问题, 预期答案中应包含的文本，None表示收到任意回复即可)
+DEFAULT_QUESTIONS = [
+    ("(123 + 456) * 789 / 12等于几？", "38069.25"),
+    ("请用一句话介绍长城", None),
+    ("把“你好”翻译成英文", None),
+]
+
+
+class ChatSession:
+    """对话会话接口：ask 发送一个问题并等待回复，失败或超时抛出异常"""
+
+    name = "session"
+
+    def ask(self, question: str, expected: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HttpChatSession(ChatSession):
+    """通过HTTP接口提问：POST {"question": ...}，回复 {"answer": ...}"""
+
+    def __init__(self, url: str, timeout: float = 60.0, name: str = "http"):
+        self.url = url
+        self.timeout = timeout
+        self.name = name
+
+    def ask(self, question: str, expected: Optional[str] = None) -> str:
+        import urllib.request
+        body = json.dumps({"question": question}, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            answer = json.loads(response.read().decode("utf-8")).get("answer", "")
+        if expected and expected not in answer.replace(",", ""):
+            raise ValueError(f"回复中未包含预期答案 {expected}")
+        return answer
+
+
+class UiaChatSession(ChatSession):
+    """在一个应用窗口的对话界面中提问（窗口需已进入问一问界面）
+
+    window 和 input_box 要在 uia（UiaWorker）的线程中创建，所有界面操作也都在该线程中执行
+    """
+
+    def __init__(self, window, input_box, uia, timeout: float = 60.0, poll_interval: float = 0.5,
+                 name: str = "uia"):
+        self.window = window
+        self.input_box = input_box
+        self.uia = uia
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.name = name
+
+    @staticmethod
+    def _escape_keys(text: str) -> str:
+        """转义type_keys中的特殊字符"""
+        return "".join("{" + c + "}" if c in "+^%~(){}[]" else c for c in text)
+
+    def _texts(self) -> List[str]:
+        return [el.window_text() for el in self.window.descendants(control_type="Text")]
+
+    def _send(self, question: str) -> List[str]:
+        """切换到本窗口、输入并发送问题，返回发送前已有的文本（在UIA线程中作为一个整体执行）"""
+        before = self._texts()
+        self.window.set_focus()
+        self.input_box.click_input()
+        self.input_box.type_keys(self._escape_keys(question), with_spaces=True)
+        send_btn = self.window.child_window(title="发送", control_type="Button")
+        if send_btn.exists(timeout=0):
+            send_btn.click_input()
+        else:
+            self.input_box.type_keys("{ENTER}")
+        return before
+
+    def ask(self, question: str, expected: Optional[str] = None) -> str:
+        before = set(self.uia.call(self._send, question))
+        matcher = None
+        if expected is not None:
+            matcher = AnswerMatcher([expect_answer("answer", expected, exclude=[question])])
+            matcher.scan(before)  # 已有的文本不算回复
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            texts = self.uia.call(self._texts)
+            if matcher:
+                matched = matcher.scan(texts)
+                if matched:
+                    return matched["answer"]
+            else:
+                for txt in texts:
+                    if txt not in before and txt.strip() and question not in txt:
+                        return txt
+            time.sleep(self.poll_interval)
+        raise TimeoutError(f"{self.timeout:g} 秒内未收到回复")
+
+
+class SimulatedChatBackend:
+    """本地模拟对话后端，用于CI中验证负载生成本身
+
+    同时只能处理 capacity 个请求（模拟后端推理并发上限），超出的请求排队，
+    因此并发度超过容量后吞吐量不再增长、延迟随之上升
+    """
+
+    def __init__(self, capacity: int = 4, service_time: float = 0.2, jitter: float = 0.05,
+                 error_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.service_time = service_time
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._slots = threading.Semaphore(capacity)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/chat"
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._random_lock:
+            service = max(0.0, self._random.gauss(self.service_time, self.jitter))
+            fail = self._random.random() < self.error_rate
+        return service, fail
+
+    def _make_handler(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    question = json.loads(self.rfile.read(length).decode("utf-8")).get("question", "")
+                except (ValueError, UnicodeDecodeError):
+                    self.send_error(400)
+                    return
+                service, fail = backend._draw()
+                with backend._slots:
+                    time.sleep(service)
+                if fail:
+                    self.send_error(500, "simulated failure")
+                    return
+                body = json.dumps({"answer": f"模拟回复: {question}"}, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "SimulatedChatBackend":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="simulated-backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class ChatLoadGenerator:
+    """多会话并发负载生成器"""
+
+    def __init__(self, session_factory: Callable[[int], ChatSession],
+                 questions: Optional[List[Tuple[str, Optional[str]]]] = None, logger=None):
+        self.session_factory = session_factory  # 按序号创建（或复用）会话
+        self.questions = questions or DEFAULT_QUESTIONS
+        self.logger = logger
+        self._lock = threading.Lock()
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def _record(self, records: List[Dict], session: ChatSession, index: int, arrived: float, started: float):
+        """执行一次提问并记录结果，延迟从请求到达时算起（闭环中到达即开始）"""
+        question, expected = self.questions[index % len(self.questions)]
+        error = None
+        try:
+            session.ask(question, expected)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        done = time.perf_counter()
+        with self._lock:
+            records.append({
+                "session": session.name,
+                "latency": done - arrived,
+                "wait": started - arrived,
+                "ok": error is None,
+                "error": error,
+                "done": done,
+            })
+
+    def _sessions(self, count: int) -> List[ChatSession]:
+        return [self.session_factory(i) for i in range(count)]
+
+    def run_closed(self, concurrency: int, duration: float = 30.0, think_time: float = 0.0,
+                   requests_per_session: Optional[int] = None) -> Dict:
+        """闭环负载：concurrency 个会话各自循环提问，持续 duration 秒"""
+        sessions = self._sessions(concurrency)
+        records: List[Dict] = []
+        start = time.perf_counter()
+        end = start + duration
+
+        def worker(session: ChatSession, offset: int):
+            n = 0
+            while time.perf_counter() < end and (requests_per_session is None or n < requests_per_session):
+                t = time.perf_counter()
+                self._record(records, session, offset + n * concurrency, t, t)
+                n += 1
+                if think_time:
+                    time.sleep(think_time)
+
+        threads = [threading.Thread(target=worker, args=(s, i), name=f"load-{i}", daemon=True)
+                   for i, s in enumerate(sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self._summarize("closed", concurrency, records, time.perf_counter() - start)
+
+    def run_open(self, rate: float, concurrency: int, duration: float = 30.0, drain_timeout: Optional[float] = None,
+                 seed: Optional[int] = None) -> Dict:
+        """开环负载：请求以平均 rate 个/秒的泊松过程到达，由 concurrency 个会话处理
+
+        到达后在队列中等待空闲会话，等待时间计入延迟；到达阶段结束后最多再等 drain_timeout 秒
+        （默认为会话的请求超时加 DRAIN_MARGIN），仍在排队的请求计为错误，已开始的请求等待其完成或超时，
+        每个到达的请求都计入结果
+        """
+        sessions = self._sessions(concurrency)
+        if drain_timeout is None:
+            drain_timeout = max(getattr(s, "timeout", None) or 60.0 for s in sessions) + DRAIN_MARGIN
+        records: List[Dict] = []
+        pending: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+        rng = random.Random(seed)
+
+        def worker(session: ChatSession):
+            while True:
+                try:
+                    index, arrived = pending.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                self._record(records, session, index, arrived, time.perf_counter())
+
+        threads = [threading.Thread(target=worker, args=(s,), name=f"load-{i}", daemon=True)
+                   for i, s in enumerate(sessions)]
+        for t in threads:
+            t.start()
+
+        start = time.perf_counter()
+        next_at, index = start, 0
+        while True:
+            next_at += rng.expovariate(rate)
+            if next_at >= start + duration:
+                break
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            pending.put((index, next_at))
+            index += 1
+
+        drain_deadline = time.perf_counter() + drain_timeout
+        while not pending.empty() and time.perf_counter() < drain_deadline:
+            time.sleep(0.05)
+        stop.set()
+        # 仍在排队的请求不再处理，正在处理的请求受会话超时限制，等待所有会话线程结束后再汇总
+        dropped = 0
+        while True:
+            try:
+                pending.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                break
+        for t in threads:
+            t.join()
+        with self._lock:
+            for _ in range(dropped):
+                records.append({"session": None, "latency": None, "wait": None, "ok": False,
+                                "error": "排队超时未处理", "done": None})
+        result = self._summarize("open", concurrency, records, time.perf_counter() - start)
+        result["offered_rate"] = rate
+        result["arrivals"] = index
+        return result
+
+    def _summarize(self, mode: str, concurrency: int, records: List[Dict], elapsed: float) -> Dict:
+        ok = [r for r in records if r["ok"]]
+        errors: Dict[str, int] = {}
+        for r in records:
+            if not r["ok"]:
+                key = (r["error"] or "").split(":")[0]
+                errors[key] = errors.get(key, 0) + 1
+        total = len(records)
+        result = {
+            "mode": mode,
+            "concurrency": concurrency,
+            "requests": total,
+            "succeeded": len(ok),
+            "error_rate": round((total - len(ok)) / total * 100, 2) if total else 0.0,
+            "errors": errors,
+            "elapsed": round(elapsed, 3),
+            "throughput": round(len(ok) / elapsed, 3) if elapsed > 0 else 0.0,
+            "latency_ms": describe([r["latency"] * 1000 for r in ok]),
+            "wait_ms": describe([r["wait"] * 1000 for r in ok]),
+        }
+        s = result["latency_ms"]
+        self._log(f"[{mode}] 并发 {concurrency}: {total} 个请求，吞吐 {result['throughput']:.2f}/s，"
+                  f"错误率 {result['error_rate']:.1f}%，延迟中位数 {s['p50']:.0f}ms P95 {s['p95']:.0f}ms")
+        return result
+
+    def sweep(self, levels: List[int], mode: str = "closed", duration: float = 30.0, rate: float = 1.0,
+              think_time: float = 0.0) -> List[Dict]:
+        """依次在各并发度下施加负载，返回每个并发度的结果"""
+        results = []
+        for level in levels:
+            if mode == "open":
+                results.append(self.run_open(rate, level, duration))
+            else:
+                results.append(self.run_closed(level, duration, think_time=think_time))
+        return results
+
+
+def find_saturation(results: List[Dict], min_gain: float = 0.1) -> Optional[int]:
+    """吞吐量增幅低于 min_gain（比例）而延迟上升的第一个并发度，即后端开始饱和的位置"""
+    for prev, cur in zip(results, results[1:]):
+        if not prev["throughput"]:
+            continue
+        gain = cur["throughput"] / prev["throughput"] - 1
+        if gain < min_gain and cur["latency_ms"]["p50"] > prev["latency_ms"]["p50"]:
+            return cur["concurrency"]
+    return None
+
+
+def print_table(results: List[Dict]):
+    print(f"{'并发':>6}{'请求数':>8}{'吞吐/s':>10}{'错误率%':>10}{'P50 ms':>10}{'P95 ms':>10}{'P99 ms':>10}")
+    for r in results:
+        s = r["latency_ms"]
+        print(f"{r['concurrency']:>6}{r['requests']:>8}{r['throughput']:>10.2f}{r['error_rate']:>10.1f}"
+              f"{s['p50']:>10.0f}{s['p95']:>10.0f}{s['p99']:>10.0f}")
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="灵犀·晓伴多会话并发对话负载生成")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="对话HTTP接口地址")
+    target.add_argument("--simulate", action="store_true", help="启动本地模拟后端（CI使用）")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed", help="闭环或开环负载")
+    parser.add_argument("--levels", default="1,2,4,8", help="并发度列表，逗号分隔")
+    parser.add_argument("--duration", type=float, default=30.0, help="每个并发度的持续时间（秒）")
+    parser.add_argument("--rate", type=float, default=1.0, help="开环模式下的请求到达速率（个/秒）")
+    parser.add_argument("--think-time", type=float, default=0.0, help="闭环模式下两次提问之间的间隔（秒）")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时（秒）")
+    parser.add_argument("--capacity", type=int, default=4, help="模拟后端的并发处理上限")
+    parser.add_argument("--service-time", type=float, default=0.2, help="模拟后端单个请求的处理时间（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟后端的出错概率")
+    parser.add_argument("--json", dest="json_path", help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    backend = None
+    url = args.url
+    if args.simulate:
+        backend = SimulatedChatBackend(capacity=args.capacity, service_time=args.service_time,
+                                       error_rate=args.error_rate).start()
+        url = backend.url
+        print(f"模拟后端已启动: {url}")
+    try:
+        generator = ChatLoadGenerator(lambda i: HttpChatSession(url, timeout=args.timeout, name=f"http-{i}"),
+                                      questions=[(q, None) for q, _ in DEFAULT_QUESTIONS])
+        results = generator.sweep(levels, mode=args.mode, duration=args.duration, rate=args.rate,
+                                  think_time=args.think_time)
+    finally:
+        if backend:
+            backend.stop()
+
+    print_table(results)
+    knee = find_saturation(results)
+    if knee:
+        print(f"\n并发度 {knee} 起吞吐量不再明显增长，延迟上升（后端接近饱和）")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"levels": results, "saturation": knee}, f, ensure_ascii=False, indent=2)
+    return 0 if all(r["succeeded"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
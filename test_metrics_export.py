@@ -0,0 +1,308 @@
+"""
+运行指标的Prometheus文本格式导出
+
+每次运行结束时把指标写成Prometheus文本格式（0.0.4）文件，供node-exporter的textfile collector采集：
+  - suxiaoban_test_duration_seconds      每个测试的耗时直方图
+  - suxiaoban_test_results_total         按测试和状态（pass/fail/retry/skip/quarantine）计数
+  - suxiaoban_chat_generation_seconds    AI对话回复生成耗时直方图
+  - suxiaoban_startup_seconds            启动时间基准测试各阶段的分布统计
+  - suxiaoban_resource_*                 soak测试资源样本的摘要（峰值、均值、增长斜率）
+长时间的soak测试还可以通过本地HTTP端点实时暴露同样的指标（含最新一次资源样本）。
+
+标签取值的数量有上限（超出的取值合并为 "other"），避免测试名称等标签导致时间序列数量失控；
+测试名标签的取值上限由所有指标共享（LabelLimit），同一个测试在各指标中要么都保留名称，要么都合并为 other。
+"""
+
+import os
+import math
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OVERFLOW_LABEL = "other"
+
+TEST_DURATION_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+CHAT_GENERATION_BUCKETS = (1, 2, 3, 5, 8, 10, 15, 20, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return str(text).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _format_bound(bound: float) -> str:
+    """桶上界按浮点数的规范形式输出（1.0 而不是 1），同一个桶在不同导出方之间保持相同的 le 取值"""
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class LabelLimit:
+    """一个标签的取值上限，可由多个指标共享：先出现的 max_values 个取值保留，之后的取值合并为 other"""
+
+    def __init__(self, max_values: int = 50):
+        self.max_values = max_values
+        self._values = set()
+        self._lock = threading.Lock()
+
+    def admit(self, value: str) -> str:
+        with self._lock:
+            if value in self._values:
+                return value
+            if len(self._values) < self.max_values:
+                self._values.add(value)
+                return value
+        return OVERFLOW_LABEL
+
+
+class _Metric:
+    """指标基类：按标签取值分组保存数据，标签组合数量超过上限时合并为 other
+
+    limits 为 {标签名: LabelLimit}，这些标签的取值先按共享的上限合并
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), max_series: int = 50,
+                 limits: Optional[Dict[str, LabelLimit]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.max_series = max_series
+        self.limits = limits or {}
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        key = tuple(self.limits[l].admit(str(labels.get(l, ""))) if l in self.limits else str(labels.get(l, ""))
+                    for l in self.labels)
+        if key not in self._series and len(self._series) >= self.max_series:
+            # 只替换第一个标签（通常是测试名），其余标签（状态、阶段等）本身取值有限
+            key = (OVERFLOW_LABEL,) + key[1:]
+        return key
+
+    def _label_str(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{l}="{_escape(v)}"' for l, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.help_text)}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            for key in sorted(self._series):
+                lines.extend(self._render_series(key, self._series[key]))
+        return lines
+
+    def _render_series(self, key, data) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """计数器，名称需要带 _total 后缀（文本格式中指标族名称与样本名称相同）"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), max_series: int = 50,
+                 limits: Optional[Dict[str, LabelLimit]] = None):
+        if not name.endswith("_total"):
+            raise ValueError(f"计数器名称需要以 _total 结尾: {name}")
+        super().__init__(name, help_text, labels, max_series, limits)
+
+    def inc(self, amount: float = 1.0, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def _render_series(self, key, data) -> List[str]:
+        return [f"{self.name}{self._label_str(key)} {_format_value(data)}"]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = float(value)
+
+    def _render_series(self, key, data) -> List[str]:
+        return [f"{self.name}{self._label_str(key)} {_format_value(data)}"]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = TEST_DURATION_BUCKETS, max_series: int = 50,
+                 limits: Optional[Dict[str, LabelLimit]] = None):
+        super().__init__(name, help_text, labels, max_series, limits)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        with self._lock:
+            key = self._key(labels)
+            data = self._series.get(key)
+            if data is None:
+                data = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data["counts"][i] += 1
+                    break
+            data["sum"] += value
+            data["count"] += 1
+
+    def _render_series(self, key, data) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, data["counts"]):
+            cumulative += count
+            le = f'le="{_format_bound(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_str(key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_str(key)} {_format_value(data['sum'])}")
+        lines.append(f"{self.name}_count{self._label_str(key)} {data['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标集合，负责渲染和写出"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path):
+        """原子写入（先写临时文件再替换），采集器不会读到写了一半的文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class MetricsServer:
+    """在本地HTTP端点上实时暴露指标（GET /metrics）"""
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1"):
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RunMetrics:
+    """把测试结果转换为指标"""
+
+    def __init__(self, max_tests: int = 50):
+        self.registry = MetricsRegistry()
+        r = self.registry
+        # 测试名取值上限由各指标共享，序列数上限只作为兜底（max_tests 个测试名加 other，每个测试最多6种状态）
+        tests = {"test": LabelLimit(max_tests)}
+        self.test_duration = r.register(Histogram(
+            "suxiaoban_test_duration_seconds", "Duration of each test result.", ["test"],
+            TEST_DURATION_BUCKETS, max_series=max_tests + 1, limits=tests))
+        self.test_results = r.register(Counter(
+            "suxiaoban_test_results_total", "Test results by status.", ["test", "status"],
+            max_series=(max_tests + 1) * 6, limits=tests))
+        self.chat_generation = r.register(Histogram(
+            "suxiaoban_chat_generation_seconds", "Time from sending a question to the expected answer appearing.",
+            buckets=CHAT_GENERATION_BUCKETS))
+        self.startup = r.register(Gauge(
+            "suxiaoban_startup_seconds", "Startup benchmark phase statistics.", ["phase", "stat"]))
+        self.resource_summary = r.register(Gauge(
+            "suxiaoban_resource_summary", "Soak resource sample summary.", ["metric", "stat"]))
+        self.resource_current = r.register(Gauge(
+            "suxiaoban_resource_current", "Latest soak resource sample.", ["metric"]))
+        self.last_run = r.register(Gauge(
+            "suxiaoban_last_run_timestamp_seconds", "Unix time when the metrics were last written."))
+
+    @staticmethod
+    def _status(result: Dict) -> str:
+        if result.get("retried"):
+            return "retry"
+        if result.get("skipped"):
+            return "skip"
+        if result["passed"]:
+            return "cached" if result.get("cached") else "pass"
+        return "quarantine" if result.get("quarantined") else "fail"
+
+    def observe_result(self, result: Dict):
+        """记录一条测试结果，测试标签使用方法名（没有时使用结果名称）"""
+        test = result.get("test") or result["name"]
+        self.test_results.inc(test=test, status=self._status(result))
+        if result.get("duration") is not None and not result.get("skipped") and not result.get("cached"):
+            self.test_duration.observe(result["duration"], test=test)
+        if result.get("generation_time"):
+            self.chat_generation.observe(result["generation_time"])
+        startup = result.get("startup")
+        if startup:
+            for phase, stats in startup.get("stats", {}).items():
+                if stats.get("count"):
+                    for stat in ("p50", "p95", "mean", "max"):
+                        self.startup.set(stats[stat], phase=phase, stat=stat)
+        resources = result.get("resources")
+        if resources:
+            for metric, stats in resources.get("metrics", {}).items():
+                for stat in ("max", "mean", "slope_per_hour"):
+                    if stats.get(stat) is not None:
+                        self.resource_summary.set(stats[stat], metric=metric, stat=stat)
+
+    def observe_sample(self, values: Dict[str, float]):
+        """记录一次资源样本（soak期间实时更新）"""
+        for metric, value in values.items():
+            self.resource_current.set(value, metric=metric)
+
+    def write_textfile(self, path: Path):
+        self.last_run.set(time.time())
+        self.registry.write_textfile(path)
@@ -0,0 +1,75 @@
+"""
+按历史结果安排测试顺序
+
+修复问题后重新运行测试时，最关心的测试往往排在最后。根据已保存的运行历史
+（RunHistoryAnalyzer.method_history，增量缓存，数千次运行也只需读取缓存）给测试排序：
+  - failed-first: 上次失败的测试和新增的测试最先运行，其次是最近不稳定的测试，其余在后；
+                  同一档内耗时短的在前，尽快得到反馈
+  - fast:         只按历史平均耗时从短到长
+  - declared:     保持声明顺序（默认）
+与 fail_fast（第一个测试失败后跳过其余测试）一起使用时，开发者通常几秒内就能看到结果。
+
+用法:
+    python test_prioritizer.py --order failed-first      # 显示排序结果和依据
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+ORDER_MODES = ("declared", "failed-first", "fast")
+
+
+def priority_tier(stats: Optional[Dict]) -> int:
+    """0: 上次失败或没有历史；1: 最近出现过失败或结果翻转；2: 稳定通过"""
+    if not stats or stats.get("last_passed") is None or stats["last_passed"] is False:
+        return 0
+    if stats.get("recent_failures") or stats.get("flips"):
+        return 1
+    return 2
+
+
+def prioritize(names: Iterable[str], history: Dict[str, Dict], mode: str = "failed-first",
+               default_duration: float = 60.0) -> List[str]:
+    """按 mode 返回排序后的测试名（排序稳定，同等条件下保持原顺序）"""
+    if mode not in ORDER_MODES:
+        raise ValueError(f"未知排序方式: {mode}（可选: {', '.join(ORDER_MODES)}）")
+    names = list(names)
+    if mode == "declared":
+        return names
+
+    def duration(name: str) -> float:
+        value = (history.get(name) or {}).get("mean_duration")
+        return default_duration if value is None else value
+
+    if mode == "fast":
+        return sorted(names, key=duration)
+    return sorted(names, key=lambda n: (priority_tier(history.get(n)), duration(n)))
+
+
+def main(argv=None):
+    """命令行入口：显示按历史结果排序后的测试顺序"""
+    from test_report_analyzer import RunHistoryAnalyzer
+
+    parser = argparse.ArgumentParser(description="按历史结果安排测试顺序")
+    parser.add_argument("--log-dir", default=str(Path(__file__).parent / "test_logs"), help="测试日志根目录")
+    parser.add_argument("--order", choices=ORDER_MODES[1:], default="failed-first")
+    parser.add_argument("--recent", type=int, default=20, help="参考最近多少次运行")
+    args = parser.parse_args(argv)
+
+    history = RunHistoryAnalyzer(Path(args.log_dir)).method_history(args.recent)
+    if not history:
+        print(f"未在 {args.log_dir} 中找到任何运行结果")
+        return 1
+    labels = {0: "上次失败", 1: "最近不稳定", 2: "稳定"}
+    print(f"{'测试方法':<28}{'分档':<10}{'运行数':>6}{'近期失败':>8}{'平均耗时s':>10}")
+    for name in prioritize(history, history, args.order):
+        h = history[name]
+        mean = f"{h['mean_duration']:.2f}" if h["mean_duration"] is not None else "-"
+        print(f"{name:<28}{labels[priority_tier(h)]:<10}{h['runs']:>6}{h['recent_failures']:>8}{mean:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+多次运行结果汇总与不稳定测试分析
+
+扫描 test_logs/run_* 目录，并行解析每次运行的结果，统计每个测试的通过率、
+不稳定率（同一次运行中重试前后结果不一致，或相邻两次运行结果翻转）以及耗时趋势。
+每个运行目录的解析结果按文件修改时间缓存，重复执行时只解析新增或变化的目录；
+结果文件超过一天未变化的运行视为已结束，直接使用缓存，不再逐个检查文件。
+
+用法:
+    python test_report_analyzer.py [--log-dir test_logs] [--workers 4] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from test_result_journal import iter_journal
+
+CACHE_VERSION = 3
+CACHE_FILE_NAME = ".analysis_cache.json"
+JOURNAL_FILE_NAME = "results.ndjson"
+SETTLE_SECONDS = 24 * 3600
+
+
+def _run_signature(run_dir: Path) -> List:
+    """运行目录的签名：结果文件的名称、修改时间和大小"""
+    signature = []
+    with os.scandir(run_dir) as it:
+        for entry in it:
+            if entry.name == JOURNAL_FILE_NAME or (entry.name.startswith("test_report_") and entry.name.endswith(".json")):
+                st = entry.stat()
+                signature.append([entry.name, st.st_mtime_ns, st.st_size])
+    signature.sort()
+    return signature
+
+
+def _iter_run_results(run_dir: Path):
+    """流式读取一次运行的结果，优先使用结果日志，旧运行回退到JSON报告"""
+    journal_path = run_dir / JOURNAL_FILE_NAME
+    if journal_path.exists():
+        yield from iter_journal(journal_path)
+        return
+
+    # 旧版本只生成JSON报告，同一运行可能生成多份，取最新的一份
+    reports = sorted(run_dir.glob("test_report_*.json"))
+    if not reports:
+        return
+    try:
+        with open(reports[-1], "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return
+    yield from report.get("results", [])
+
+
+def parse_run_dir(run_dir: str) -> Dict:
+    """解析单个运行目录
+
+    返回 {"tests": {测试名: {"outcomes": [...], "durations": [...]}}, "methods": {测试方法名: 总耗时},
+    "method_outcomes": {测试方法名: 是否通过}}。methods 包含重试在内的实际耗时，用于按时间预算安排测试；
+    method_outcomes 只看最后一次尝试的结果；被跳过的结果和复用缓存的结果不计入
+    """
+    tests, methods, method_outcomes = {}, {}, {}
+    for result in _iter_run_results(Path(run_dir)):
+        name = result.get("name")
+        if not name or result.get("skipped") or result.get("cached"):
+            continue
+        passed = bool(result.get("passed"))
+        entry = tests.setdefault(name, {"outcomes": [], "durations": []})
+        entry["outcomes"].append(passed)
+        method = result.get("test")
+        if method and not result.get("retried"):
+            method_outcomes[method] = method_outcomes.get(method, True) and passed
+        duration = result.get("duration")
+        if isinstance(duration, (int, float)):
+            entry["durations"].append(duration)
+            if method:
+                methods[method] = methods.get(method, 0.0) + duration
+    return {"tests": tests, "methods": methods, "method_outcomes": method_outcomes}
+
+
+def _slope(values: List[float]) -> float:
+    """最小二乘拟合斜率（横轴为运行序号）"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    num = sum((i - mean_x) * (v - mean_y) for i, v in enumerate(values))
+    den = sum((i - mean_x) ** 2 for i in range(n))
+    return num / den if den else 0.0
+
+
+class RunHistoryAnalyzer:
+    """多次运行结果分析器"""
+
+    def __init__(self, base_log_dir: Path, workers: Optional[int] = None, use_cache: bool = True):
+        self.base_log_dir = Path(base_log_dir)
+        self.workers = workers
+        self.use_cache = use_cache
+        self.cache_path = self.base_log_dir / CACHE_FILE_NAME
+
+    def _load_cache(self) -> Dict:
+        if not self.use_cache or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("runs", {})
+
+    def _save_cache(self, runs: Dict):
+        if not self.use_cache:
+            return
+        tmp_path = self.cache_path.with_name(f".{self.cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "runs": runs}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def load_runs(self) -> List[Dict]:
+        """加载所有运行目录的解析结果（按运行时间排序），增量更新缓存"""
+        if not self.base_log_dir.exists():
+            return []
+
+        with os.scandir(self.base_log_dir) as it:
+            run_dirs = sorted(Path(e.path) for e in it if e.name.startswith("run_") and e.is_dir())
+        cached = self._load_cache()
+        settled_before = (time.time() - SETTLE_SECONDS) * 1e9
+        runs = {}
+        pending = []
+
+        for run_dir in run_dirs:
+            entry = cached.get(run_dir.name)
+            # 已结束的运行不会再变化，不必逐个读取目录
+            if entry and max(mtime for _, mtime, _ in entry["signature"]) < settled_before:
+                runs[run_dir.name] = entry
+                continue
+            signature = _run_signature(run_dir)
+            if not signature:
+                continue
+            if entry and entry.get("signature") == signature:
+                runs[run_dir.name] = entry
+            else:
+                pending.append((run_dir, signature))
+
+        if pending:
+            if len(pending) == 1:
+                parsed = [parse_run_dir(str(pending[0][0]))]
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    parsed = list(pool.map(parse_run_dir, [str(d) for d, _ in pending], chunksize=8))
+            for (run_dir, signature), data in zip(pending, parsed):
+                runs[run_dir.name] = dict(signature=signature, **data)
+
+        if pending or len(runs) != len(cached):
+            self._save_cache(runs)
+
+        return [dict(run=name, tests=runs[name]["tests"], methods=runs[name]["methods"],
+                     method_outcomes=runs[name]["method_outcomes"]) for name in sorted(runs)]
+
+    def analyze(self) -> Dict[str, Dict]:
+        """按测试名汇总通过率、不稳定率和耗时趋势"""
+        runs = self.load_runs()
+        history = {}
+        for run in runs:
+            for name, data in run["tests"].items():
+                history.setdefault(name, []).append((run["run"], data))
+
+        stats = {}
+        for name, entries in history.items():
+            final_outcomes = [data["outcomes"][-1] for _, data in entries]
+            mixed_runs = sum(1 for _, data in entries if len(set(data["outcomes"])) > 1)
+            flips = sum(1 for a, b in zip(final_outcomes, final_outcomes[1:]) if a != b)
+            flaky_runs = 0
+            for i, (_, data) in enumerate(entries):
+                flipped = i > 0 and final_outcomes[i] != final_outcomes[i - 1]
+                if len(set(data["outcomes"])) > 1 or flipped:
+                    flaky_runs += 1
+
+            mean_durations = [sum(d["durations"]) / len(d["durations"]) for _, d in entries if d["durations"]]
+            run_count = len(entries)
+            stats[name] = {
+                "runs": run_count,
+                "passed_runs": sum(final_outcomes),
+                "pass_rate": round(sum(final_outcomes) / run_count * 100, 2),
+                "mixed_runs": mixed_runs,
+                "flips": flips,
+                "flake_rate": round(flaky_runs / run_count * 100, 2),
+                "last_passed": final_outcomes[-1],
+                "last_run": entries[-1][0],
+                "mean_duration": round(sum(mean_durations) / len(mean_durations), 3) if mean_durations else None,
+                "recent_duration": round(mean_durations[-1], 3) if mean_durations else None,
+                "duration_slope": round(_slope(mean_durations), 4),
+            }
+        return stats
+
+    def method_durations(self, recent: int = 10) -> Dict[str, float]:
+        """各测试方法最近 recent 次运行的平均总耗时（秒）"""
+        history = {}
+        for run in self.load_runs():
+            for method, duration in run["methods"].items():
+                history.setdefault(method, []).append(duration)
+        return {m: round(sum(d[-recent:]) / len(d[-recent:]), 3) for m, d in history.items()}
+
+    def method_history(self, recent: int = 20) -> Dict[str, Dict]:
+        """各测试方法最近 recent 次运行的结果摘要，用于安排测试顺序
+
+        返回 {方法名: {"runs", "last_passed", "recent_failures", "flips", "mean_duration"}}
+        """
+        history = {}
+        for run in self.load_runs():
+            for method, passed in run["method_outcomes"].items():
+                history.setdefault(method, {"outcomes": [], "durations": []})["outcomes"].append(passed)
+            for method, duration in run["methods"].items():
+                history.setdefault(method, {"outcomes": [], "durations": []})["durations"].append(duration)
+
+        summary = {}
+        for method, h in history.items():
+            outcomes, durations = h["outcomes"][-recent:], h["durations"][-recent:]
+            summary[method] = {
+                "runs": len(h["outcomes"]),
+                "last_passed": outcomes[-1] if outcomes else None,
+                "recent_failures": outcomes.count(False),
+                "flips": sum(1 for a, b in zip(outcomes, outcomes[1:]) if a != b),
+                "mean_duration": round(sum(durations) / len(durations), 3) if durations else None,
+            }
+        return summary
+
+
+def _print_table(stats: Dict[str, Dict], top: int):
+    rows = sorted(stats.items(), key=lambda kv: (-kv[1]["flake_rate"], kv[1]["pass_rate"], kv[0]))
+    if top:
+        rows = rows[:top]
+    print(f"{'测试名称':<20}{'运行数':>8}{'通过率%':>10}{'不稳定率%':>12}{'翻转':>6}{'平均耗时s':>12}{'耗时斜率':>10}")
+    for name, s in rows:
+        mean = f"{s['mean_duration']:.2f}" if s["mean_duration"] is not None else "-"
+        print(f"{name:<20}{s['runs']:>8}{s['pass_rate']:>10.1f}{s['flake_rate']:>12.1f}{s['flips']:>6}{mean:>12}{s['duration_slope']:>10.3f}")
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="汇总 test_logs 下的多次运行结果并分析不稳定测试")
+    parser.add_argument("--log-dir", default=str(Path(__file__).parent / "test_logs"), help="测试日志根目录")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数，默认为CPU核数")
+    parser.add_argument("--no-cache", action="store_true", help="忽略并不写入解析缓存")
+    parser.add_argument("--top", type=int, default=0, help="只显示最不稳定的前N个测试")
+    parser.add_argument("--json", dest="json_path", help="将分析结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    analyzer = RunHistoryAnalyzer(Path(args.log_dir), workers=args.workers, use_cache=not args.no_cache)
+    stats = analyzer.analyze()
+    if not stats:
+        print(f"未在 {args.log_dir} 中找到任何运行结果")
+        return 1
+
+    _print_table(stats, args.top)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        print(f"\n分析结果已写入: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,20 @@
 测试结果报告生成器
 """
 
+import csv
 import json
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Tuple, Union
+
+from test_result_journal import ResultJournal, open_results, replayable_results
+from test_report_paged import PagedReportWriter
+
+# 结果来源：内存中的结果列表、ResultJournal 或 NDJSON 日志路径（生成器等一次性迭代器会先转换为列表）
+ResultSource = Union[Iterable[Dict], ResultJournal, str, Path]
 
 
 class TestReportGenerator:
@@ -16,16 +25,62 @@ class TestReportGenerator:
         self.log_dir = log_dir
         self.log_dir.mkdir(exist_ok=True)
     
-    def generate_html_report(self, test_results: List[Dict], output_path: str = None) -> str:
+    def summarize(self, test_results: ResultSource) -> Dict:
+        """流式统计通过/失败数量和总耗时，结果可在各格式报告之间共享
+        
+        被重试的尝试（retried）只计入重试次数，被隔离测试的失败（quarantined）和
+        被跳过的测试（skipped，如超出时间预算）单独统计；复用缓存的结果（cached）计入通过数，同时单独计数
+        """
+        passed = failed = retried = quarantined = skipped = cached = 0
+        duration = 0.0
+        for r in open_results(test_results):
+            duration += r.get("duration") or 0
+            if r.get("retried"):
+                retried += 1
+            elif r.get("skipped"):
+                skipped += 1
+            elif r["passed"]:
+                passed += 1
+                if r.get("cached"):
+                    cached += 1
+            elif r.get("quarantined"):
+                quarantined += 1
+            else:
+                failed += 1
+        total = passed + failed + quarantined
+        pass_rate = (passed / total * 100) if total > 0 else 0
+        return {"total": total, "passed": passed, "failed": failed, "pass_rate": pass_rate, "duration": duration,
+                "retried": retried, "quarantined": quarantined, "skipped": skipped, "cached": cached}
+    
+    @staticmethod
+    def _status(result: Dict):
+        """结果状态文字和样式"""
+        if result["passed"]:
+            return ("CACHED", "status-pass") if result.get("cached") else ("PASS", "status-pass")
+        if result.get("retried"):
+            return "RETRY", "status-skip"
+        if result.get("quarantined"):
+            return "QUARANTINE", "status-skip"
+        if result.get("skipped"):
+            return "SKIP", "status-skip"
+        return "FAIL", "status-fail"
+    
+    def _default_path(self, ext: str) -> Path:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        return self.log_dir / f"test_report_{timestamp}.{ext}"
+    
+    def generate_html_report(self, test_results: ResultSource, output_path: str = None, summary: Dict = None) -> str:
         """生成HTML格式的测试报告"""
+        test_results = replayable_results(test_results)
         if output_path is None:
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            output_path = self.log_dir / f"test_report_{timestamp}.html"
+            output_path = self._default_path("html")
         
-        passed = sum(1 for r in test_results if r["passed"])
-        failed = sum(1 for r in test_results if not r["passed"])
-        total = len(test_results)
-        pass_rate = (passed / total * 100) if total > 0 else 0
+        if summary is None:
+            summary = self.summarize(test_results)
+        total = summary["total"]
+        passed = summary["passed"]
+        failed = summary["failed"]
+        pass_rate = summary["pass_rate"]
         
         html = f"""<!DOCTYPE html>
 <html lang="zh-CN">
@@ -101,6 +156,12 @@ class TestReportGenerator:
             padding: 4px 8px;
             border-radius: 4px;
         }}
+        .status-skip {{
+            background-color: #9e9e9e;
+            color: white;
+            padding: 4px 8px;
+            border-radius: 4px;
+        }}
         .timestamp {{
             text-align: center;
             color: #666;
@@ -143,20 +204,23 @@ class TestReportGenerator:
             <tbody>
 """
         
-        for result in test_results:
-            status_class = "status-pass" if result["passed"] else "status-fail"
-            status_text = "PASS" if result["passed"] else "FAIL"
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(html)
             
-            html += f"""
+            # 逐行写入结果，避免在内存中拼接整个报告
+            for result in open_results(test_results):
+                status_text, status_class = self._status(result)
+                
+                f.write(f"""
                 <tr>
                     <td>{result['name']}</td>
                     <td><span class="{status_class}">{status_text}</span></td>
                     <td>{result.get('message', '')}</td>
                     <td>{result.get('timestamp', '')}</td>
                 </tr>
-"""
-        
-        html += f"""
+""")
+            
+            f.write(f"""
             </tbody>
         </table>
         
@@ -166,47 +230,161 @@ class TestReportGenerator:
     </div>
 </body>
 </html>
-"""
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html)
+""")
         
         return str(output_path)
     
-    def generate_json_report(self, test_results: List[Dict], output_path: str = None) -> str:
+    def generate_json_report(self, test_results: ResultSource, output_path: str = None, summary: Dict = None) -> str:
         """生成JSON格式的测试报告"""
+        test_results = replayable_results(test_results)
         if output_path is None:
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            output_path = self.log_dir / f"test_report_{timestamp}.json"
-        
-        passed = sum(1 for r in test_results if r["passed"])
-        failed = sum(1 for r in test_results if not r["passed"])
-        total = len(test_results)
-        pass_rate = (passed / total * 100) if total > 0 else 0
+            output_path = self._default_path("json")
         
-        report = {
-            "summary": {
-                "total": total,
-                "passed": passed,
-                "failed": failed,
-                "pass_rate": round(pass_rate, 2)
-            },
-            "results": test_results,
-            "generated_at": datetime.now().isoformat()
+        if summary is None:
+            summary = self.summarize(test_results)
+        summary = {
+            "total": summary["total"],
+            "passed": summary["passed"],
+            "failed": summary["failed"],
+            "pass_rate": round(summary["pass_rate"], 2),
+            "retried": summary.get("retried", 0),
+            "quarantined": summary.get("quarantined", 0),
+            "skipped": summary.get("skipped", 0),
+            "cached": summary.get("cached", 0)
         }
         
+        # 流式写出，结构与一次性 json.dump(indent=2) 的结果一致
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write('{\n  "summary": ')
+            f.write(json.dumps(summary, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            f.write(',\n  "results": [')
+            first = True
+            for result in open_results(test_results):
+                f.write("\n    " if first else ",\n    ")
+                f.write(json.dumps(result, ensure_ascii=False, indent=2).replace("\n", "\n    "))
+                first = False
+            f.write("\n  ]" if not first else "]")
+            f.write(f',\n  "generated_at": {json.dumps(datetime.now().isoformat())}\n}}')
         
         return str(output_path)
     
-    def generate_all_reports(self, test_results: List[Dict]):
-        """生成所有格式的报告"""
-        html_path = self.generate_html_report(test_results)
-        json_path = self.generate_json_report(test_results)
+    def generate_junit_report(self, test_results: ResultSource, output_path: str = None, summary: Dict = None) -> str:
+        """生成JUnit XML格式的测试报告（供CI解析）"""
+        test_results = replayable_results(test_results)
+        if output_path is None:
+            output_path = self._default_path("xml")
+        
+        if summary is None:
+            summary = self.summarize(test_results)
+        tests = summary["total"] + summary.get("skipped", 0)
+        skipped = summary.get("quarantined", 0) + summary.get("skipped", 0)
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(f'<testsuites tests="{tests}" failures="{summary["failed"]}" time="{summary["duration"]:.3f}">\n')
+            f.write(f'  <testsuite name="suxiaoban" tests="{tests}" failures="{summary["failed"]}" '
+                    f'errors="0" skipped="{skipped}" time="{summary["duration"]:.3f}" '
+                    f'timestamp={quoteattr(datetime.now().isoformat())}>\n')
+            for result in open_results(test_results):
+                # 被重试的尝试不作为独立用例输出，只保留最终结果
+                if result.get("retried"):
+                    continue
+                duration = result.get("duration") or 0
+                f.write(f'    <testcase classname="suxiaoban" name={quoteattr(result["name"])} time="{duration:.3f}"')
+                message = result.get("message", "")
+                if result["passed"]:
+                    if result.get("cached"):
+                        message = f"[cached from {result.get('cached_from', '')}] {message}"
+                    f.write(f'>\n      <system-out>{escape(message)}</system-out>\n    </testcase>\n')
+                elif result.get("quarantined"):
+                    f.write(f'>\n      <skipped message={quoteattr("quarantined: " + message)}/>\n    </testcase>\n')
+                elif result.get("skipped"):
+                    f.write(f'>\n      <skipped message={quoteattr(message)}/>\n    </testcase>\n')
+                else:
+                    f.write(f'>\n      <failure message={quoteattr(message)}>{escape(message)}</failure>\n    </testcase>\n')
+            f.write('  </testsuite>\n</testsuites>\n')
+        
+        return str(output_path)
+    
+    def generate_csv_report(self, test_results: ResultSource, output_path: str = None, summary: Dict = None) -> str:
+        """生成CSV格式的测试报告（可直接用Excel打开）"""
+        if output_path is None:
+            output_path = self._default_path("csv")
+        
+        columns = ["name", "passed", "message", "timestamp", "duration", "attempt", "retried", "quarantined", "skipped", "cached"]
+        # utf-8-sig 带BOM，Excel打开中文不会乱码
+        with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for result in open_results(test_results):
+                writer.writerow(result)
+        
+        return str(output_path)
+    
+    def generate_paged_html_report(self, test_results: ResultSource, output_path: str = None, summary: Dict = None,
+                                   chunk_size: int = 5000, embed: bool = False) -> str:
+        """生成分页HTML报告（虚拟滚动 + 筛选 + 截图缩略图），适用于大规模运行结果
+        
+        数据按chunk_size分块写入 <报告名>_data/ 目录，embed=True时内嵌为单个HTML文件
+        """
+        test_results = replayable_results(test_results)
+        if output_path is None:
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            output_path = self.log_dir / f"test_report_paged_{timestamp}.html"
+        
+        if summary is None:
+            summary = self.summarize(test_results)
+        
+        writer = PagedReportWriter(self.log_dir, chunk_size=chunk_size, embed=embed)
+        return writer.write(test_results, output_path, summary)
+    
+    def generate_all_reports(self, test_results: ResultSource, formats=("html", "json", "junit", "csv")) -> Dict[str, str]:
+        """生成所有格式的报告（formats 可额外包含 "paged" 分页HTML报告）
+        
+        返回 {格式: 报告路径} 字典，如 {"html": ..., "json": ..., "junit": ..., "csv": ...}。
+        以前的版本返回 (html_path, json_path) 元组，需要元组时使用 generate_html_json_reports()。
+        汇总数据只统计一次，各格式报告并发写出：结果来自日志文件时使用进程池
+        （各进程独立流式读取日志，不受GIL限制），内存中的结果列表使用线程池
+        """
+        generators = {
+            "html": self.generate_html_report,
+            "json": self.generate_json_report,
+            "junit": self.generate_junit_report,
+            "csv": self.generate_csv_report,
+            "paged": self.generate_paged_html_report,
+        }
+        labels = {"html": "HTML报告", "json": "JSON报告", "junit": "JUnit报告", "csv": "CSV报告", "paged": "分页HTML报告"}
+        
+        if isinstance(test_results, ResultJournal):
+            test_results.flush()
+            test_results = test_results.path
+        # 汇总和各格式报告都要遍历结果，一次性迭代器先转换为列表
+        test_results = replayable_results(test_results)
+        
+        summary = self.summarize(test_results)
+        # 所有格式使用同一时间戳，便于对应
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        extensions = {"html": "html", "json": "json", "junit": "xml", "csv": "csv", "paged": "paged.html"}
+        
+        executor_cls = ProcessPoolExecutor if isinstance(test_results, (str, Path)) else ThreadPoolExecutor
+        with executor_cls(max_workers=len(formats)) as pool:
+            futures = {
+                fmt: pool.submit(
+                    generators[fmt], test_results,
+                    self.log_dir / f"test_report_{timestamp}.{extensions[fmt]}",
+                    summary
+                )
+                for fmt in formats
+            }
+            paths = {fmt: future.result() for fmt, future in futures.items()}
         
         print(f"\n测试报告已生成:")
-        print(f"  HTML报告: {html_path}")
-        print(f"  JSON报告: {json_path}")
+        for fmt in formats:
+            print(f"  {labels[fmt]}: {paths[fmt]}")
         
-        return html_path, json_path
+        return paths
+    
+    def generate_html_json_reports(self, test_results: ResultSource) -> Tuple[str, str]:
+        """只生成HTML和JSON报告，返回 (html_path, json_path)，与以前的 generate_all_reports() 返回值相同"""
+        paths = self.generate_all_reports(test_results, formats=("html", "json"))
+        return paths["html"], paths["json"]
@@ -0,0 +1,301 @@
+"""
+分页（虚拟滚动）HTML测试报告
+
+结果按块写成紧凑的JS数据文件（也可内嵌到HTML中），浏览器端只渲染可见的行，
+并支持按名称/消息和状态筛选。截图预先生成小尺寸缩略图，懒加载显示。
+数据块使用 <script> 方式加载，直接双击打开（file://）也能正常工作。
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from test_result_journal import open_results
+
+THUMBNAIL_SIZE = (160, 100)
+
+
+def _js_literal(value) -> str:
+    """转换为可安全放入 <script> 标签中的JSON字面量"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def _status_code(result: Dict) -> int:
+    """状态编码：0失败 1通过 2已重试 3已隔离 4已跳过 5复用缓存"""
+    if result["passed"]:
+        return 5 if result.get("cached") else 1
+    if result.get("retried"):
+        return 2
+    if result.get("quarantined"):
+        return 3
+    if result.get("skipped"):
+        return 4
+    return 0
+
+
+def make_thumbnail(src: Path, dst: Path, size=THUMBNAIL_SIZE) -> bool:
+    """生成截图缩略图，已存在且比原图新时直接复用"""
+    try:
+        if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+            return True
+        from PIL import Image
+        with Image.open(src) as img:
+            img.thumbnail(size)
+            img.convert("RGB").save(dst, "JPEG", quality=70)
+        return True
+    except ImportError:
+        return False
+    except OSError:
+        return False
+
+
+class PagedReportWriter:
+    """分页HTML报告写入器"""
+
+    def __init__(self, log_dir: Path, chunk_size: int = 5000, embed: bool = False):
+        self.log_dir = Path(log_dir)
+        self.chunk_size = chunk_size
+        self.embed = embed      # True时数据块内嵌到HTML，生成单个文件
+
+    def write(self, test_results, output_path: Path, summary: Dict) -> str:
+        output_path = Path(output_path)
+        data_dir_name = output_path.stem + "_data"
+        data_dir = output_path.parent / data_dir_name
+        thumb_dir = data_dir / "thumbs"
+        thumb_dir.mkdir(parents=True, exist_ok=True)
+
+        chunk_files: List[str] = []
+        embedded_chunks: List[str] = []
+        thumbnails: Dict[str, str] = {}
+        chunk: List[list] = []
+
+        def flush_chunk():
+            index = len(chunk_files) + len(embedded_chunks)
+            script = f"__reportChunk({index},{_js_literal(chunk)});"
+            if self.embed:
+                embedded_chunks.append(script)
+            else:
+                name = f"chunk_{index:05d}.js"
+                with open(data_dir / name, "w", encoding="utf-8") as f:
+                    f.write(script)
+                chunk_files.append(f"{data_dir_name}/{name}")
+            chunk.clear()
+
+        for result in open_results(test_results):
+            screenshot = result.get("screenshot")
+            thumb = None
+            if screenshot:
+                if screenshot not in thumbnails:
+                    thumbnails[screenshot] = f"{data_dir_name}/thumbs/{len(thumbnails):05d}.jpg"
+                thumb = thumbnails[screenshot]
+            chunk.append([
+                result["name"],
+                _status_code(result),
+                result.get("message", ""),
+                result.get("timestamp", ""),
+                result.get("duration"),
+                screenshot,
+                thumb,
+            ])
+            if len(chunk) >= self.chunk_size:
+                flush_chunk()
+        if chunk:
+            flush_chunk()
+
+        self._make_thumbnails(thumbnails, output_path.parent)
+
+        meta = {
+            "summary": {
+                "total": summary["total"],
+                "passed": summary["passed"],
+                "failed": summary["failed"],
+                "pass_rate": round(summary["pass_rate"], 1),
+            },
+            "chunks": chunk_files,
+            "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        html = PAGED_HTML_TEMPLATE.replace("__META__", _js_literal(meta))
+        html = html.replace("__EMBEDDED__", "\n".join(f"<script>{c}</script>" for c in embedded_chunks))
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        return str(output_path)
+
+    def _make_thumbnails(self, thumbnails: Dict[str, str], report_dir: Path):
+        """并行生成缩略图，失败的缩略图在页面上退化为文字链接"""
+        if not thumbnails:
+            return
+        jobs = [(self.log_dir / shot, report_dir / thumb) for shot, thumb in thumbnails.items()]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda job: make_thumbnail(*job), jobs))
+
+
+PAGED_HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>灵犀·晓伴测试报告</title>
+<style>
+    body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+    .container { max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+    h1 { color: #333; text-align: center; }
+    .summary { display: flex; justify-content: space-around; margin: 20px 0; padding: 20px; background: #f0f0f0; border-radius: 8px; }
+    .summary-item { text-align: center; }
+    .summary-value { font-size: 24px; font-weight: bold; }
+    .total { color: #666; } .passed { color: #4CAF50; } .failed { color: #f44336; } .pass-rate { color: #2196F3; }
+    .toolbar { display: flex; gap: 10px; margin-bottom: 10px; align-items: center; }
+    .toolbar input { flex: 1; padding: 6px; }
+    .row { display: grid; grid-template-columns: 3fr 70px 5fr 160px 70px 90px; height: 56px; align-items: center; border-bottom: 1px solid #eee; font-size: 13px; }
+    .row > div { overflow: hidden; text-overflow: ellipsis; white-space: nowrap; padding: 0 6px; }
+    .header { background: #4CAF50; color: white; font-weight: bold; height: 36px; }
+    #viewport { height: 70vh; overflow-y: auto; position: relative; border: 1px solid #ddd; }
+    #spacer { position: relative; }
+    #rows { position: absolute; left: 0; right: 0; top: 0; }
+    .status-pass { background: #4CAF50; color: white; padding: 2px 6px; border-radius: 4px; }
+    .status-fail { background: #f44336; color: white; padding: 2px 6px; border-radius: 4px; }
+    .status-skip { background: #9e9e9e; color: white; padding: 2px 6px; border-radius: 4px; }
+    .thumb { width: 80px; height: 50px; object-fit: cover; border: 1px solid #ccc; }
+    .timestamp { text-align: center; color: #666; margin-top: 20px; }
+</style>
+</head>
+<body>
+<div class="container">
+    <h1>灵犀·晓伴自动化测试报告</h1>
+    <div class="summary" id="summary"></div>
+    <div class="toolbar">
+        <input id="filter-text" placeholder="按测试名称或消息筛选...">
+        <select id="filter-status">
+            <option value="all">全部</option>
+            <option value="pass">仅通过</option>
+            <option value="fail">仅失败</option>
+        </select>
+        <span id="count"></span>
+    </div>
+    <div class="row header"><div>测试名称</div><div>状态</div><div>消息</div><div>时间</div><div>耗时</div><div>截图</div></div>
+    <div id="viewport"><div id="spacer"><div id="rows"></div></div></div>
+    <div class="timestamp" id="generated"></div>
+</div>
+<script>
+var META = __META__;
+var ROW_H = 56, OVERSCAN = 10;
+var STATUS = [["FAIL", "status-fail"], ["PASS", "status-pass"], ["RETRY", "status-skip"], ["QUARANTINE", "status-skip"], ["SKIP", "status-skip"], ["CACHED", "status-pass"]];
+var rows = [], view = null, loaded = 0, pending = false;
+var viewport = document.getElementById("viewport");
+var spacer = document.getElementById("spacer");
+var rowsEl = document.getElementById("rows");
+var textEl = document.getElementById("filter-text");
+var statusEl = document.getElementById("filter-status");
+
+(function () {
+    var s = META.summary;
+    var items = [[s.total, "total", "总测试数"], [s.passed, "passed", "通过"], [s.failed, "failed", "失败"], [s.pass_rate + "%", "pass-rate", "通过率"]];
+    var html = "";
+    for (var i = 0; i < items.length; i++) {
+        html += '<div class="summary-item"><div class="summary-value ' + items[i][1] + '">' + items[i][0] + '</div><div>' + items[i][2] + '</div></div>';
+    }
+    document.getElementById("summary").innerHTML = html;
+    document.getElementById("generated").textContent = "报告生成时间: " + META.generated_at;
+})();
+
+function matches(r) {
+    var status = statusEl.value, text = textEl.value.toLowerCase();
+    var passed = r[1] === 1 || r[1] === 5;
+    if (status === "pass" && !passed) return false;
+    if (status === "fail" && passed) return false;
+    if (text && (r[0] + " " + r[2]).toLowerCase().indexOf(text) < 0) return false;
+    return true;
+}
+
+function filterActive() { return textEl.value !== "" || statusEl.value !== "all"; }
+
+function refilter() {
+    if (!filterActive()) { view = null; } else {
+        view = [];
+        for (var i = 0; i < rows.length; i++) if (matches(rows[i])) view.push(i);
+    }
+    viewport.scrollTop = 0;
+    schedule();
+}
+
+function cell(text, cls) {
+    var d = document.createElement("div");
+    if (cls) d.className = cls;
+    d.textContent = text == null ? "" : text;
+    d.title = d.textContent;
+    return d;
+}
+
+function render() {
+    pending = false;
+    var count = view ? view.length : rows.length;
+    spacer.style.height = (count * ROW_H) + "px";
+    document.getElementById("count").textContent = count + " / " + rows.length + " 条";
+    var first = Math.max(0, Math.floor(viewport.scrollTop / ROW_H) - OVERSCAN);
+    var last = Math.min(count, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_H) + OVERSCAN);
+    var frag = document.createDocumentFragment();
+    for (var i = first; i < last; i++) {
+        var r = rows[view ? view[i] : i];
+        var row = document.createElement("div");
+        row.className = "row";
+        row.appendChild(cell(r[0]));
+        var st = cell("");
+        var badge = document.createElement("span");
+        badge.className = STATUS[r[1]][1];
+        badge.textContent = STATUS[r[1]][0];
+        st.appendChild(badge);
+        row.appendChild(st);
+        row.appendChild(cell(r[2]));
+        row.appendChild(cell(r[3]));
+        row.appendChild(cell(r[4] == null ? "" : r[4].toFixed(2) + "s"));
+        var shot = cell("");
+        if (r[5]) {
+            var a = document.createElement("a");
+            a.href = r[5]; a.target = "_blank";
+            if (r[6]) {
+                var img = document.createElement("img");
+                img.loading = "lazy"; img.className = "thumb"; img.src = r[6]; img.alt = "截图";
+                img.onerror = function () { this.replaceWith(document.createTextNode("查看截图")); };
+                a.appendChild(img);
+            } else { a.textContent = "查看截图"; }
+            shot.appendChild(a);
+        }
+        row.appendChild(shot);
+        frag.appendChild(row);
+    }
+    rowsEl.style.transform = "translateY(" + (first * ROW_H) + "px)";
+    rowsEl.replaceChildren(frag);
+}
+
+function schedule() {
+    if (!pending) { pending = true; requestAnimationFrame(render); }
+}
+
+window.__reportChunk = function (index, data) {
+    var start = rows.length;
+    for (var i = 0; i < data.length; i++) rows.push(data[i]);
+    if (view) { for (var j = start; j < rows.length; j++) if (matches(rows[j])) view.push(j); }
+    schedule();
+};
+
+function loadNext() {
+    if (loaded >= META.chunks.length) return;
+    var s = document.createElement("script");
+    s.src = META.chunks[loaded++];
+    s.onload = loadNext;
+    s.onerror = loadNext;
+    document.body.appendChild(s);
+}
+
+var timer = null;
+textEl.addEventListener("input", function () { clearTimeout(timer); timer = setTimeout(refilter, 150); });
+statusEl.addEventListener("change", refilter);
+viewport.addEventListener("scroll", schedule, { passive: true });
+window.addEventListener("resize", schedule);
+</script>
+__EMBEDDED__
+<script>loadNext(); schedule();</script>
+</body>
+</html>
+"""
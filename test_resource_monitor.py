@@ -0,0 +1,201 @@
+"""
+应用资源采样与长时间运行（soak）测试
+
+按固定频率采样被测应用整个进程树的CPU、内存（RSS/私有字节）、句柄数和线程数，
+样本保存在预分配的固定大小环形缓冲区中，可连续运行数小时而不增加内存占用。
+结束时给出统计摘要，并根据线性回归斜率判断是否存在内存或句柄泄漏。
+
+依赖 psutil: pip install psutil
+"""
+
+import csv
+import time
+import threading
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from test_stats import describe, linear_regression
+
+METRICS = ("cpu", "rss", "private", "handles", "threads")
+
+
+class SampleRing:
+    """固定容量的样本环形缓冲区（每个指标一个预分配的double数组）"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.columns = {m: array("d", bytes(8 * capacity)) for m in METRICS}
+        self.index = 0
+        self.count = 0
+
+    def append(self, t: float, values: Dict[str, float]):
+        i = self.index
+        self.times[i] = t
+        for m in METRICS:
+            self.columns[m][i] = values[m]
+        self.index = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _order(self) -> range:
+        start = (self.index - self.count) % self.capacity
+        return range(start, start + self.count)
+
+    def series(self, metric: str) -> List[float]:
+        """按时间顺序返回某个指标的样本"""
+        col = self.times if metric == "t" else self.columns[metric]
+        return [col[i % self.capacity] for i in self._order()]
+
+    def __len__(self):
+        return self.count
+
+
+class ProcessTreeSampler:
+    """进程树资源采样器，子进程列表按间隔刷新，避免每次采样都遍历进程树"""
+
+    def __init__(self, pid: int, refresh_children_every: int = 10):
+        try:
+            import psutil
+        except ImportError:
+            raise ImportError("psutil未安装，请运行: pip install psutil")
+        self.psutil = psutil
+        self.root = psutil.Process(pid)
+        self.refresh_children_every = refresh_children_every
+        self._procs: Dict[int, object] = {}
+        self._samples = 0
+        self._refresh()
+
+    def _refresh(self):
+        procs = [self.root]
+        try:
+            procs += self.root.children(recursive=True)
+        except self.psutil.Error:
+            pass
+        current = {}
+        for p in procs:
+            # 复用已有的Process对象，cpu_percent依赖上一次调用的状态
+            current[p.pid] = self._procs.get(p.pid, p)
+            if p.pid not in self._procs:
+                try:
+                    p.cpu_percent(None)
+                except self.psutil.Error:
+                    pass
+        self._procs = current
+
+    def alive(self) -> bool:
+        return self.root.is_running()
+
+    def sample(self) -> Dict[str, float]:
+        """采样一次，返回整个进程树的资源合计"""
+        if self._samples % self.refresh_children_every == 0:
+            self._refresh()
+        self._samples += 1
+
+        totals = dict.fromkeys(METRICS, 0.0)
+        for pid, p in list(self._procs.items()):
+            try:
+                with p.oneshot():
+                    mem = p.memory_info()
+                    totals["cpu"] += p.cpu_percent(None)
+                    totals["rss"] += mem.rss
+                    # Windows有私有字节，其他平台以数据段大小近似
+                    totals["private"] += getattr(mem, "private", getattr(mem, "data", 0))
+                    totals["handles"] += p.num_handles() if hasattr(p, "num_handles") else p.num_fds()
+                    totals["threads"] += p.num_threads()
+            except self.psutil.Error:
+                self._procs.pop(pid, None)
+        return totals
+
+
+class ResourceSoak:
+    """长时间运行测试：后台线程按固定频率采样，主线程执行可选的交互脚本"""
+
+    def __init__(self, sampler: ProcessTreeSampler, duration: float, interval: float = 1.0,
+                 capacity: int = 86400, interactions: Optional[List[Callable[[], None]]] = None,
+                 interaction_interval: float = 30.0, leak_rss_mb_per_hour: float = 20.0,
+                 leak_handles_per_hour: float = 100.0, on_sample: Optional[Callable[[Dict[str, float]], None]] = None):
+        self.sampler = sampler
+        self.duration = duration
+        self.interval = interval
+        self.ring = SampleRing(capacity)
+        self.interactions = interactions or []
+        self.interaction_interval = interaction_interval
+        self.leak_rss_mb_per_hour = leak_rss_mb_per_hour      # 内存增长超过该速率判定为泄漏
+        self.leak_handles_per_hour = leak_handles_per_hour    # 句柄增长超过该速率判定为泄漏
+        self.on_sample = on_sample                            # 每次采样后回调（如实时导出指标）
+        self.errors: List[str] = []
+        self._stop = threading.Event()
+
+    def _sample_loop(self, start: float):
+        # 以绝对时间调度下一次采样，避免长时间运行时的累积漂移
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                values = self.sampler.sample()
+                self.ring.append(time.monotonic() - start, values)
+                if self.on_sample:
+                    self.on_sample(values)
+            except Exception as e:
+                self.errors.append(f"采样失败: {e}")
+            if not self.sampler.alive():
+                self.errors.append("应用程序进程已退出")
+                self._stop.set()
+                break
+            next_at += self.interval
+            self._stop.wait(max(0.0, next_at - time.monotonic()))
+
+    def run(self, alive_check: Optional[Callable[[], bool]] = None) -> Dict:
+        """执行soak测试，返回统计摘要和泄漏判断"""
+        start = time.monotonic()
+        thread = threading.Thread(target=self._sample_loop, args=(start,), daemon=True)
+        thread.start()
+        deadline = start + self.duration
+        next_interaction = start
+        step = 0
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                if self.interactions and time.monotonic() >= next_interaction:
+                    action = self.interactions[step % len(self.interactions)]
+                    step += 1
+                    try:
+                        action()
+                    except Exception as e:
+                        self.errors.append(f"交互脚本 {getattr(action, '__name__', action)} 失败: {e}")
+                    next_interaction = time.monotonic() + self.interaction_interval
+                if alive_check and not alive_check():
+                    self.errors.append("应用程序窗口已消失")
+                    break
+                self._stop.wait(min(1.0, max(0.0, deadline - time.monotonic())))
+        finally:
+            self._stop.set()
+            thread.join(timeout=self.interval * 2 + 1)
+        return self.summarize(interactions_run=step)
+
+    def summarize(self, interactions_run: int = 0, min_r2: float = 0.5) -> Dict:
+        """统计摘要与泄漏判断：斜率超过阈值且拟合度足够高时判定为泄漏"""
+        ts = self.ring.series("t")
+        summary = {"samples": len(self.ring), "duration": ts[-1] if ts else 0.0,
+                   "interactions": interactions_run, "errors": self.errors, "metrics": {}, "leaks": []}
+        bytes_per_hour = self.leak_rss_mb_per_hour * 1024 * 1024
+        thresholds = {"rss": bytes_per_hour, "private": bytes_per_hour, "handles": self.leak_handles_per_hour}
+        for m in METRICS:
+            values = self.ring.series(m)
+            stats = describe(values)
+            reg = linear_regression(ts, values)
+            stats["slope_per_hour"] = reg["slope"] * 3600
+            stats["r2"] = reg["r2"]
+            summary["metrics"][m] = stats
+            if m in thresholds and len(values) >= 10 and reg["r2"] >= min_r2 and stats["slope_per_hour"] > thresholds[m]:
+                summary["leaks"].append(m)
+        summary["leak_suspected"] = bool(summary["leaks"])
+        return summary
+
+    def save_samples(self, path: Path):
+        """将环形缓冲区中的样本导出为CSV"""
+        columns = ["t"] + list(METRICS)
+        data = [self.ring.series(c) for c in columns]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*data))
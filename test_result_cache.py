@@ -0,0 +1,138 @@
+"""
+按构建指纹复用测试结果
+
+对已经测过的构建重复运行整个测试套件时，确定性的测试（界面元素、菜单、窗口控制等）结果不会改变。
+缓存键由以下内容计算：
+  - 被测应用的指纹：可执行文件的SHA-256、文件版本资源（需要pywin32）和可选的附加文件（如 resources/*.asar）
+  - 测试代码的指纹：测试目录中所有 .py 文件的SHA-256
+  - 测试方法名、参数、平台和主机名
+这些都没有变化时，测试直接复用上次通过的结果（报告中标记为 CACHED），只运行受影响的测试。
+失败的结果不缓存，总是重新运行。
+
+用法:
+    python test_result_cache.py --list                  # 列出缓存条目
+    python test_result_cache.py --invalidate            # 清空缓存
+    python test_result_cache.py --fingerprint "C:\\...\\灵犀·晓伴.exe"
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from test_installer_cache import file_sha256
+
+
+def file_version(exe_path: Path) -> Optional[str]:
+    """读取exe的文件版本资源，没有pywin32或没有版本资源时返回None"""
+    try:
+        import win32api
+    except ImportError:
+        return None
+    try:
+        info = win32api.GetFileVersionInfo(str(exe_path), "\\")
+    except Exception:
+        return None
+    ms, ls = info["FileVersionMS"], info["FileVersionLS"]
+    return f"{ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+
+
+def app_fingerprint(exe_path: Path, extra_globs: Iterable[str] = ()) -> Dict:
+    """被测应用的指纹：exe及附加文件（相对exe所在目录的glob）的内容哈希和文件版本"""
+    exe_path = Path(exe_path)
+    extra = {}
+    for pattern in extra_globs:
+        for path in sorted(exe_path.parent.glob(pattern)):
+            if path.is_file():
+                extra[str(path.relative_to(exe_path.parent))] = file_sha256(path)
+    return {"exe": exe_path.name, "sha256": file_sha256(exe_path), "version": file_version(exe_path), "extra": extra}
+
+
+def code_fingerprint(code_dir: Path) -> str:
+    """测试代码的指纹：目录中所有 .py 文件（按文件名排序）的内容哈希"""
+    digest = hashlib.sha256()
+    for path in sorted(Path(code_dir).glob("*.py")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(file_sha256(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def cache_key(test: str, app: Dict, code: str, args: Iterable = (), kwargs: Optional[Dict] = None) -> str:
+    """测试结果的缓存键"""
+    payload = {"test": test, "app": app, "code": code, "args": list(args), "kwargs": kwargs or {},
+               "platform": platform.system(), "host": platform.node()}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+                          .encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """通过的测试结果缓存（JSON文件，按缓存键保存每个测试的全部结果）"""
+
+    def __init__(self, path: Path, max_age_days: float = 14.0):
+        self.path = Path(path)
+        self.max_age_days = max_age_days
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self.entries.get(key)
+        if entry and time.time() - entry.get("created", 0) <= self.max_age_days * 86400:
+            return entry
+        return None
+
+    def put(self, key: str, test: str, results: List[Dict], run: str):
+        self.entries[key] = {"test": test, "results": results, "run": run, "created": time.time()}
+
+    def invalidate(self, tests: Optional[Iterable[str]] = None):
+        """清空全部缓存，或只清除指定测试的缓存"""
+        if tests is None:
+            self.entries.clear()
+        else:
+            tests = set(tests)
+            self.entries = {k: e for k, e in self.entries.items() if e.get("test") not in tests}
+
+    def save(self):
+        """写回文件，顺便清除过期的条目"""
+        cutoff = time.time() - self.max_age_days * 86400
+        self.entries = {k: e for k, e in self.entries.items() if e.get("created", 0) >= cutoff}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="按构建指纹复用的测试结果缓存")
+    parser.add_argument("--cache", default=str(Path(__file__).parent / "test_logs" / "result_cache.json"))
+    parser.add_argument("--list", action="store_true", help="列出缓存条目")
+    parser.add_argument("--invalidate", nargs="*", metavar="TEST", help="清空缓存（可只指定若干测试方法名）")
+    parser.add_argument("--fingerprint", metavar="EXE", help="计算应用和测试代码的指纹")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(Path(args.cache))
+    if args.invalidate is not None:
+        cache.invalidate(args.invalidate or None)
+        cache.save()
+        print(f"已清除缓存: {', '.join(args.invalidate) if args.invalidate else '全部'}")
+    if args.list:
+        for key, entry in sorted(cache.entries.items(), key=lambda kv: kv[1].get("created", 0)):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.get("created", 0)))
+            print(f"{key[:16]}  {entry['test']:<28} {created}  {entry.get('run', '')}")
+    if args.fingerprint:
+        print(json.dumps({"app": app_fingerprint(Path(args.fingerprint)),
+                          "code": code_fingerprint(Path(__file__).parent)}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+测试结果日志（NDJSON追加写入）
+
+每条测试结果以一行JSON追加到日志文件中，崩溃或Ctrl+C时已记录的结果不会丢失，
+报告生成时按行流式读取，内存占用与运行时长无关。
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from collections.abc import Collection
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+
+class ResultJournal:
+    """追加写入的测试结果日志"""
+
+    def __init__(self, path: Path, flush_every: int = 20, fsync_interval: float = 5.0):
+        self.path = Path(path)
+        self.flush_every = flush_every          # 缓冲多少条后写入系统
+        self.fsync_interval = fsync_interval    # 两次fsync之间的最短间隔（秒）
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+        atexit.register(self.close)
+
+    def _ensure_open(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8", buffering=64 * 1024)
+
+    def append(self, result: Dict):
+        """追加一条测试结果"""
+        line = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._ensure_open()
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self, force_fsync: bool = False):
+        if self._file is None:
+            return
+        self._file.flush()
+        self._pending = 0
+        now = time.monotonic()
+        if force_fsync or now - self._last_fsync >= self.fsync_interval:
+            try:
+                os.fsync(self._file.fileno())
+            except OSError:
+                pass
+            self._last_fsync = now
+
+    def flush(self, fsync: bool = False):
+        """将缓冲区写入文件，fsync=True时强制落盘"""
+        with self._lock:
+            self._flush_locked(force_fsync=fsync)
+
+    def close(self):
+        """刷新并关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                self._flush_locked(force_fsync=True)
+                self._file.close()
+                self._file = None
+
+    def __iter__(self) -> Iterator[Dict]:
+        self.flush()
+        return iter_journal(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def iter_journal(path: Union[str, Path]) -> Iterator[Dict]:
+    """流式读取日志文件，跳过崩溃时可能写了一半的行"""
+    path = Path(path)
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def open_results(source) -> Iterator[Dict]:
+    """将结果来源（列表、ResultJournal或日志路径）统一转换为迭代器"""
+    if isinstance(source, (str, Path)):
+        return iter_journal(source)
+    return iter(source)
+
+
+def replayable_results(source):
+    """保证结果来源可以多次遍历（先统计汇总再写出报告）
+
+    日志路径、ResultJournal 和列表等集合原样返回，生成器等一次性迭代器读取一次后转换为列表
+    """
+    if isinstance(source, (str, Path, ResultJournal, Collection)):
+        return source
+    return list(source)
@@ -0,0 +1,126 @@
+"""
+测试重试策略与不稳定测试隔离
+
+RetryPolicy 控制单个测试的重试次数、退避间隔以及整次运行的重试总预算；
+结果标记为 retryable=False 的失败（如找不到被测应用）重试也不会通过，不重试。
+FlakyQuarantine 根据历史运行结果（test_report_analyzer）自动隔离不稳定的测试，
+被隔离测试仍会执行，但失败不计入本次运行的失败数；历史结果在第一次有测试失败时才分析。
+"""
+
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from test_report_analyzer import RunHistoryAnalyzer
+
+
+class RetryPolicy:
+    """测试级重试策略"""
+
+    def __init__(self, max_retries: int = 3, backoff: float = 2.0, backoff_factor: float = 2.0,
+                 max_backoff: float = 30.0, budget: int = 10):
+        self.max_retries = max_retries          # 单个测试最多重试次数
+        self.backoff = backoff                  # 首次重试前等待（秒）
+        self.backoff_factor = backoff_factor    # 每次重试等待时间的倍数
+        self.max_backoff = max_backoff
+        self.budget = budget                    # 整次运行的重试总次数上限
+        self.used = 0
+
+    def should_retry(self, attempt: int) -> bool:
+        """第attempt次尝试失败后是否还可以重试"""
+        return attempt <= self.max_retries and self.used < self.budget
+
+    def delay(self, attempt: int) -> float:
+        """第attempt次尝试失败后的退避等待时间"""
+        return min(self.backoff * self.backoff_factor ** (attempt - 1), self.max_backoff)
+
+    def consume(self):
+        self.used += 1
+
+
+class FlakyQuarantine:
+    """不稳定测试隔离名单，保存在 test_logs/quarantine.json
+
+    指定 base_log_dir 时，第一次查询前根据历史运行结果刷新名单（全部通过的运行不需要分析历史）
+    """
+
+    def __init__(self, path: Path, flake_threshold: float = 20.0, min_runs: int = 5,
+                 base_log_dir: Optional[Path] = None, logger=None):
+        self.path = Path(path)
+        self.flake_threshold = flake_threshold  # 不稳定率（%）达到该值时隔离
+        self.min_runs = min_runs                # 至少有这么多次历史运行才判断
+        self.base_log_dir = base_log_dir
+        self.logger = logger
+        self.entries: Dict[str, Dict] = self._load()
+        self._refreshed = base_log_dir is None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+
+    def is_quarantined(self, test_name: str) -> bool:
+        self._refresh_once()
+        return test_name in self.entries
+
+    def _refresh_once(self):
+        """根据历史结果刷新名单（只刷新一次），历史分析失败时不影响测试运行"""
+        with self._lock:
+            if self._refreshed:
+                return
+            self._refreshed = True
+            try:
+                self.update_from_history(self.base_log_dir, self.logger)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"更新隔离名单失败: {e}")
+
+    def update_from_history(self, base_log_dir: Path, logger=None) -> bool:
+        """根据历史运行结果更新隔离名单，不稳定率降到阈值一半以下时解除隔离"""
+        stats = RunHistoryAnalyzer(base_log_dir).analyze()
+        changed = False
+        for name, s in stats.items():
+            if s["runs"] < self.min_runs:
+                continue
+            if name not in self.entries and s["flake_rate"] >= self.flake_threshold:
+                self.entries[name] = {
+                    "since": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "flake_rate": s["flake_rate"],
+                    "runs": s["runs"],
+                }
+                changed = True
+                if logger:
+                    logger.warning(f"测试 '{name}' 不稳定率 {s['flake_rate']}%，已自动隔离")
+            elif name in self.entries and s["flake_rate"] < self.flake_threshold / 2:
+                del self.entries[name]
+                changed = True
+                if logger:
+                    logger.info(f"测试 '{name}' 不稳定率降至 {s['flake_rate']}%，解除隔离")
+        if changed:
+            self.save()
+        return changed
+
+
+def load_quarantine(config, logger=None) -> Optional[FlakyQuarantine]:
+    """按配置加载隔离名单，第一次查询时才根据历史结果刷新"""
+    if not config.quarantine_enabled:
+        return None
+    return FlakyQuarantine(
+        config.quarantine_path,
+        flake_threshold=config.quarantine_flake_threshold,
+        min_runs=config.quarantine_min_runs,
+        base_log_dir=config.base_log_dir,
+        logger=logger
+    )
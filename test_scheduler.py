@@ -0,0 +1,374 @@
+"""
+依赖感知的测试调度（DAG）
+
+测试方法用 @case 装饰器声明依赖、夹具和标签：
+
+    @case(depends=("launch_application",), tags=("custom", "menu"))
+    def test_file_menu(self) -> bool: ...
+
+调度器按依赖关系执行所选测试：
+  - depends: 硬依赖，前提测试未通过（失败、跳过或未启用）时，依赖它的测试立即跳过，不再逐个等待超时
+  - after:   仅约束顺序，前面的测试无论结果如何都会先执行完
+  - fixtures: 共享夹具（用 @fixture 标记的运行器方法），首次需要时准备一次，测试有同名参数时作为参数传入；
+             夹具可以是生成器，yield 之后的部分在调度结束时作为清理执行
+  - resource: 测试占用的资源，同一资源上的测试依次执行，不同资源（或 resource=None）的测试可以并发
+             （UIA和PyAutoGUI都只能顺序操作同一个界面，默认所有测试占用 "ui"）；
+             占用 "ui" 的测试都在运行器的UIA线程（runner.uia）中执行，共用启动测试创建的COM对象
+  - on_uia:  为False时测试本身在调度线程中执行，仍占用其资源，界面操作自行交给 runner.uia
+             （如并发负载测试：多个会话等待回复时不能占住UIA线程）；默认按 resource 是否为 "ui" 决定
+  - when:    启用条件，配置项名称或以运行器为参数的函数，不满足时测试不运行
+  - final:   在其他所选测试都结束后才执行（如卸载）
+  - cacheable: 确定性测试，被测应用和测试代码的指纹都没有变化时复用上次通过的结果（见 test_result_cache），
+             只为缓存命中的测试准备的前提测试（如启动）也不再运行
+作为前提自动加入的测试在本次会话中已经通过时不会重复执行（如先运行基础测试再运行自定义测试时的启动测试），
+直接选中的测试每次都重新运行。
+还可以按运行历史安排顺序（上次失败的测试优先、耗时短的优先），并在第一个测试失败后停止（fail_fast）。
+"""
+
+import inspect
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+
+from test_prioritizer import prioritize
+from test_time_budget import BudgetPlanner
+
+UI_RESOURCE = "ui"
+
+
+class CaseInfo:
+    """@case 声明的调度信息"""
+
+    def __init__(self, depends: Iterable[str] = (), after: Iterable[str] = (), fixtures: Iterable[str] = (),
+                 tags: Iterable[str] = (), resource: Optional[str] = UI_RESOURCE,
+                 when: Union[str, Callable, None] = None, final: bool = False, cacheable: bool = False,
+                 on_uia: Optional[bool] = None):
+        self.depends = tuple(depends)
+        self.after = tuple(after)
+        self.fixtures = tuple(fixtures)
+        self.tags = frozenset(tags)
+        self.resource = resource
+        self.when = when
+        self.final = final
+        self.cacheable = cacheable
+        self.on_uia = resource == UI_RESOURCE if on_uia is None else on_uia
+
+    def enabled(self, runner) -> bool:
+        """按 when 判断是否启用，runner 为运行器（或任何带有 config 属性的对象）"""
+        if self.when is None:
+            return True
+        if isinstance(self.when, str):
+            return bool(getattr(runner.config, self.when, False))
+        return bool(self.when(runner))
+
+
+def case(depends: Iterable[str] = (), after: Iterable[str] = (), fixtures: Iterable[str] = (),
+         tags: Iterable[str] = (), resource: Optional[str] = UI_RESOURCE,
+         when: Union[str, Callable, None] = None, final: bool = False, cacheable: bool = False,
+         on_uia: Optional[bool] = None):
+    """把运行器方法注册为可调度的测试"""
+    def decorate(func):
+        func.case_info = CaseInfo(depends, after, fixtures, tags, resource, when, final, cacheable, on_uia)
+        return func
+    return decorate
+
+
+def registered_cases(cls) -> Dict[str, CaseInfo]:
+    """运行器类（含基类）上用 @case 注册的测试，不需要创建运行器"""
+    cases = {}
+    for klass in reversed(cls.__mro__):
+        for name, attr in vars(klass).items():
+            if hasattr(attr, "case_info"):
+                cases[name] = attr.case_info
+    return cases
+
+
+def fixture(func):
+    """把运行器方法标记为共享夹具"""
+    func.is_fixture = True
+    return func
+
+
+class DependencyError(ValueError):
+    """依赖声明有误（引用了不存在的测试或存在循环依赖）"""
+
+
+class CaseScheduler:
+    """按依赖关系调度运行器上注册的测试"""
+
+    def __init__(self, runner, max_workers: int = 1):
+        self.runner = runner
+        self.logger = runner.logger
+        self.max_workers = max(1, max_workers)
+        self.cases: Dict[str, CaseInfo] = {}
+        self.fixtures: Dict[str, Callable] = {}
+        self._order: Dict[str, tuple] = {}
+        self.requested: Set[str] = set()   # select() 直接选中的测试（不含自动加入的前提测试）
+
+        mro = list(reversed(type(runner).__mro__))
+        for cls in mro:
+            for name, attr in vars(cls).items():
+                if hasattr(attr, "case_info"):
+                    self.cases[name] = attr.case_info
+                    # 声明顺序：基类在前，同一类中按源码行号
+                    self._order[name] = (mro.index(cls), attr.__code__.co_firstlineno)
+                elif getattr(attr, "is_fixture", False):
+                    self.fixtures[name] = getattr(runner, name)
+        self._validate()
+
+    def _validate(self):
+        for name, info in self.cases.items():
+            for dep in info.depends + info.after:
+                if dep not in self.cases:
+                    raise DependencyError(f"{name} 依赖的测试 {dep} 不存在")
+            for f in info.fixtures:
+                if f not in self.fixtures:
+                    raise DependencyError(f"{name} 使用的夹具 {f} 不存在")
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise DependencyError(f"循环依赖: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            info = self.cases[name]
+            for dep in info.depends + info.after:
+                visit(dep, path + [name])
+            state[name] = "done"
+
+        for name in self.cases:
+            visit(name, [])
+
+    def enabled(self, name: str) -> bool:
+        return self.cases[name].enabled(self.runner)
+
+    def select(self, tags: Optional[Iterable[str]] = None, exclude_tags: Optional[Iterable[str]] = None,
+               names: Optional[Iterable[str]] = None) -> List[str]:
+        """按名称或标签选择测试（未指定时选择全部已启用的测试），并补上它们的硬依赖"""
+        tags, exclude_tags = set(tags or ()), set(exclude_tags or ())
+        names = set(names or ())
+        unknown = names - set(self.cases)
+        if unknown:
+            raise DependencyError(f"未知测试: {', '.join(sorted(unknown))}")
+
+        selected = set()
+        for name, info in self.cases.items():
+            if names or tags:
+                if name not in names and not (info.tags & tags):
+                    continue
+            if info.tags & exclude_tags or not self.enabled(name):
+                continue
+            selected.add(name)
+        self.requested = set(selected)
+        todo = list(selected)
+        while todo:
+            for dep in self.cases[todo.pop()].depends:
+                if dep not in selected:
+                    selected.add(dep)
+                    todo.append(dep)
+        return sorted(selected, key=self._order.get)
+
+    def dependents(self, name: str, among: Iterable[str]) -> Set[str]:
+        """among 中直接或间接硬依赖 name 的测试"""
+        among = set(among)
+        found, todo = set(), [name]
+        while todo:
+            current = todo.pop()
+            for other in among:
+                if current in self.cases[other].depends and other not in found:
+                    found.add(other)
+                    todo.append(other)
+        return found
+
+    def _setup_fixture(self, name: str, live: Dict, generators: List):
+        if name not in live:
+            value = self.fixtures[name]()
+            if inspect.isgenerator(value):
+                generator, value = value, next(value)
+                generators.append((name, generator))
+            live[name] = value
+        return live[name]
+
+    def _teardown_fixtures(self, generators: List):
+        for name, generator in reversed(generators):
+            try:
+                next(generator)
+            except StopIteration:
+                pass
+            except Exception as e:
+                self.logger.warning(f"夹具 {name} 清理失败: {e}")
+
+    def _plan_budget(self, selected: List[str], budget: float, estimates: Dict[str, float],
+                     rank: Optional[Dict[str, int]] = None):
+        """作为其他测试前提的测试总是保留，其余测试按预算裁剪（指定了排序时优先保留排在前面的测试）"""
+        planner = BudgetPlanner(budget, estimates, default_estimate=self.runner.config.budget_default_estimate)
+        funcs = {name: getattr(self.runner, name) for name in selected}
+        prerequisites = [n for n in selected if self.dependents(n, selected)]
+        others = [funcs[n] for n in selected if n not in prerequisites]
+        key = (lambda f: rank[f.__name__]) if rank else None
+        _, trimmed = planner.plan([funcs[n] for n in prerequisites] + others, pinned=len(prerequisites), key=key)
+        return planner, [f.__name__ for f in trimmed]
+
+    def run(self, selected: List[str], budget: Optional[float] = None, order: str = "declared",
+            fail_fast: bool = False) -> Dict[str, Optional[bool]]:
+        """执行所选测试，返回 {测试名: 是否通过，跳过为None}
+
+        order 为 failed-first / fast 时按运行历史安排就绪测试的先后（见 test_prioritizer）；
+        fail_fast 时第一个测试失败后跳过其余尚未开始的测试
+        """
+        runner = self.runner
+        outcomes = runner.case_outcomes
+        # 只有自动加入的前提测试在本次会话中通过后不再重复执行，直接选中的测试每次都运行
+        requested = self.requested or set(selected)
+        reused = [n for n in selected if n not in requested and outcomes.get(n) is True]
+        pending = [n for n in selected if n not in reused]
+        for name in pending:
+            outcomes.pop(name, None)
+        if reused:
+            self.logger.info(f"前提测试本次会话中已通过，不再重复执行: {', '.join(reused)}")
+        results = {n: True for n in reused}
+        self._reuse_cached(pending, results)
+
+        rank, estimates = None, {}
+        if budget or order != "declared":
+            history = runner.method_history()
+            estimates = {m: h["mean_duration"] for m, h in history.items() if h["mean_duration"] is not None}
+            if order != "declared":
+                ordered = prioritize(pending, history, order, runner.config.budget_default_estimate)
+                rank = {name: i for i, name in enumerate(ordered)}
+                self.logger.info(f"按 {order} 排序: {', '.join(ordered)}")
+
+        planner, deadline_at = None, None
+        if budget:
+            planner, trimmed = self._plan_budget(pending, budget, estimates, rank)
+            deadline_at = time.monotonic() + budget
+            self.logger.info(f"时间预算 {budget:.0f}s: 计划运行 {len(pending) - len(trimmed)} 个测试，裁掉 {len(trimmed)} 个")
+            for name in trimmed:
+                self._skip(name, f"预计耗时 {planner.estimate(getattr(runner, name)):.0f}s，超出时间预算，跳过",
+                           pending, results)
+        self.logger.info(f"调度 {len(pending)} 个测试（最多并发 {self.max_workers} 个）: {', '.join(pending)}")
+
+        live, generators = {}, []
+        running = {}            # future -> 测试名
+        busy = set()            # 正在使用的资源
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="case") as pool:
+            while pending or running:
+                self._prune(pending, results, set(running.values()))
+                active = set(pending) | set(running.values())
+                for name in self._ready(pending, active, busy, planner, rank):
+                    kwargs = {}
+                    try:
+                        params = inspect.signature(getattr(runner, name)).parameters
+                        for f in self.cases[name].fixtures:
+                            value = self._setup_fixture(f, live, generators)
+                            if f in params:
+                                kwargs[f] = value
+                    except Exception as e:
+                        self._skip(name, f"夹具准备失败: {e}", pending, results)
+                        continue
+                    if deadline_at is not None and not self.dependents(name, pending):
+                        remaining = deadline_at - time.monotonic()
+                        if planner.estimate(getattr(runner, name)) > remaining:
+                            self._skip(name, f"剩余时间预算 {max(0.0, remaining):.0f}s 不足，跳过", pending, results)
+                            continue
+                    pending.remove(name)
+                    resource = self.cases[name].resource
+                    if resource:
+                        busy.add(resource)
+                    run = runner.run_cached if self.cases[name].cacheable else runner.run_isolated
+                    # 工作线程只负责等待和重试，界面测试本身在UIA线程中执行
+                    future = pool.submit(run, getattr(runner, name), deadline_at, self.cases[name].on_uia, **kwargs)
+                    running[future] = name
+                if not running:
+                    if pending:
+                        # 不会出现（依赖已校验无环），防止调度死循环
+                        for name in list(pending):
+                            self._skip(name, "无法满足调度约束，跳过", pending, results)
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    busy.discard(self.cases[name].resource)
+                    try:
+                        passed = bool(future.result())
+                    except Exception as e:
+                        self.logger.error(f"{name} 调度执行出错: {e}")
+                        passed = False
+                    outcomes[name] = results[name] = passed
+                    if fail_fast and not passed and pending:
+                        self.logger.warning(f"{name} 失败，fail-fast: 跳过其余 {len(pending)} 个测试")
+                        for other in list(pending):
+                            self._skip(other, f"fail-fast: {name} 失败，跳过", pending, results)
+        self._teardown_fixtures(generators)
+        return results
+
+    def _reuse_cached(self, pending: List[str], results: Dict):
+        """复用缓存命中的测试结果，并去掉只有这些测试才需要的前提测试"""
+        cached = [n for n in pending if self.cases[n].cacheable and self.runner.reuse_cached_result(n)]
+        if not cached:
+            return
+        for name in cached:
+            pending.remove(name)
+            self.runner.case_outcomes[name] = results[name] = True
+        needed = {n for n in pending if n in self.requested or not self.requested}
+        todo = list(needed)
+        while todo:
+            for dep in self.cases[todo.pop()].depends:
+                if dep in pending and dep not in needed:
+                    needed.add(dep)
+                    todo.append(dep)
+        unneeded = [n for n in pending if n not in needed]
+        for name in unneeded:
+            pending.remove(name)
+        self.logger.info(f"复用 {len(cached)} 个测试的缓存结果: {', '.join(cached)}")
+        if unneeded:
+            self.logger.info(f"只有缓存命中的测试依赖，不再运行: {', '.join(unneeded)}")
+
+    def _ready(self, pending: List[str], active: Set[str], busy: Set[str], planner,
+               rank: Optional[Dict[str, int]] = None) -> List[str]:
+        """依赖和顺序约束都已满足、且资源空闲的测试（同一资源每次只选一个）"""
+        candidates = []
+        for name in pending:
+            info = self.cases[name]
+            if info.final and any(not self.cases[n].final for n in active if n != name):
+                continue
+            if any(self.runner.case_outcomes.get(d) is not True for d in info.depends):
+                continue
+            if any(d in active for d in info.after):
+                continue
+            candidates.append(name)
+        if rank:
+            candidates.sort(key=rank.get)
+        elif planner:
+            candidates.sort(key=lambda n: planner.estimate(getattr(self.runner, n)))
+        ready, claimed = [], set(busy)
+        for name in candidates:
+            resource = self.cases[name].resource
+            if resource in claimed:
+                continue
+            if resource:
+                claimed.add(resource)
+            ready.append(name)
+        return ready
+
+    def _prune(self, pending: List[str], results: Dict, running: Set[str]):
+        """前提测试已确定不会通过时，跳过依赖它的测试"""
+        outcomes = self.runner.case_outcomes
+        changed = True
+        while changed:
+            changed = False
+            for name in list(pending):
+                for dep in self.cases[name].depends:
+                    if dep in pending or dep in running or outcomes.get(dep) is True:
+                        continue
+                    reason = "未通过" if outcomes.get(dep) is False else "被跳过" if dep in outcomes else "未启用"
+                    self._skip(name, f"前提测试 {dep} {reason}，跳过", pending, results)
+                    changed = True
+                    break
+
+    def _skip(self, name: str, reason: str, pending: List[str], results: Dict):
+        if name in pending:
+            pending.remove(name)
+        self.runner.skip_test(name, reason)
+        self.runner.case_outcomes[name] = results[name] = None
@@ -0,0 +1,411 @@
+"""
+区域截图与缓冲区复用
+
+原来的截图都是整个屏幕（pyautogui.screenshot() / ImageGrab.grab()），每次都分配一张新的PIL图像，
+只适合偶尔保存截图。这里的截图后端只截取窗口或指定区域，写入预先分配、反复使用的缓冲区，
+以 NumPy 数组（高, 宽, 4，BGRA）的形式直接返回缓冲区的视图，高频的画面轮询也不会产生分配：
+  - bitblt: Windows GDI BitBlt 直接写入 DIB section，返回的数组就是DIB的内存（零拷贝）
+  - mss:    跨平台（需要 pip install mss），复制到复用的缓冲区
+  - pil:    PIL.ImageGrab 兜底，每帧都会分配，仅在其他后端不可用时使用
+注意：返回的数组在下一次 grab() 时被覆盖，需要保留时先 copy()。
+
+用法:
+    python test_screen_capture.py --bench [--region 0,0,800,600] [--frames 200]   # 各后端截图速率和每帧分配
+    python test_screen_capture.py --save shot.png [--window HWND]
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import threading
+import subprocess
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from test_stats import describe
+
+# (left, top, width, height)
+Region = Tuple[int, int, int, int]
+
+BACKENDS = ("bitblt", "mss", "pil")
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("区域截图需要numpy，请运行: pip install numpy")
+    return numpy
+
+
+def window_region(window) -> Optional[Region]:
+    """窗口在屏幕上的区域：Windows为窗口句柄，其他平台为X11窗口ID（需要xdotool），失败返回None"""
+    if sys.platform == "win32":
+        from test_window_utils import get_window_rect
+
+        rect = get_window_rect(window)
+        if not rect:
+            return None
+        left, top, right, bottom = rect
+        return left, top, right - left, bottom - top
+    if not shutil.which("xdotool"):
+        return None
+    out = subprocess.run(["xdotool", "getwindowgeometry", "--shell", str(window)],
+                         capture_output=True, text=True).stdout
+    values = dict(line.split("=", 1) for line in out.split() if "=" in line)
+    try:
+        return int(values["X"]), int(values["Y"]), int(values["WIDTH"]), int(values["HEIGHT"])
+    except (KeyError, ValueError):
+        return None
+
+
+class ScreenCapture:
+    """截图后端基类：grab() 把区域内容写入复用的缓冲区，返回 (高, 宽, 4) 的BGRA视图"""
+
+    name = "base"
+
+    def __init__(self):
+        self.np = _import_numpy()
+        self._flat = None               # 复用的缓冲区，区域变大时才重新分配
+        self.allocations = 0            # 缓冲区分配次数（基准测试中应保持为1）
+        self.native_bytes = 0           # 累计的原生内存分配（PIL图像缓冲区等，tracemalloc统计不到）
+        self.lock = threading.Lock()    # 多个线程共用后端时，grab 和使用返回视图的代码需持有该锁（save 和 wait_for_change 已持有）
+
+    def _frame(self, width: int, height: int):
+        """缓冲区前 width*height*4 字节的视图"""
+        size = width * height * 4
+        if self._flat is None or self._flat.size < size:
+            self._flat = self.np.empty(size, dtype=self.np.uint8)
+            self.allocations += 1
+        return self._flat[:size].reshape(height, width, 4)
+
+    def screen_region(self) -> Region:
+        """整个（虚拟）屏幕的区域"""
+        raise NotImplementedError
+
+    def grab(self, region: Optional[Region] = None):
+        """截取区域（默认整个屏幕），返回缓冲区视图"""
+        raise NotImplementedError
+
+    def to_image(self, frame):
+        """转换为PIL图像（复制，用于保存）"""
+        from PIL import Image
+
+        height, width = frame.shape[:2]
+        return Image.frombuffer("RGB", (width, height), self.np.ascontiguousarray(frame), "raw", "BGRX", 0, 1)
+
+    def save(self, path, region: Optional[Region] = None):
+        with self.lock:
+            self.to_image(self.grab(region)).save(str(path))
+
+    def close(self):
+        pass
+
+
+class BitBltCapture(ScreenCapture):
+    """Windows GDI BitBlt，目标为自上而下的32位DIB section，NumPy数组直接指向其内存"""
+
+    name = "bitblt"
+
+    def __init__(self):
+        super().__init__()
+        if sys.platform != "win32":
+            raise OSError("BitBlt截图只支持Windows")
+        import ctypes
+        from ctypes import wintypes
+
+        self.ctypes = ctypes
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.gdi32 = ctypes.WinDLL("gdi32", use_last_error=True)
+        handle = ctypes.c_void_p
+        self.user32.GetDC.restype = handle
+        self.user32.GetDC.argtypes = [wintypes.HWND]
+        self.user32.ReleaseDC.argtypes = [wintypes.HWND, handle]
+        self.gdi32.CreateCompatibleDC.restype = handle
+        self.gdi32.CreateCompatibleDC.argtypes = [handle]
+        self.gdi32.CreateDIBSection.restype = handle
+        self.gdi32.CreateDIBSection.argtypes = [handle, ctypes.c_void_p, wintypes.UINT,
+                                                ctypes.POINTER(ctypes.c_void_p), handle, wintypes.DWORD]
+        self.gdi32.SelectObject.restype = handle
+        self.gdi32.SelectObject.argtypes = [handle, handle]
+        self.gdi32.DeleteObject.argtypes = [handle]
+        self.gdi32.DeleteDC.argtypes = [handle]
+        self.gdi32.BitBlt.argtypes = [handle, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                      handle, ctypes.c_int, ctypes.c_int, wintypes.DWORD]
+
+        self._screen_dc = self.user32.GetDC(None)
+        self._mem_dc = self.gdi32.CreateCompatibleDC(self._screen_dc)
+        self._bitmap = None
+        self._array = None
+        self._capacity = (0, 0)
+
+    def _ensure_dib(self, width: int, height: int):
+        """DIB至少为 width x height，变大时重新创建"""
+        cap_w, cap_h = self._capacity
+        if width <= cap_w and height <= cap_h:
+            return
+        ctypes = self.ctypes
+        cap_w, cap_h = max(width, cap_w), max(height, cap_h)
+
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [("biSize", ctypes.c_uint32), ("biWidth", ctypes.c_int32), ("biHeight", ctypes.c_int32),
+                        ("biPlanes", ctypes.c_uint16), ("biBitCount", ctypes.c_uint16),
+                        ("biCompression", ctypes.c_uint32), ("biSizeImage", ctypes.c_uint32),
+                        ("biXPelsPerMeter", ctypes.c_int32), ("biYPelsPerMeter", ctypes.c_int32),
+                        ("biClrUsed", ctypes.c_uint32), ("biClrImportant", ctypes.c_uint32)]
+
+        header = BITMAPINFOHEADER()
+        header.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        header.biWidth, header.biHeight = cap_w, -cap_h    # 负高度：自上而下，与数组行序一致
+        header.biPlanes, header.biBitCount = 1, 32
+        bits = ctypes.c_void_p()
+        bitmap = self.gdi32.CreateDIBSection(self._mem_dc, ctypes.byref(header), 0, ctypes.byref(bits), None, 0)
+        if not bitmap or not bits.value:
+            raise OSError(f"CreateDIBSection失败 ({cap_w}x{cap_h})")
+        self.gdi32.SelectObject(self._mem_dc, bitmap)
+        if self._bitmap:
+            self.gdi32.DeleteObject(self._bitmap)
+        self._bitmap = bitmap
+        buffer = (ctypes.c_uint8 * (cap_w * cap_h * 4)).from_address(bits.value)
+        self._array = self.np.frombuffer(buffer, dtype=self.np.uint8).reshape(cap_h, cap_w, 4)
+        self._capacity = (cap_w, cap_h)
+        self.allocations += 1
+
+    def screen_region(self) -> Region:
+        metrics = self.user32.GetSystemMetrics
+        # SM_XVIRTUALSCREEN / SM_YVIRTUALSCREEN / SM_CXVIRTUALSCREEN / SM_CYVIRTUALSCREEN
+        return metrics(76), metrics(77), metrics(78), metrics(79)
+
+    def grab(self, region: Optional[Region] = None):
+        left, top, width, height = region or self.screen_region()
+        self._ensure_dib(width, height)
+        # SRCCOPY | CAPTUREBLT（包含分层窗口）
+        if not self.gdi32.BitBlt(self._mem_dc, 0, 0, width, height, self._screen_dc, left, top, 0x00CC0020 | 0x40000000):
+            raise OSError(f"BitBlt失败: {self.ctypes.get_last_error()}")
+        self.gdi32.GdiFlush()
+        return self._array[:height, :width]
+
+    def close(self):
+        if self._bitmap:
+            self.gdi32.DeleteObject(self._bitmap)
+            self._bitmap = None
+        if self._mem_dc:
+            self.gdi32.DeleteDC(self._mem_dc)
+            self._mem_dc = None
+        if self._screen_dc:
+            self.user32.ReleaseDC(None, self._screen_dc)
+            self._screen_dc = None
+        self._array = None
+
+
+class MssCapture(ScreenCapture):
+    """mss 截图（Windows/Linux/macOS），结果复制到复用的缓冲区"""
+
+    name = "mss"
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import mss
+        except ImportError:
+            raise ImportError("mss未安装，请运行: pip install mss")
+        self._sct = mss.mss()
+
+    def screen_region(self) -> Region:
+        m = self._sct.monitors[0]
+        return m["left"], m["top"], m["width"], m["height"]
+
+    def grab(self, region: Optional[Region] = None):
+        left, top, width, height = region or self.screen_region()
+        shot = self._sct.grab({"left": left, "top": top, "width": width, "height": height})
+        frame = self._frame(width, height)
+        frame[...] = self.np.frombuffer(shot.raw, dtype=self.np.uint8).reshape(height, width, 4)
+        return frame
+
+    def close(self):
+        self._sct.close()
+
+
+class PilCapture(ScreenCapture):
+    """PIL.ImageGrab 兜底，每帧都会分配新图像"""
+
+    name = "pil"
+
+    def __init__(self):
+        super().__init__()
+        from PIL import ImageGrab
+
+        self._grab = ImageGrab.grab
+        self._screen = None
+
+    def screen_region(self) -> Region:
+        if self._screen is None:
+            width, height = self._grab(all_screens=True).size
+            self._screen = (0, 0, width, height)
+        return self._screen
+
+    def grab(self, region: Optional[Region] = None):
+        left, top, width, height = region or self.screen_region()
+        raw = self._grab(bbox=(left, top, left + width, top + height), all_screens=True)
+        image = raw.convert("RGB")
+        self.native_bytes += image_bytes(raw) + image_bytes(image)
+        frame = self._frame(*image.size)
+        rgb = self.np.asarray(image)
+        frame[..., 0], frame[..., 1], frame[..., 2], frame[..., 3] = rgb[..., 2], rgb[..., 1], rgb[..., 0], 255
+        return frame
+
+
+_BACKEND_CLASSES = {"bitblt": BitBltCapture, "mss": MssCapture, "pil": PilCapture}
+
+
+def create_capture(backend: Optional[str] = None, logger=None) -> ScreenCapture:
+    """创建截图后端：指定 backend 时只尝试该后端，否则按 bitblt（仅Windows）、mss、pil 的顺序选择第一个可用的"""
+    names = [backend] if backend else [n for n in BACKENDS if n != "bitblt" or sys.platform == "win32"]
+    errors = []
+    for name in names:
+        if name not in _BACKEND_CLASSES:
+            raise ValueError(f"未知截图后端: {name}（可选: {', '.join(BACKENDS)}）")
+        try:
+            capture = _BACKEND_CLASSES[name]()
+        except (ImportError, OSError) as e:
+            errors.append(f"{name}: {e}")
+            continue
+        if logger:
+            logger.info(f"截图后端: {name}")
+        return capture
+    raise RuntimeError("没有可用的截图后端（" + "；".join(errors) + "）")
+
+
+def wait_for_change(capture: ScreenCapture, region: Optional[Region] = None, timeout: float = 5.0,
+                    interval: float = 0.0, min_changed: float = 0.001) -> Optional[float]:
+    """高频轮询区域画面，变化的像素字节比例超过 min_changed 时返回经过的秒数，超时返回None
+
+    参考画面和比较结果各分配一次，轮询过程中不再分配
+    """
+    np = capture.np
+    with capture.lock:
+        reference = capture.grab(region).copy()
+        changed = np.empty(reference.shape, dtype=bool)
+        threshold = max(1, int(reference.size * min_changed))
+        started = time.perf_counter()
+        while time.perf_counter() - started < timeout:
+            if interval:
+                time.sleep(interval)
+            np.not_equal(capture.grab(region), reference, out=changed)
+            if np.count_nonzero(changed) >= threshold:
+                return time.perf_counter() - started
+    return None
+
+
+def image_bytes(image) -> int:
+    """PIL图像像素缓冲区的大小（在C层分配，tracemalloc统计不到）"""
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+def benchmark(grab: Callable[[], object], frames: int = 100,
+              native_bytes: Optional[Callable[[], int]] = None) -> Dict:
+    """测量截图速率和每帧的内存分配
+
+    alloc_peak_bytes 为tracemalloc统计的峰值增量（Python对象和NumPy数组，约等于单帧的临时分配）；
+    native_bytes_per_frame 为tracemalloc看不到的原生分配：grab 返回的PIL图像，以及 native_bytes()
+    返回的累计值（如 ScreenCapture.native_bytes）的增量，按帧平均；alloc_per_frame_bytes 为两者之和
+    """
+    grab()      # 预热：分配缓冲区、建立连接
+    native_before = native_bytes() if native_bytes else 0
+    untracked = 0
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        durations = []
+        for _ in range(frames):
+            started = time.perf_counter()
+            result = grab()
+            durations.append((time.perf_counter() - started) * 1000)
+            if hasattr(result, "getbands"):
+                untracked += image_bytes(result)
+            result = None
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    if native_bytes:
+        untracked += native_bytes() - native_before
+    total = sum(durations) / 1000
+    peak = max(0, peak)
+    native_per_frame = untracked // frames if frames else 0
+    return {"frames": frames, "fps": round(frames / total, 1) if total else None,
+            "frame_ms": describe(durations), "alloc_peak_bytes": peak,
+            "native_bytes_per_frame": native_per_frame, "alloc_per_frame_bytes": peak + native_per_frame}
+
+
+def _parse_region(value: Optional[str]) -> Optional[Region]:
+    if not value:
+        return None
+    left, top, width, height = (int(v) for v in value.split(","))
+    return left, top, width, height
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="区域截图后端与基准测试")
+    parser.add_argument("--bench", action="store_true", help="测量各后端的截图速率和每帧分配")
+    parser.add_argument("--backend", choices=BACKENDS, help="只使用该后端")
+    parser.add_argument("--region", help="截图区域 left,top,width,height（默认整个屏幕）")
+    parser.add_argument("--window", type=lambda v: int(v, 0), help="截取该窗口（Windows为句柄，Linux为X11窗口ID）")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--save", metavar="PATH", help="截图保存到文件")
+    args = parser.parse_args(argv)
+
+    region = _parse_region(args.region)
+    if args.window:
+        region = window_region(args.window)
+        if region is None:
+            print(f"无法获取窗口区域: {args.window}")
+            return 2
+
+    if args.save:
+        capture = create_capture(args.backend)
+        capture.save(args.save, region)
+        print(f"已保存: {args.save}（后端 {capture.name}）")
+        capture.close()
+        return 0
+
+    if not args.bench:
+        parser.print_help()
+        return 0
+
+    rows: List[Tuple[str, Dict]] = []
+    for name in ([args.backend] if args.backend else BACKENDS):
+        try:
+            capture = create_capture(name)
+        except (RuntimeError, ImportError) as e:
+            print(f"{name}: 不可用（{e}）")
+            continue
+        try:
+            stats = benchmark(lambda: capture.grab(region), args.frames, lambda: capture.native_bytes)
+        except OSError as e:
+            print(f"{name}: 截图失败（{e}）")
+            continue
+        finally:
+            capture.close()
+        stats["buffer_allocations"] = capture.allocations
+        rows.append((name, stats))
+    try:
+        # 原来的截图方式：每次整个屏幕，分配新的PIL图像
+        from PIL import ImageGrab
+        rows.append(("fullscreen-pil", benchmark(ImageGrab.grab, args.frames)))
+    except Exception as e:
+        print(f"fullscreen-pil: 不可用（{e}）")
+
+    print(f"{'后端':<16}{'帧/秒':>8}{'P50 ms':>9}{'P95 ms':>9}{'每帧分配':>12}{'缓冲区分配':>10}")
+    for name, stats in rows:
+        ms = stats["frame_ms"]
+        print(f"{name:<16}{stats['fps'] or 0:>8.1f}{ms['p50']:>9.2f}{ms['p95']:>9.2f}"
+              f"{stats['alloc_per_frame_bytes'] / 1024:>10.1f}KB{stats.get('buffer_allocations', '-'):>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+"""
+界面操作录制与加速回放
+
+手工操作一遍应用，录制为按控件定位的操作序列，之后可以直接回放为测试，不必手写 child_window 查找和 sleep：
+  - 录制：Win32低级键盘/鼠标钩子（pywinauto.win32_hooks）捕获点击和按键，点击位置通过 UIA from_point
+    解析为控件定位信息（auto_id / 名称 / 控件类型，没有可用标识时记录最近的有标识祖先和相对位置）；
+    连续输入合并为一次文本输入，文本在输入结束时从控件读取（输入法输入的中文也能正确记录）
+  - 回放：每个操作前等待目标控件存在、可见且可用，输入文本后等待控件内容一致，不使用录制时的间隔，
+    几分钟的手工操作通常几秒内回放完成；录制时的间隔保留在文件中，回放结果给出加速比
+  - 文件：带格式版本号的JSON，每个操作占一行，便于用 git diff 比较和手工编辑（可加入 wait 操作）
+
+用法:
+    python test_session_recorder.py record recordings/ask_question.json     # 按 F12 结束录制
+    python test_session_recorder.py replay recordings/ask_question.json
+    python test_session_recorder.py show recordings/ask_question.json
+"""
+
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from test_latency_probe import read_control_value
+
+SESSION_FORMAT = "suxiaoban-session"
+SESSION_VERSION = 1
+
+# 回放时控件定位使用的字段（对应 child_window 的参数）
+LOCATOR_FIELDS = ("auto_id", "title", "control_type", "class_name", "found_index")
+
+# 按键名（pywinauto.win32_hooks）到 send_keys 语法的映射，这些按键单独记录为 keys 操作
+SPECIAL_KEYS = {
+    "Return": "{ENTER}", "Tab": "{TAB}", "Escape": "{ESC}",
+    "Up": "{UP}", "Down": "{DOWN}", "Left": "{LEFT}", "Right": "{RIGHT}",
+    "Home": "{HOME}", "End": "{END}", "Prior": "{PGUP}", "Next": "{PGDN}",
+    **{f"F{i}": f"{{F{i}}}" for i in range(1, 12)},
+}
+MODIFIER_KEYS = {"Lcontrol": "^", "Rcontrol": "^", "Lshift": "+", "Rshift": "+", "Lmenu": "%", "Rmenu": "%"}
+SEND_KEYS_ESCAPE = set("{}()+^%~[]")
+
+# 没有 auto_id 和名称时仍可按控件类型（加序号）定位的控件，如对话输入框
+INTERACTIVE_TYPES = {"Edit", "Document", "Button", "CheckBox", "ComboBox", "ListItem", "MenuItem",
+                     "TabItem", "Hyperlink", "RadioButton"}
+
+
+def escape_keys(text: str) -> str:
+    """转义 send_keys 的特殊字符，使文本按原样输入"""
+    return "".join(f"{{{c}}}" if c in SEND_KEYS_ESCAPE else c for c in text)
+
+
+def load_session(path: Path) -> Dict:
+    """读取录制文件，格式或版本不支持时抛出ValueError"""
+    with open(path, "r", encoding="utf-8") as f:
+        session = json.load(f)
+    if session.get("format") != SESSION_FORMAT:
+        raise ValueError(f"不是操作录制文件: {path}")
+    if session.get("version", 0) > SESSION_VERSION:
+        raise ValueError(f"录制文件版本 {session['version']} 高于支持的版本 {SESSION_VERSION}，请更新测试工具")
+    return session
+
+
+def save_session(session: Dict, path: Path):
+    """写出录制文件：元数据缩进显示，每个操作占一行"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = {k: v for k, v in session.items() if k != "actions"}
+    lines = [json.dumps(header, ensure_ascii=False, indent=2)[:-2] + ',\n  "actions": [']
+    actions = session.get("actions", [])
+    for i, action in enumerate(actions):
+        lines.append("    " + json.dumps(action, ensure_ascii=False) + ("," if i < len(actions) - 1 else ""))
+    lines.append("  ]\n}\n")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def new_session(window_title: str = "", actions: Optional[List[Dict]] = None) -> Dict:
+    return {
+        "format": SESSION_FORMAT,
+        "version": SESSION_VERSION,
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "window": window_title,
+        "actions": actions or [],
+    }
+
+
+def recorded_seconds(session: Dict) -> float:
+    """录制时操作的总时长（各操作前的间隔和输入耗时之和）"""
+    return sum(a.get("delay", 0) + a.get("duration", 0) for a in session.get("actions", []))
+
+
+def describe_target(target: Optional[Dict]) -> str:
+    if not target:
+        return "主窗口"
+    label = target.get("auto_id") or target.get("title") or target.get("class_name") or "?"
+    return f"{target.get('control_type', '')}[{label}]" + (f"#{target['found_index']}" if "found_index" in target else "")
+
+
+def _locator(info) -> Dict:
+    """UIA元素的定位信息，只保留非空字段"""
+    locator = {"auto_id": info.automation_id, "title": info.name,
+               "control_type": info.control_type, "class_name": info.class_name}
+    return {k: v for k, v in locator.items() if v}
+
+
+class SessionRecorder:
+    """通过低级钩子录制对某个窗口的点击和键盘输入
+
+    钩子回调中只把原始事件放入队列（低级钩子回调过慢会被系统移除），控件解析在单独的线程中进行
+    """
+
+    def __init__(self, window, stop_key: str = "F12", logger=None):
+        self.window = window                  # pywinauto UIA 窗口包装对象
+        self.stop_key = stop_key
+        self.logger = logger
+        self.actions: List[Dict] = []
+        self._events = queue.Queue()
+        self._hook = None
+        self._last_time = None
+        self._typing = None                   # 正在进行的连续输入 {"target", "started", "delay"}
+        self._modifiers = set()
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def record(self) -> Dict:
+        """开始录制，按下停止键后返回录制结果"""
+        from pywinauto.win32_hooks import Hook
+
+        worker = threading.Thread(target=self._process_events, name="session-recorder", daemon=True)
+        worker.start()
+        self._hook = Hook()
+        self._hook.handler = self._on_event
+        self._log(f"开始录制，按 {self.stop_key} 结束")
+        self._last_time = time.perf_counter()
+        self._hook.hook(keyboard=True, mouse=True)    # 在当前线程运行消息循环，直到 stop
+        self._events.put(None)
+        worker.join()
+        self._flush_typing(time.perf_counter())
+        self._log(f"录制结束: {len(self.actions)} 个操作，时长 {recorded_seconds({'actions': self.actions}):.1f}s")
+        return new_session(self.window.window_text(), self.actions)
+
+    def _on_event(self, event):
+        """钩子回调（钩子线程）：只记录时间和原始信息"""
+        from pywinauto.win32_hooks import KeyboardEvent
+
+        now = time.perf_counter()
+        if isinstance(event, KeyboardEvent):
+            if event.current_key == self.stop_key and event.event_type == "key down":
+                import ctypes
+                self._hook.stop()
+                ctypes.windll.user32.PostQuitMessage(0)
+                return
+            self._events.put(("key", now, event.current_key, event.event_type))
+        elif event.current_key == "LButton" and event.event_type == "key down":
+            # 在按下时解析，界面还没有因为这次点击发生变化
+            self._events.put(("click", now, event.mouse_x, event.mouse_y))
+
+    def _process_events(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            try:
+                if item[0] == "click":
+                    self._on_click(*item[1:])
+                else:
+                    self._on_key(*item[1:])
+            except Exception as e:
+                self._log(f"录制事件处理失败（已忽略）: {e}")
+
+    def _delay(self, now: float) -> float:
+        delay, self._last_time = now - self._last_time, now
+        return round(delay, 3)
+
+    def _add(self, action: Dict, now: float):
+        action["delay"] = self._delay(now)
+        self.actions.append(action)
+        self._log(f"  {action['action']:<6} {describe_target(action.get('target'))} {action.get('keys', '')}")
+
+    def _on_click(self, now: float, x: int, y: int):
+        rect = self.window.rectangle()
+        if not (rect.left <= x < rect.right and rect.top <= y < rect.bottom):
+            return
+        self._flush_typing(now)
+        from pywinauto.uia_element_info import UIAElementInfo
+
+        target, offset = self.resolve_point(UIAElementInfo.from_point(x, y), x, y)
+        action = {"action": "click", "target": target}
+        if offset:
+            action["offset"] = offset
+        self._add(action, now)
+
+    def resolve_point(self, info, x: int, y: int):
+        """点击位置的定位信息：元素本身没有可用标识时使用最近的有标识祖先，并记录点击在其中的相对位置"""
+        window_handle = self.window.handle
+        element = info
+        while element is not None and not (element.automation_id or element.name
+                                           or element.control_type in INTERACTIVE_TYPES):
+            parent = element.parent
+            if parent is None or element.handle == window_handle:
+                break
+            element = parent
+        if element is None or element.handle == window_handle:
+            return None, self._relative(self.window.rectangle(), x, y)
+
+        target = _locator(element)
+        matches = self.window.descendants(**{k: v for k, v in target.items() if k != "auto_id"})
+        if target.get("auto_id"):
+            matches = [m for m in matches if m.element_info.automation_id == target["auto_id"]]
+        if len(matches) > 1:
+            for i, m in enumerate(matches):
+                if m.element_info == element:
+                    target["found_index"] = i
+                    break
+        offset = None if element is info else self._relative(element.rectangle, x, y)
+        return target, offset
+
+    @staticmethod
+    def _relative(rect, x: int, y: int) -> List[float]:
+        width, height = max(rect.width(), 1), max(rect.height(), 1)
+        return [round((x - rect.left) / width, 3), round((y - rect.top) / height, 3)]
+
+    def _on_key(self, now: float, key: str, event_type: str):
+        if key in MODIFIER_KEYS:
+            (self._modifiers.add if event_type == "key down" else self._modifiers.discard)(MODIFIER_KEYS[key])
+            return
+        if event_type != "key down":
+            return
+        chord = "".join(sorted(self._modifiers - {"+"}))
+        if key in SPECIAL_KEYS or chord:
+            # 组合键和功能键单独记录；先结束正在进行的输入，使文本在按键之前输入
+            self._flush_typing(now)
+            name = SPECIAL_KEYS.get(key) or (key.lower() if len(key) == 1 else f"{{{key.upper()}}}")
+            prefix = "".join(sorted(self._modifiers)) if key in SPECIAL_KEYS else chord
+            self._add({"action": "keys", "keys": prefix + name}, now)
+            return
+        if self._typing is None:
+            from pywinauto.uia_element_info import UIAElementInfo
+            from pywinauto.uia_defines import IUIA
+
+            focused = UIAElementInfo(IUIA().iuia.GetFocusedElement())
+            target, _ = self.resolve_point(focused, 0, 0)
+            self._typing = {"target": target, "started": now, "delay": self._delay(now)}
+
+    def _flush_typing(self, now: float):
+        """结束连续输入：从控件读取最终文本，记录为一次 type 操作"""
+        typing, self._typing = self._typing, None
+        if typing is None:
+            return
+        control = self._control(typing["target"])
+        text = read_control_value(control) if control is not None else ""
+        action = {"action": "type", "target": typing["target"], "text": text,
+                  "delay": typing["delay"], "duration": round(now - typing["started"], 3)}
+        self._last_time = now
+        self.actions.append(action)
+        self._log(f"  type   {describe_target(typing['target'])} {text!r}")
+
+    def _control(self, target: Optional[Dict]):
+        if not target:
+            return self.window
+        try:
+            return self.window.child_window(**target).wrapper_object()
+        except Exception:
+            return None
+
+
+class SessionReplayer:
+    """按条件等待回放录制的操作"""
+
+    def __init__(self, window, timeout: float = 10.0, poll_interval: float = 0.05, logger=None):
+        self.window = window                  # pywinauto 窗口（WindowSpecification 或包装对象）
+        self.timeout = timeout                # 单个操作等待目标控件就绪的上限
+        self.poll_interval = poll_interval
+        self.logger = logger
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def _wait_for(self, condition, description: str):
+        """轮询直到 condition() 返回真值，超时抛出TimeoutError"""
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            try:
+                value = condition()
+                if value:
+                    return value
+            except Exception:
+                pass
+            if time.perf_counter() >= deadline:
+                raise TimeoutError(f"等待 {description} 超时（{self.timeout:.1f}s）")
+            time.sleep(self.poll_interval)
+
+    def _ready(self, target: Optional[Dict]):
+        """目标控件存在、可见且可用时返回包装对象"""
+        def check():
+            if not target:
+                return self.window
+            control = self.window.child_window(**{k: v for k, v in target.items() if k in LOCATOR_FIELDS})
+            wrapper = control.wrapper_object()
+            return wrapper if wrapper.is_visible() and wrapper.is_enabled() else None
+        return self._wait_for(check, describe_target(target))
+
+    def _gone(self, target: Dict):
+        control = self.window.child_window(**{k: v for k, v in target.items() if k in LOCATOR_FIELDS})
+        return self._wait_for(lambda: not control.exists(timeout=0), f"{describe_target(target)} 消失")
+
+    def perform(self, action: Dict):
+        """执行单个操作，目标未就绪或操作结果未出现时抛出异常"""
+        kind = action["action"]
+        if kind == "wait":
+            if action.get("state") == "gone":
+                self._gone(action["target"])
+            else:
+                self._ready(action.get("target"))
+            return
+        control = self._ready(action.get("target"))
+        if kind == "click":
+            offset = action.get("offset")
+            if offset:
+                rect = control.rectangle()
+                control.click_input(coords=(int(rect.width() * offset[0]), int(rect.height() * offset[1])))
+            else:
+                control.click_input()
+        elif kind == "type":
+            text = action.get("text", "")
+            control.click_input()
+            control.type_keys("^a{BACKSPACE}" + escape_keys(text), with_spaces=True, with_tabs=True,
+                              with_newlines=True, pause=0)
+            self._wait_for(lambda: read_control_value(control).strip() == text.strip(),
+                           f"{describe_target(action.get('target'))} 内容更新")
+        elif kind == "keys":
+            control.type_keys(action["keys"], set_foreground=False, pause=0)
+        else:
+            raise ValueError(f"未知操作: {kind}")
+
+    def replay(self, session: Dict) -> Dict:
+        """依次执行全部操作，第一个失败的操作处停止"""
+        actions = session.get("actions", [])
+        report = {"actions": len(actions), "completed": 0, "recorded_seconds": round(recorded_seconds(session), 3),
+                  "failed_at": None, "error": None, "steps": []}
+        started = time.perf_counter()
+        for i, action in enumerate(actions):
+            step_started = time.perf_counter()
+            try:
+                self.perform(action)
+            except Exception as e:
+                report["failed_at"] = i
+                report["error"] = f"第{i + 1}个操作 {action['action']} {describe_target(action.get('target'))}: {e}"
+                self._log(f"回放失败: {report['error']}")
+                break
+            elapsed = time.perf_counter() - step_started
+            report["steps"].append(round(elapsed, 3))
+            report["completed"] += 1
+            self._log(f"  [{i + 1}/{len(actions)}] {action['action']:<6} {describe_target(action.get('target'))} "
+                      f"{elapsed * 1000:.0f}ms（录制 {action.get('delay', 0):.2f}s）")
+        report["replay_seconds"] = round(time.perf_counter() - started, 3)
+        report["speedup"] = (round(report["recorded_seconds"] / report["replay_seconds"], 1)
+                             if report["replay_seconds"] > 0 else None)
+        return report
+
+
+def _connect(title: str):
+    from pywinauto import Desktop
+
+    return Desktop(backend="uia").window(title_re=title).wrapper_object()
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="界面操作录制与加速回放")
+    parser.add_argument("command", choices=("record", "replay", "show"))
+    parser.add_argument("path", help="录制文件")
+    parser.add_argument("--title", default=".*灵犀.*", help="应用主窗口标题（正则）")
+    parser.add_argument("--stop-key", default="F12", help="结束录制的按键")
+    parser.add_argument("--timeout", type=float, default=10.0, help="回放时单个操作的等待上限（秒）")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        session = load_session(Path(args.path))
+        print(f"{args.path}: 版本 {session['version']}，录制于 {session.get('recorded_at')}，"
+              f"{len(session['actions'])} 个操作，时长 {recorded_seconds(session):.1f}s")
+        for i, action in enumerate(session["actions"], 1):
+            detail = action.get("keys") or (repr(action["text"]) if "text" in action else "")
+            print(f"{i:>4}. +{action.get('delay', 0):6.2f}s {action['action']:<6} "
+                  f"{describe_target(action.get('target'))} {detail}")
+        return 0
+
+    if sys.platform != "win32":
+        print("录制和回放需要在Windows上运行（pywinauto）")
+        return 2
+    window = _connect(args.title)
+    if args.command == "record":
+        session = SessionRecorder(window, args.stop_key).record()
+        save_session(session, Path(args.path))
+        print(f"已保存: {args.path}")
+        return 0
+
+    session = load_session(Path(args.path))
+    report = SessionReplayer(window, args.timeout).replay(session)
+    print(f"完成 {report['completed']}/{report['actions']} 个操作，用时 {report['replay_seconds']:.1f}s"
+          f"（录制 {report['recorded_seconds']:.1f}s，加速 {report['speedup']}x）")
+    if report["error"]:
+        print(report["error"])
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
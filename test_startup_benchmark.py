@@ -0,0 +1,210 @@
+"""
+应用启动时间基准测试
+
+重复启动应用N次（每次之间结束进程，冷启动时可先清空系统文件缓存），记录：
+  - spawn:       调用启动到进程创建完成
+  - first_window: 调用启动到出现第一个可见顶层窗口
+  - interactive: 调用启动到主窗口出现并能及时响应消息
+并输出各阶段的分布统计，用于发现不同版本之间的启动性能回退。
+
+用法:
+    python test_startup_benchmark.py --exe "C:\\...\\灵犀·晓伴.exe" --runs 10 [--cold]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from test_stats import describe
+from test_window_utils import enum_process_windows, find_main_window, is_window_responsive
+
+PHASES = ("spawn", "first_window", "interactive")
+
+
+def drop_file_caches(command: Optional[str] = None) -> bool:
+    """清空系统文件缓存以模拟冷启动
+
+    Windows没有内置命令，需要通过 command 指定（如 "RAMMap64.exe -Ew"）；
+    Linux 需要root权限写 /proc/sys/vm/drop_caches。
+    """
+    if command:
+        return subprocess.run(command, shell=True).returncode == 0
+    if sys.platform.startswith("linux"):
+        try:
+            subprocess.run(["sync"], check=False)
+            with open("/proc/sys/vm/drop_caches", "w") as f:
+                f.write("3\n")
+            return True
+        except OSError:
+            return False
+    return False
+
+
+def kill_process_tree(pid: int, timeout: float = 10.0):
+    """结束进程及其所有子进程"""
+    import psutil
+    try:
+        root = psutil.Process(pid)
+        procs = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return
+    for p in procs:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(procs, timeout=timeout)
+
+
+def kill_by_name(exe_name: str) -> List[int]:
+    """结束所有同名进程（单实例应用已在运行时新启动的进程会直接退出），返回被结束的进程ID"""
+    import psutil
+    killed = []
+    for p in psutil.process_iter(["name"]):
+        if p.info["name"] == exe_name and p.pid != os.getpid():
+            kill_process_tree(p.pid)
+            killed.append(p.pid)
+    return killed
+
+
+class StartupBenchmark:
+    """启动时间基准测试"""
+
+    def __init__(self, exe_path: str, runs: int = 5, cold: bool = False, drop_caches_cmd: Optional[str] = None,
+                 window_timeout: float = 60.0, poll_interval: float = 0.01, settle_time: float = 2.0,
+                 ready_check: Optional[Callable[[int, int], bool]] = None, logger=None):
+        try:
+            import psutil
+        except ImportError:
+            raise ImportError("psutil未安装，请运行: pip install psutil")
+        self.psutil = psutil
+        self.exe_path = exe_path
+        self.runs = runs
+        self.cold = cold
+        self.drop_caches_cmd = drop_caches_cmd
+        self.window_timeout = window_timeout
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time      # 每次结束进程后等待系统稳定的时间
+        self.ready_check = ready_check      # 自定义可交互判断 (pid, hwnd) -> bool，默认为主窗口响应消息
+        self.logger = logger
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def _launched_pids(self, root_pid: int, exe_name: str, before: Set[int]) -> List[int]:
+        """本次启动产生的进程：启动的进程树，以及启动后新出现的同名进程和它们的子进程
+
+        启动器进程可能在主窗口出现前退出，主窗口所在的进程不一定是它的子进程，所以按启动前的进程快照比较
+        """
+        pids = {root_pid}
+        for p in self.psutil.process_iter(["name"]):
+            if p.pid not in before and (p.pid == root_pid or p.info["name"] == exe_name):
+                pids.add(p.pid)
+                try:
+                    pids.update(c.pid for c in p.children(recursive=True))
+                except self.psutil.Error:
+                    pass
+        return sorted(pids)
+
+    def measure_once(self) -> Dict[str, Optional[float]]:
+        """启动一次并测量各阶段耗时（秒），未达到的阶段记为None；结束时结束本次启动产生的所有进程"""
+        timings = dict.fromkeys(PHASES)
+        exe_name = Path(self.exe_path).name
+        before = set(self.psutil.pids())
+        start = time.perf_counter()
+        popen = subprocess.Popen([self.exe_path])
+        timings["spawn"] = time.perf_counter() - start
+
+        deadline = start + self.window_timeout
+        try:
+            while time.perf_counter() < deadline:
+                pids = self._launched_pids(popen.pid, exe_name, before)
+                if timings["first_window"] is None and enum_process_windows(pids):
+                    timings["first_window"] = time.perf_counter() - start
+                if timings["first_window"] is not None:
+                    hwnd = find_main_window(pids)
+                    if hwnd:
+                        if self.ready_check:
+                            ready = self.ready_check(popen.pid, hwnd)
+                        else:
+                            ready, _ = is_window_responsive(hwnd, timeout_ms=50)
+                        if ready:
+                            timings["interactive"] = time.perf_counter() - start
+                            break
+                time.sleep(self.poll_interval)
+        finally:
+            for pid in self._launched_pids(popen.pid, exe_name, before):
+                kill_process_tree(pid)
+            popen.wait()
+        return timings
+
+    def run(self) -> Dict:
+        """执行基准测试，返回每次的测量值和各阶段分布统计
+
+        开始前结束已在运行的同名实例（包括测试运行器连接的实例，调用方需要重新连接），
+        之后每次结束本次启动产生的所有进程（见 _launched_pids）
+        """
+        exe_name = Path(self.exe_path).name
+        samples = []
+        killed = kill_by_name(exe_name)
+        if killed:
+            self._log(f"结束已在运行的 {len(killed)} 个实例: {killed}")
+        for i in range(self.runs):
+            time.sleep(self.settle_time)
+            cold = self.cold and drop_file_caches(self.drop_caches_cmd)
+            if self.cold and not cold:
+                self._log("无法清空文件缓存，本次按热启动计")
+            timings = self.measure_once()
+            timings["cold"] = cold
+            samples.append(timings)
+            self._log(f"启动 {i + 1}/{self.runs}: " + ", ".join(
+                f"{p}={timings[p]:.3f}s" if timings[p] is not None else f"{p}=超时" for p in PHASES))
+
+        stats = {p: describe([s[p] for s in samples if s[p] is not None]) for p in PHASES}
+        return {
+            "exe": self.exe_path,
+            "runs": self.runs,
+            "cold": bool(samples) and all(s["cold"] for s in samples),
+            "cold_runs": sum(1 for s in samples if s["cold"]),
+            "killed_pids": killed,
+            "timeouts": sum(1 for s in samples if s["interactive"] is None),
+            "samples": samples,
+            "stats": stats,
+        }
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="灵犀·晓伴启动时间基准测试")
+    parser.add_argument("--exe", required=True, help="应用程序可执行文件路径")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数")
+    parser.add_argument("--cold", action="store_true", help="每次启动前清空文件缓存")
+    parser.add_argument("--drop-caches-cmd", help="清空文件缓存的命令（Windows需要，如 RAMMap64.exe -Ew）")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次启动等待主窗口的超时（秒）")
+    parser.add_argument("--json", dest="json_path", help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    bench = StartupBenchmark(args.exe, runs=args.runs, cold=args.cold, drop_caches_cmd=args.drop_caches_cmd,
+                             window_timeout=args.timeout)
+    result = bench.run()
+    for phase in PHASES:
+        s = result["stats"][phase]
+        if s["count"]:
+            print(f"{phase:<14} 中位数 {s['p50']:.3f}s  均值 {s['mean']:.3f}s  P95 {s['p95']:.3f}s  "
+                  f"最小 {s['min']:.3f}s  最大 {s['max']:.3f}s")
+        else:
+            print(f"{phase:<14} 无有效样本")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0 if result["timeouts"] < result["runs"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+统计辅助函数：分布统计与线性回归
+"""
+
+import math
+from typing import Dict, Optional, Sequence
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """线性插值百分位数，sorted_values 需已升序排列"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = math.floor(k)
+    hi = math.ceil(k)
+    if lo == hi:
+        return float(sorted_values[int(k)])
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def describe(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """计算样本的分布统计：数量、最小/最大、均值、标准差和常用百分位数"""
+    n = len(values)
+    if n == 0:
+        return {"count": 0, "min": None, "max": None, "mean": None, "stdev": None,
+                "p50": None, "p90": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+    mean = sum(ordered) / n
+    stdev = math.sqrt(sum((v - mean) ** 2 for v in ordered) / (n - 1)) if n > 1 else 0.0
+    return {
+        "count": n,
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": mean,
+        "stdev": stdev,
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def linear_regression(xs: Sequence[float], ys: Sequence[float]) -> Dict[str, float]:
+    """最小二乘线性回归，返回斜率、截距和决定系数r2"""
+    n = len(xs)
+    if n < 2:
+        return {"slope": 0.0, "intercept": ys[0] if n else 0.0, "r2": 0.0}
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    if sxx == 0:
+        return {"slope": 0.0, "intercept": mean_y, "r2": 0.0}
+    slope = sxy / sxx
+    r2 = (sxy * sxy) / (sxx * syy) if syy else 0.0
+    return {"slope": slope, "intercept": mean_y - slope * mean_x, "r2": r2}
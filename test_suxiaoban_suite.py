@@ -5,13 +5,19 @@
 """
 
 import os
+import json
 import time
+import argparse
+import subprocess
+from test_prioritizer import ORDER_MODES
+from test_scheduler import CaseScheduler, case
 from test_suxiaoban import WindowsTestRunner, CrossPlatformTestRunner, TestConfig
 
 
 class SuxiaobanTestSuite(WindowsTestRunner):
     """灵犀·晓伴测试套件"""
     
+    @case(depends=("launch_application",), tags=("custom", "menu"), cacheable=True)
     def test_file_menu(self) -> bool:
         """测试文件菜单"""
         self.logger.info("测试文件菜单")
@@ -26,7 +32,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             
             self.logger.info("打开文件菜单...")
             main_window.type_keys("%F", set_foreground=False)
-            time.sleep(1)
+            self.sleep(1)
             
             self.log_test_result(test_name, True, "文件菜单测试通过")
             return True
@@ -35,6 +41,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(depends=("launch_application",), tags=("custom", "menu"), cacheable=True)
     def test_edit_menu(self) -> bool:
         """测试编辑菜单"""
         self.logger.info("测试编辑菜单")
@@ -49,7 +56,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             
             self.logger.info("打开编辑菜单...")
             main_window.type_keys("%E", set_foreground=False)
-            time.sleep(1)
+            self.sleep(1)
             
             self.log_test_result(test_name, True, "编辑菜单测试通过")
             return True
@@ -58,6 +65,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(depends=("launch_application",), tags=("custom", "menu"), cacheable=True)
     def test_help_menu(self) -> bool:
         """测试帮助菜单"""
         self.logger.info("测试帮助菜单")
@@ -72,7 +80,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             
             self.logger.info("打开帮助菜单...")
             main_window.type_keys("%H", set_foreground=False)
-            time.sleep(1)
+            self.sleep(1)
             
             self.log_test_result(test_name, True, "帮助菜单测试通过")
             return True
@@ -81,6 +89,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(depends=("launch_application",), tags=("custom", "keyboard"), cacheable=True)
     def test_shortcuts(self) -> bool:
         """测试快捷键功能"""
         self.logger.info("测试快捷键功能")
@@ -103,7 +112,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             for shortcut, desc in shortcuts:
                 self.logger.info(f"测试快捷键: {shortcut} ({desc})")
                 main_window.type_keys(f"^{shortcut[-1]}", set_foreground=False)
-                time.sleep(0.5)
+                self.sleep(0.5)
             
             self.log_test_result(test_name, True, f"测试了 {len(shortcuts)} 个快捷键")
             return True
@@ -112,6 +121,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(depends=("launch_application",), tags=("custom", "window"), cacheable=True)
     def test_window_controls(self) -> bool:
         """测试窗口控制功能"""
         self.logger.info("测试窗口控制功能")
@@ -126,19 +136,19 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             
             self.logger.info("测试最小化...")
             main_window.minimize()
-            time.sleep(1)
+            self.sleep(1)
             
             self.logger.info("测试恢复...")
             main_window.restore()
-            time.sleep(1)
+            self.sleep(1)
             
             self.logger.info("测试最大化...")
             main_window.maximize()
-            time.sleep(1)
+            self.sleep(1)
             
             self.logger.info("测试恢复...")
             main_window.restore()
-            time.sleep(1)
+            self.sleep(1)
             
             self.log_test_result(test_name, True, "窗口控制测试通过")
             return True
@@ -147,6 +157,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(depends=("launch_application",), tags=("custom", "window"), cacheable=True)
     def test_resize_window(self) -> bool:
         """测试窗口大小调整"""
         self.logger.info("测试窗口大小调整")
@@ -162,7 +173,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.logger.info("设置窗口大小为 800x600...")
             main_window.set_window_position(0, 0)
             main_window.set_window_size(800, 600)
-            time.sleep(1)
+            self.sleep(1)
             
             rect = main_window.rectangle()
             self.logger.info(f"当前窗口大小: {rect.width()}x{rect.height()}")
@@ -174,6 +185,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(depends=("launch_application",), tags=("custom", "stability"))
     def test_app_stability(self) -> bool:
         """测试应用稳定性（长时间运行）"""
         self.logger.info("测试应用稳定性")
@@ -191,7 +203,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             
             for i in range(test_duration):
                 self.logger.info(f"稳定性测试进行中... {i+1}/{test_duration} 秒")
-                time.sleep(1)
+                self.sleep(1)
                 
                 if not main_window.exists():
                     raise Exception("应用程序意外关闭")
@@ -203,19 +215,217 @@ class SuxiaobanTestSuite(WindowsTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    async def test_app_stability_async(self, core) -> bool:
+        """稳定性测试（协程版）：轮询窗口存活的同时，并发采集资源样本和定时截图"""
+        self.logger.info("测试应用稳定性（异步）")
+        test_name = "稳定性测试(异步)"
+        
+        if not self.app:
+            self.log_test_result(test_name, False, "应用程序未启动")
+            return False
+        
+        main_window = await core.call(self.app.window)
+        test_duration = 10
+        samples = []
+        screenshots = []
+        
+        def capture():
+            path = self.config.log_dir / f"stability_{len(screenshots)}.png"
+            main_window.capture_as_image().save(str(path))
+            screenshots.append(path.name)
+        
+        async with core.scope():
+            try:
+                from test_resource_monitor import ProcessTreeSampler
+                sampler = ProcessTreeSampler(self.app.process)
+                core.periodic(1.0, lambda: samples.append(sampler.sample()), name="resource-sample")
+            except ImportError as e:
+                self.logger.warning(f"跳过资源采样: {e}")
+            core.periodic(5.0, capture, name="screenshot", on_uia=True)
+            
+            # 窗口消失时 poll_until 立即返回，否则在 test_duration 秒后超时
+            closed = await core.poll_until(lambda: not main_window.exists(), timeout=test_duration, interval=1.0)
+        
+        if closed:
+            self.log_test_result(test_name, False, "应用程序意外关闭")
+            return False
+        
+        peak_rss = max((s["rss"] for s in samples), default=0) / 1024 / 1024
+        self.log_test_result(test_name, True,
+                             f"稳定性测试通过 ({test_duration}秒, {len(samples)} 个资源样本, "
+                             f"RSS峰值 {peak_rss:.1f}MB, {len(screenshots)} 张截图)",
+                             screenshot=screenshots[-1] if screenshots else None)
+        return True
+    
+    @case(depends=("launch_application",), tags=("custom", "soak", "slow"), when="soak_enabled")
+    def test_app_soak(self, duration: float = None, interactions=None) -> bool:
+        """长时间运行测试：采样应用进程树的资源占用并判断是否存在泄漏
+        
+        interactions 为soak期间循环执行的交互脚本（无参可调用对象列表），
+        未指定时使用最小化/恢复窗口作为默认交互
+        """
+        self.logger.info("长时间运行（soak）测试")
+        test_name = "资源Soak测试"
+        
+        try:
+            if not self.app:
+                self.log_test_result(test_name, False, "应用程序未启动")
+                return False
+            
+            from test_resource_monitor import ProcessTreeSampler, ResourceSoak
+            
+            main_window = self.app.window()
+            duration = duration if duration is not None else self.config.soak_duration
+            
+            if interactions is None:
+                def minimize_restore():
+                    main_window.minimize()
+                    self.sleep(1)
+                    main_window.restore()
+                interactions = [minimize_restore]
+            
+            soak = ResourceSoak(
+                ProcessTreeSampler(self.app.process),
+                duration=duration,
+                interval=self.config.soak_sample_interval,
+                capacity=self.config.soak_ring_capacity,
+                interactions=interactions,
+                interaction_interval=self.config.soak_interaction_interval,
+                leak_rss_mb_per_hour=self.config.soak_leak_rss_mb_per_hour,
+                leak_handles_per_hour=self.config.soak_leak_handles_per_hour,
+                on_sample=self.metrics.observe_sample if self.metrics else None
+            )
+            server = None
+            if self.metrics and self.config.metrics_http_port:
+                from test_metrics_export import MetricsServer
+                server = MetricsServer(self.metrics.registry, port=self.config.metrics_http_port).start()
+                self.logger.info(f"soak期间的实时指标: {server.url}")
+            self.logger.info(f"进行 {duration} 秒soak测试，采样间隔 {self.config.soak_sample_interval} 秒...")
+            try:
+                summary = soak.run(alive_check=main_window.exists)
+            finally:
+                if server:
+                    server.stop()
+            soak.save_samples(self.config.log_dir / "soak_samples.csv")
+            
+            rss = summary["metrics"]["rss"]
+            handles = summary["metrics"]["handles"]
+            message = (f"{summary['samples']} 个样本, RSS峰值 {(rss['max'] or 0) / 1024 / 1024:.1f}MB "
+                       f"(斜率 {rss['slope_per_hour'] / 1024 / 1024:.1f}MB/h), "
+                       f"句柄峰值 {handles['max'] or 0:.0f} (斜率 {handles['slope_per_hour']:.1f}/h)")
+            if summary["leak_suspected"]:
+                message += f", 疑似泄漏: {', '.join(summary['leaks'])}"
+            if summary["errors"]:
+                message += f", 错误: {'; '.join(summary['errors'][:3])}"
+            
+            passed = not summary["leak_suspected"] and not summary["errors"]
+            self.log_test_result(test_name, passed, message, resources=summary)
+            return passed
+            
+        except Exception as e:
+            self.log_test_result(test_name, False, f"测试失败: {str(e)}")
+            return False
+    
+    def _open_chat_session(self, index: int, spawned: list):
+        """创建第index个对话会话：第0个使用当前主窗口，其余各启动一个新的应用实例（在UIA线程中调用）"""
+        from test_load_generator import UiaChatSession
+        from test_window_utils import find_main_window
+        import psutil
+        
+        if index == 0:
+            window = self._find_and_connect_window()
+        else:
+            exe_path = self.find_app_executable()
+            if not exe_path:
+                raise Exception("未找到应用程序可执行文件")
+            proc = psutil.Process(subprocess.Popen([exe_path]).pid)
+            spawned.append(proc.pid)
+            hwnd = None
+            deadline = time.time() + self.config.timeout  # 应用启动时间，不缩放
+            while not hwnd and time.time() < deadline:
+                self.sleep(0.5)
+                try:
+                    pids = [proc.pid] + [c.pid for c in proc.children(recursive=True)]
+                except psutil.Error:
+                    raise Exception(f"第{index + 1}个应用实例启动后退出（应用可能不支持多开）")
+                hwnd = find_main_window(pids)
+            if not hwnd:
+                raise Exception(f"第{index + 1}个应用实例未出现主窗口")
+            window = self.Application(backend="uia").connect(handle=hwnd).window(handle=hwnd)
+        
+        self._open_ask_page(window)
+        input_box = self._find_input_box(window)
+        if not input_box.exists():
+            raise Exception(f"会话{index + 1}未找到输入框")
+        return UiaChatSession(window, input_box, self.uia, timeout=self.config.load_request_timeout,
+                              name=f"实例{index + 1}")
+    
+    @case(depends=("launch_application",), tags=("custom", "load", "slow"), when="load_enabled", on_uia=False)
+    def test_chat_load(self, levels=None, mode: str = None) -> bool:
+        """多会话并发对话负载测试：逐步增加并发会话数，统计吞吐量、延迟和错误率
+        
+        本测试在调度线程中执行（各会话等待回复时要让出UIA线程），界面操作由会话交给 self.uia
+        """
+        self.logger.info("多会话并发对话负载测试")
+        test_name = "并发对话负载测试"
+        
+        from test_load_generator import ChatLoadGenerator, find_saturation
+        from test_startup_benchmark import kill_process_tree
+        
+        levels = levels or self.config.load_levels
+        mode = mode or self.config.load_mode
+        sessions, spawned = {}, []
+        
+        def session_factory(i):
+            # 会话在各并发度之间复用，避免重复启动实例
+            if i not in sessions:
+                sessions[i] = self.uia.call(self._open_chat_session, i, spawned)
+            return sessions[i]
+        
+        try:
+            generator = ChatLoadGenerator(session_factory, logger=self.logger)
+            results = generator.sweep(levels, mode=mode, duration=self.config.load_duration,
+                                      rate=self.config.load_open_rate, think_time=self.config.load_think_time)
+            knee = find_saturation(results)
+            with open(self.config.log_dir / "chat_load.json", "w", encoding="utf-8") as f:
+                json.dump({"levels": results, "saturation": knee}, f, ensure_ascii=False, indent=2)
+            
+            message = "; ".join(f"并发{r['concurrency']}: 吞吐 {r['throughput']:.2f}/s, "
+                                f"P95 {r['latency_ms']['p95'] / 1000:.1f}s, 错误率 {r['error_rate']:.1f}%"
+                                for r in results)
+            if knee:
+                message += f"; 并发{knee}起接近饱和"
+            passed = all(r["error_rate"] <= self.config.load_max_error_rate for r in results)
+            self.log_test_result(test_name, passed, message, load=results)
+            return passed
+            
+        except Exception as e:
+            self.log_test_result(test_name, False, f"测试失败: {str(e)}")
+            return False
+        finally:
+            for pid in spawned:
+                kill_process_tree(pid)
+    
+    @case(depends=("launch_application",), tags=("custom", "recorded"))
+    def test_recorded_sessions(self) -> bool:
+        """回放 recordings 目录中的全部录制文件，每个文件记录一条结果"""
+        self.logger.info("录制操作回放测试")
+        recordings = sorted(self.config.recordings_dir.glob("*.json"))
+        if not recordings:
+            self.skip_test("录制回放", f"{self.config.recordings_dir} 中没有录制文件")
+            return True
+        results = [self.replay_recording(path) for path in recordings]
+        return all(results)
+    
     def run_custom_tests(self):
         """运行自定义测试套件"""
         self.logger.info("=" * 60)
         self.logger.info("开始自定义测试套件")
         self.logger.info("=" * 60)
         
-        self.test_file_menu()
-        self.test_edit_menu()
-        self.test_help_menu()
-        self.test_shortcuts()
-        self.test_window_controls()
-        self.test_resize_window()
-        self.test_app_stability()
+        # 启动测试作为依赖自动加入（本次会话中已通过时不再重复）；soak和负载测试按配置启用；
+        # 设置了 config.suite_time_budget 时按历史耗时排序并裁剪
+        self.run_cases(tags=("custom",))
         
         self.print_summary()
 
@@ -223,6 +433,7 @@ class SuxiaobanTestSuite(WindowsTestRunner):
 class CrossPlatformTestSuite(CrossPlatformTestRunner):
     """跨平台测试套件"""
     
+    @case(tags=("custom", "mouse"))
     def test_mouse_operations(self) -> bool:
         """测试鼠标操作"""
         self.logger.info("测试鼠标操作")
@@ -235,8 +446,8 @@ class CrossPlatformTestSuite(CrossPlatformTestRunner):
             center_x, center_y = screen_width // 2, screen_height // 2
             
             self.logger.info(f"移动鼠标到中心 ({center_x}, {center_y})")
-            self.pyautogui.moveTo(center_x, center_y, duration=1)
-            time.sleep(1)
+            self.pyautogui.moveTo(center_x, center_y, duration=self.scaled(1))
+            self.sleep(1)
             
             self.log_test_result(test_name, True, "鼠标操作测试通过")
             return True
@@ -245,6 +456,7 @@ class CrossPlatformTestSuite(CrossPlatformTestRunner):
             self.log_test_result(test_name, False, f"测试失败: {str(e)}")
             return False
     
+    @case(tags=("custom", "screenshot"))
     def test_screenshot(self) -> bool:
         """测试截图功能"""
         self.logger.info("测试截图功能")
@@ -252,10 +464,11 @@ class CrossPlatformTestSuite(CrossPlatformTestRunner):
         
         try:
             screenshot_path = self.config.log_dir / f"screenshot_{time.strftime('%Y%m%d_%H%M%S')}.png"
-            self.pyautogui.screenshot(str(screenshot_path))
+            if not self.save_screenshot(screenshot_path, self.app_region()):
+                self.pyautogui.screenshot(str(screenshot_path))
             self.logger.info(f"截图已保存: {screenshot_path}")
             
-            self.log_test_result(test_name, True, "截图测试通过")
+            self.log_test_result(test_name, True, "截图测试通过", screenshot=screenshot_path.name)
             return True
             
         except Exception as e:
@@ -268,15 +481,34 @@ class CrossPlatformTestSuite(CrossPlatformTestRunner):
         self.logger.info("开始跨平台自定义测试套件")
         self.logger.info("=" * 60)
         
-        self.test_mouse_operations()
-        self.test_screenshot()
+        self.run_cases(tags=("custom",))
         
         self.print_summary()
 
 
-def main():
-    """主函数"""
+def _split_tags(value):
+    return [t.strip() for t in value.split(",") if t.strip()] if value else None
+
+
+def main(argv=None):
+    """主函数：指定标签或测试名时按依赖关系直接运行，否则交互选择测试模式"""
+    parser = argparse.ArgumentParser(description="灵犀·晓伴自动化测试套件")
+    parser.add_argument("--tags", help="只运行带有这些标签的测试（逗号分隔），如 basic,custom,chat")
+    parser.add_argument("--exclude-tags", help="排除带有这些标签的测试（逗号分隔），如 slow")
+    parser.add_argument("--only", help="只运行这些测试（逗号分隔的方法名），前提测试自动加入")
+    parser.add_argument("--workers", type=int, default=None, help="最多同时运行的测试数")
+    parser.add_argument("--order", choices=ORDER_MODES, default=None,
+                        help="测试顺序：failed-first 上次失败和新增的测试优先，fast 耗时短的优先")
+    parser.add_argument("--fail-fast", action="store_true", help="第一个测试失败后跳过其余测试")
+    parser.add_argument("--list", action="store_true", help="列出已注册的测试及其依赖和标签")
+    parser.add_argument("--invalidate-cache", action="store_true", help="清空测试结果缓存，所有测试重新运行")
+    args = parser.parse_args(argv)
+    if (args.exclude_tags or args.order or args.fail_fast) and not (args.tags or args.only):
+        # 未选择测试时会运行全部已注册的测试（包括安装/卸载和基准测试），需要明确指定
+        parser.error("--exclude-tags/--order/--fail-fast 需要配合 --tags 或 --only 指定要运行的测试")
+    
     config = TestConfig()
+    config.result_cache_invalidate = args.invalidate_cache
     
     print("=" * 60)
     print("灵犀·晓伴自动化测试工具 - 测试套件示例")
@@ -284,9 +516,24 @@ def main():
     print(f"当前平台: {config.platform}")
     print("=" * 60)
     
+    runner = SuxiaobanTestSuite(config) if config.platform == "Windows" else CrossPlatformTestSuite(config)
+    
+    if args.list:
+        scheduler = CaseScheduler(runner)
+        for name in scheduler.select():
+            info = scheduler.cases[name]
+            depends = f" 依赖: {', '.join(info.depends)}" if info.depends else ""
+            print(f"{name:<28} [{', '.join(sorted(info.tags))}]{depends}")
+        return
+    
+    if args.tags or args.only:
+        runner.run_cases(tags=_split_tags(args.tags), exclude_tags=_split_tags(args.exclude_tags),
+                         names=_split_tags(args.only), max_workers=args.workers,
+                         order=args.order, fail_fast=args.fail_fast or None)
+        runner.print_summary()
+        return
+    
     if config.platform == "Windows":
-        runner = SuxiaobanTestSuite(config)
-        
         print("\n请选择测试模式:")
         print("1. 基础测试（安装、启动、UI、功能、卸载）")
         print("2. 自定义测试套件（菜单、快捷键、窗口控制等）")
@@ -299,7 +546,7 @@ def main():
         elif choice == "2":
             setup_file = runner.find_setup_file()
             if setup_file:
-                runner.launch_application()
+                # 启动测试作为自定义测试的依赖自动运行
                 runner.run_custom_tests()
                 runner.uninstall_application()
             else:
@@ -310,7 +557,6 @@ def main():
         else:
             print("无效的选择")
     else:
-        runner = CrossPlatformTestSuite(config)
         runner.run_custom_tests()
 
 
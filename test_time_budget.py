@@ -0,0 +1,186 @@
+"""
+测试与步骤的截止时间、套件时间预算
+
+UiaWorker 是执行UIA操作的专用线程，界面测试的每次尝试和其中的步骤都在这一个线程中执行，
+COM对象不跨线程使用。run_with_deadline 为其中的操作施加截止时间：超时后调用恢复回调
+（结束被测应用，让卡住的UIA调用出错返回），等待操作结束后再继续，不会留下仍在操作界面的线程；
+只有恢复后操作仍未结束时才换用新的UIA线程。
+BudgetPlanner 根据历史平均耗时安排测试顺序，并裁掉在总预算内放不下的测试，
+保证定时运行能在固定的维护窗口内结束。
+"""
+
+import threading
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeout
+from queue import SimpleQueue
+from typing import Callable, Dict, List, Optional, Tuple
+
+from test_async_core import _init_uia_thread
+
+_thread_local = threading.local()
+
+
+class StepTimeout(Exception):
+    """测试或步骤超过截止时间"""
+
+
+class UiaWorker(Executor):
+    """执行UIA操作的专用线程，提交的操作按顺序执行
+
+    使用守护线程：换用新线程后仍卡住的旧线程不会阻止进程退出
+    """
+
+    def __init__(self, name: str = "uia"):
+        self.name = name
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._queue = self._start()
+
+    def _start(self) -> SimpleQueue:
+        queue = SimpleQueue()
+        threading.Thread(target=self._serve, args=(queue,), name=f"{self.name}-{self.restarts}", daemon=True).start()
+        return queue
+
+    def _serve(self, queue: SimpleQueue):
+        _thread_local.worker = self
+        _init_uia_thread()
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def on_thread(self) -> bool:
+        """当前线程是否就是该UIA线程"""
+        return getattr(_thread_local, "worker", None) is self
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._queue is None:
+                raise RuntimeError("UIA线程已关闭")
+            self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """在UIA线程中执行并返回结果（已在该线程中时直接执行）"""
+        if self.on_thread():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def restart(self):
+        """当前线程卡住无法恢复时换用新的线程，排队的操作转到新线程，卡住的线程结束后退出"""
+        with self._lock:
+            if self._queue is None:
+                return
+            old = self._queue
+            self.restarts += 1
+            self._queue = self._start()
+            while not old.empty():
+                item = old.get()
+                if item is not None:
+                    self._queue.put(item)
+            old.put(None)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            if self._queue is not None:
+                self._queue.put(None)
+                self._queue = None
+
+
+def _recover(on_timeout: Optional[Callable]):
+    if on_timeout:
+        try:
+            on_timeout()
+        except Exception:
+            pass
+
+
+def run_with_deadline(fn: Callable, timeout: Optional[float], name: str = "", worker: Optional[UiaWorker] = None,
+                      on_timeout: Optional[Callable] = None, grace: float = 10.0):
+    """执行fn，超过timeout秒仍未完成时抛出StepTimeout；timeout为None或0时不限时
+
+    指定worker时fn在该UIA线程中执行（当前已在该线程中时直接执行）。超时后调用on_timeout
+    （如结束被测应用，让卡住的UIA调用出错返回），等fn结束后再抛出StepTimeout；
+    在UIA线程中执行时，on_timeout之后最多再等grace秒，fn仍未结束则换用新的UIA线程
+    """
+    label = name or "步骤"
+    if worker is not None and not worker.on_thread():
+        future = worker.submit(fn)
+        try:
+            return future.result(timeout or None)
+        except FutureTimeout:
+            pass
+        _recover(on_timeout)
+        try:
+            future.result(grace)
+        except FutureTimeout:
+            worker.restart()
+            raise StepTimeout(f"{label} 超过 {timeout:g} 秒未完成，恢复后仍未结束，已换用新的UIA线程")
+        except Exception:
+            pass
+        raise StepTimeout(f"{label} 超过 {timeout:g} 秒未完成，已中止")
+
+    if not timeout:
+        return fn()
+    # 在当前线程中执行，由看门狗定时器在到期时调用on_timeout
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        _recover(on_timeout)
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        value = fn()
+    except Exception:
+        if expired.is_set():
+            raise StepTimeout(f"{label} 超过 {timeout:g} 秒未完成，已中止") from None
+        raise
+    finally:
+        timer.cancel()
+    if expired.is_set():
+        raise StepTimeout(f"{label} 超过 {timeout:g} 秒未完成，已中止")
+    return value
+
+
+class BudgetPlanner:
+    """按历史耗时在总时间预算内安排测试"""
+
+    def __init__(self, budget: float, estimates: Dict[str, float], default_estimate: float = 60.0,
+                 safety_factor: float = 1.2):
+        self.budget = budget                    # 总预算（秒）
+        self.estimates = estimates              # 测试方法名 -> 历史平均耗时（秒）
+        self.default_estimate = default_estimate  # 没有历史数据时的估计耗时
+        self.safety_factor = safety_factor      # 估计值放大系数，为波动留余量
+
+    def estimate(self, test) -> float:
+        name = getattr(test, "__name__", str(test))
+        return self.estimates.get(name, self.default_estimate) * self.safety_factor
+
+    def plan(self, tests: List, pinned: int = 0, key: Optional[Callable] = None) -> Tuple[List, List]:
+        """返回 (按执行顺序排列的测试, 被裁掉的测试)
+
+        前 pinned 个测试（如启动）是其他测试的前提，保持原顺序且总是保留；
+        其余测试按估计耗时从短到长排列（在预算内完成尽可能多的测试），放不下的被裁掉；
+        指定 key 时按 key 的顺序优先保留（如上次失败的测试优先）
+        """
+        head, rest = list(tests[:pinned]), list(tests[pinned:])
+        remaining = self.budget - sum(self.estimate(t) for t in head)
+        ordered, trimmed = head, []
+        for test in sorted(rest, key=key or self.estimate):
+            cost = self.estimate(test)
+            if cost <= remaining:
+                ordered.append(test)
+                remaining -= cost
+            else:
+                trimmed.append(test)
+        return ordered, trimmed
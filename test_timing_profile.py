@@ -0,0 +1,136 @@
+"""
+自适应等待时间校准
+
+测试中界面操作后的等待和轮询（界面切换后等待、控件出现的超时等）是按经验调好的常数。
+会话开始时对应用执行几个参考操作并计时，与基准耗时比较，得到一个连续的缩放系数，
+之后这些界面等待都乘以该系数：界面响应变慢（虚拟机负载高、远程桌面等）时等待更长。
+安装、启动、模型回复等与界面响应速度无关的超时不缩放。
+
+基准耗时来自实测，不使用估计的常数：
+  - 默认为本机第一次校准时测得的耗时（按主机名保存在 timing_profile.json 的 baseline 中），
+    之后的系数反映本机相对当时的快慢
+  - 也可以把调好等待常数的那台机器的 baseline 复制到配置 timing_reference_seconds，
+    所有机器都与它比较
+校准结果按主机名保存，下次运行直接复用（超过有效期后重新校准，基准保留）。
+"""
+
+import json
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# 缩放系数的分档（仅用于显示）
+PROFILE_LABELS = ((0.6, "fast"), (1.25, "normal"), (float("inf"), "slow"))
+
+
+
+class TimingProfile:
+    """等待时间缩放配置"""
+
+    def __init__(self, factor: float = 1.0, measured: Optional[Dict[str, float]] = None,
+                 host: Optional[str] = None, created: Optional[float] = None,
+                 min_factor: float = 0.25, max_factor: float = 4.0, baseline: Optional[Dict[str, float]] = None):
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.factor = min(max(factor, min_factor), max_factor)
+        self.measured = measured or {}      # 参考操作名 -> 实测耗时与基准耗时之比
+        self.baseline = baseline or {}      # 参考操作名 -> 计算系数所用的基准耗时（秒）
+        self.host = host or platform.node()
+        self.created = created or time.time()
+
+    @property
+    def label(self) -> str:
+        return next(label for bound, label in PROFILE_LABELS if self.factor < bound)
+
+    def scale(self, seconds: float) -> float:
+        """按系数缩放一个等待时间或超时（秒）"""
+        return seconds * self.factor
+
+    def to_dict(self) -> Dict:
+        return {"factor": round(self.factor, 3), "label": self.label, "measured": self.measured,
+                "baseline": self.baseline, "host": self.host, "created": self.created}
+
+    @classmethod
+    def from_dict(cls, data: Dict, min_factor: float = 0.25, max_factor: float = 4.0) -> "TimingProfile":
+        return cls(data.get("factor", 1.0), data.get("measured"), data.get("host"), data.get("created"),
+                   min_factor=min_factor, max_factor=max_factor, baseline=data.get("baseline"))
+
+
+def measure(action: Callable[[], object], repeats: int = 5) -> float:
+    """重复执行参考操作，返回耗时中位数（秒）；首次执行作为预热不计入"""
+    action()
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def calibrate(probes: Dict[str, Callable[[], object]], reference: Optional[Dict[str, float]] = None,
+              repeats: int = 5, min_factor: float = 0.25, max_factor: float = 4.0, logger=None) -> TimingProfile:
+    """执行参考操作并生成配置
+
+    probes: 操作名 -> 操作；reference: 操作名 -> 基准耗时（秒）。缩放系数取各操作实测/基准比值的中位数，
+    单个操作的偶发抖动不会影响结果；还没有基准的操作以本次实测值作为基准（比值记为1），
+    出错的操作被忽略，全部出错时系数为1且 baseline 为空
+    """
+    reference = dict(reference or {})
+    baseline = {}
+    ratios = {}
+    for name, action in probes.items():
+        try:
+            seconds = measure(action, repeats)
+        except Exception as e:
+            if logger:
+                logger.warning(f"校准操作 {name} 失败: {e}")
+            continue
+        baseline[name] = reference.get(name) or round(seconds, 6)
+        if reference.get(name):
+            ratios[name] = round(seconds / reference[name], 3)
+    factor = statistics.median(ratios.values()) if ratios else 1.0
+    return TimingProfile(factor, ratios, min_factor=min_factor, max_factor=max_factor, baseline=baseline)
+
+
+def load_profile(path: Path, host: Optional[str] = None, max_age_days: float = 7.0,
+                 min_factor: float = 0.25, max_factor: float = 4.0) -> Optional[TimingProfile]:
+    """读取本机保存的配置，不存在或已过期时返回None"""
+    host = host or platform.node()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f).get(host)
+    except (OSError, ValueError):
+        return None
+    if not data or time.time() - data.get("created", 0) > max_age_days * 86400:
+        return None
+    return TimingProfile.from_dict(data, min_factor=min_factor, max_factor=max_factor)
+
+
+def load_baseline(path: Path, host: Optional[str] = None) -> Dict[str, float]:
+    """本机保存的基准耗时（不受有效期限制），没有时为空"""
+    host = host or platform.node()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f).get(host) or {}
+    except (OSError, ValueError, AttributeError):
+        return {}
+    return data.get("baseline") or {}
+
+
+def save_profile(path: Path, profile: TimingProfile):
+    """按主机名保存配置（同一文件中可以有多台机器的配置）"""
+    path = Path(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        profiles = {}
+    profiles[profile.host] = profile.to_dict()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,261 @@
+"""
+多个虚拟显示上并行运行跨平台测试（Linux）
+
+CrossPlatformTestRunner 通过PyAutoGUI操作真实屏幕，一台机器同时只能运行一个测试套件。
+本模块启动K个无头虚拟显示（Xvfb），在每个显示上启动一个应用实例，并为每个显示启动一个
+独立的测试进程（各自的 DISPLAY、运行目录、日志和截图）：
+  - 每个显示使用 Xvfb -displayfd 自动选择空闲的显示号，就绪后才继续，不需要猜测等待时间
+  - 应用实例使用各自的 XDG_CONFIG_HOME，互不影响（Electron的单实例锁和用户数据都按该目录区分）
+  - 测试进程作为工作进程连接本机的分布式协调器（test_distributed），按历史耗时分配并互相窃取任务，
+    结果和截图合并到本次运行目录中的报告里
+吞吐量随CPU核数增长，而不是受限于一块屏幕。
+
+用法:
+    python test_virtual_displays.py --displays 4 --tags custom
+"""
+
+import os
+import sys
+import time
+import select
+import shutil
+import signal
+import secrets
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from test_automation_daemon import TOKEN_ENV
+from test_distributed import Coordinator, DistributedWorker, distributable_tests
+
+
+class VirtualDisplay:
+    """一个Xvfb虚拟显示"""
+
+    def __init__(self, size: str = "1280x800x24", xvfb: str = "Xvfb"):
+        self.size = size
+        self.xvfb = xvfb
+        self.number = None
+        self.process = None
+
+    @property
+    def name(self) -> str:
+        return f":{self.number}"
+
+    def start(self, timeout: float = 10.0) -> str:
+        """启动Xvfb，等待它通过 -displayfd 报告显示号（即已可以接受连接），返回 DISPLAY 值"""
+        read_fd, write_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                [self.xvfb, "-displayfd", str(write_fd), "-screen", "0", self.size, "-nolisten", "tcp"],
+                pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            os.close(write_fd)
+            write_fd = None
+            data = b""
+            deadline = time.monotonic() + timeout
+            while not data.endswith(b"\n"):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                    raise TimeoutError(f"Xvfb 在 {timeout:g}s 内没有就绪")
+                chunk = os.read(read_fd, 16)
+                if not chunk:
+                    raise RuntimeError(f"Xvfb 启动失败（退出码 {self.process.poll()}）")
+                data += chunk
+            self.number = int(data.strip())
+            return self.name
+        except Exception:
+            self.stop()
+            raise
+        finally:
+            os.close(read_fd)
+            if write_fd is not None:
+                os.close(write_fd)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+def default_display_count() -> int:
+    """默认按CPU核数：每个显示上的应用和测试进程大约占用两个核"""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def app_command(config) -> Optional[List[str]]:
+    """在虚拟显示上启动应用的命令"""
+    command = config.virtual_display_app_command
+    if command:
+        return command.split() if isinstance(command, str) else list(command)
+    exe = Path(config.install_dir) / config.suxiaoban_exe
+    return [str(exe)] if exe.exists() else None
+
+
+def _stop_process(process: Optional[subprocess.Popen], timeout: float = 5.0):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _stop_process_group(process: Optional[subprocess.Popen], timeout: float = 5.0):
+    """结束以 start_new_session=True 启动的进程所在的整个进程组（Electron的子进程不会随主进程退出）
+
+    组长已经退出时进程组中可能还留有子进程，所以不根据 poll() 判断
+    """
+    if process is None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        process.poll()
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        process.poll()
+        try:
+            os.killpg(process.pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.1)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def run_parallel(config, count: Optional[int] = None, tags: Optional[List[str]] = None,
+                 timeout: Optional[float] = None) -> Dict:
+    """在 count 个虚拟显示上并行运行测试，返回协调器汇总；合并报告写入 config.log_dir"""
+    from test_suxiaoban_suite import CrossPlatformTestSuite
+
+    logger = config.logger
+    if not shutil.which("Xvfb"):
+        raise RuntimeError("未找到Xvfb，请先安装（如 apt install xvfb）")
+    command = app_command(config)
+    if not command:
+        raise RuntimeError(f"未找到应用可执行文件，请设置 virtual_display_app_command（安装目录: {config.install_dir}）")
+    count = count or config.virtual_display_count or default_display_count()
+
+    displays, apps, workers = [], [], []
+    coordinator = None
+    try:
+        for _ in range(count):
+            display = VirtualDisplay(config.virtual_display_size)
+            display.start()
+            displays.append(display)
+        logger.info(f"已启动 {count} 个虚拟显示: {', '.join(d.name for d in displays)}")
+
+        # PyAutoGUI导入时连接 DISPLAY，本进程只用第一个显示创建运行器来选择测试和读取历史耗时
+        os.environ["DISPLAY"] = displays[0].name
+        runner = CrossPlatformTestSuite(config)
+        tests = distributable_tests(runner, tags)
+        token = secrets.token_hex(16)
+        coordinator = Coordinator(tests, host="127.0.0.1", port=0, token=token,
+                                  estimates=runner.history_estimates(), output_dir=config.log_dir, logger=logger)
+        coordinator.start()
+        _, port = coordinator.address
+
+        for display in displays:
+            display_dir = config.log_dir / f"display_{display.number}"
+            display_dir.mkdir(parents=True, exist_ok=True)
+            env = dict(os.environ, DISPLAY=display.name, XDG_CONFIG_HOME=str(display_dir / "config"))
+            with open(display_dir / "app.log", "wb") as app_log:
+                app = subprocess.Popen(command, env=env, stdout=app_log, stderr=subprocess.STDOUT,
+                                       start_new_session=True)
+            apps.append(app)
+            env[TOKEN_ENV] = token
+            with open(display_dir / "worker.log", "wb") as worker_log:
+                workers.append(subprocess.Popen(
+                    [sys.executable, str(Path(__file__).resolve()), "worker", "--port", str(port),
+                     "--name", f"display-{display.number}", "--log-dir", str(display_dir / "run"),
+                     "--app-pid", str(app.pid)],
+                    env=env, cwd=str(config.test_dir), stdout=worker_log, stderr=subprocess.STDOUT))
+            logger.info(f"{display.name}: 应用 PID {app.pid}，测试进程 PID {workers[-1].pid}，运行目录 {display_dir}")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not coordinator.wait(1.0):
+            if all(w.poll() is not None for w in workers):
+                coordinator.fail_unfinished("所有测试进程都已退出，任务未完成")
+            elif deadline is not None and time.monotonic() >= deadline:
+                coordinator.fail_unfinished("并行运行超时，任务未完成")
+        for worker in workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        coordinator.write_report()
+        return coordinator.summary()
+    finally:
+        if coordinator is not None:
+            coordinator.shutdown()
+        for process in workers:
+            _stop_process(process)
+        for app in apps:
+            _stop_process_group(app)
+        for display in displays:
+            display.stop()
+
+
+def _worker(args) -> int:
+    """单个显示上的测试进程（由 run_parallel 启动）"""
+    from test_suxiaoban import TestConfig
+    from test_suxiaoban_suite import CrossPlatformTestSuite
+
+    config = TestConfig(log_dir=Path(args.log_dir))
+    config.app_pid = args.app_pid
+    runner = CrossPlatformTestSuite(config)
+    worker = DistributedWorker(runner, "127.0.0.1", args.port, args.name, os.environ.get(TOKEN_ENV))
+    executed = worker.serve()
+    runner.journal.flush(fsync=True)
+    runner.logger.info(f"{args.name}: 执行了 {executed} 个任务")
+    return 0
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="在多个虚拟显示上并行运行跨平台测试")
+    parser.add_argument("command", nargs="?", choices=("run", "worker"), default="run")
+    parser.add_argument("--displays", type=int, default=None, help="虚拟显示数量（默认按CPU核数）")
+    parser.add_argument("--tags", help="只运行带有这些标签的测试（逗号分隔）")
+    parser.add_argument("--timeout", type=float, default=None, help="整次运行的超时（秒）")
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--name", help=argparse.SUPPRESS)
+    parser.add_argument("--log-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--app-pid", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        return _worker(args)
+
+    from test_suxiaoban import TestConfig
+
+    if sys.platform == "win32":
+        print("虚拟显示并行运行只支持Linux（Xvfb）")
+        return 2
+    config = TestConfig()
+    tags = [t.strip() for t in args.tags.split(",") if t.strip()] if args.tags else None
+    try:
+        summary = run_parallel(config, args.displays, tags, args.timeout)
+    except RuntimeError as e:
+        config.logger.error(str(e))
+        return 2
+    config.logger.info(f"共 {summary['jobs']} 个任务，通过 {summary['passed']}，失败 {summary['failed']}，"
+                       f"用时 {summary['elapsed']:.1f}s")
+    for name, w in summary["workers"].items():
+        config.logger.info(f"  {name}: 完成 {w['completed']} 个，窃取 {w['stolen']} 个")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+窗口探测辅助函数
+
+不依赖UIA，直接通过Win32 API枚举进程的顶层窗口、探测窗口是否响应消息，
+开销在毫秒级以下，适合高频轮询（启动计时、卡顿检测等）。
+非Windows平台使用 xdotool（如已安装）枚举窗口，无法探测响应性时视为响应。
+"""
+
+import sys
+import time
+import shutil
+import subprocess
+from typing import Iterable, List, Optional, Tuple
+
+WM_NULL = 0x0000
+SMTO_ABORTIFHUNG = 0x0002
+
+# (窗口句柄, 宽, 高)
+WindowInfo = Tuple[int, int, int]
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    _user32 = ctypes.WinDLL("user32", use_last_error=True)
+    _WNDENUMPROC = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    _user32.SendMessageTimeoutW.argtypes = [
+        wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM,
+        wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_size_t)
+    ]
+    _user32.SendMessageTimeoutW.restype = ctypes.c_size_t
+
+
+def enum_process_windows(pids: Iterable[int]) -> List[WindowInfo]:
+    """枚举属于指定进程的可见顶层窗口"""
+    pids = set(pids)
+    if sys.platform == "win32":
+        windows = []
+
+        def callback(hwnd, lparam):
+            if _user32.IsWindowVisible(hwnd):
+                pid = wintypes.DWORD()
+                _user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+                if pid.value in pids:
+                    rect = wintypes.RECT()
+                    _user32.GetWindowRect(hwnd, ctypes.byref(rect))
+                    windows.append((hwnd, rect.right - rect.left, rect.bottom - rect.top))
+            return True
+
+        _user32.EnumWindows(_WNDENUMPROC(callback), 0)
+        return windows
+
+    if shutil.which("xdotool"):
+        windows = []
+        for pid in pids:
+            out = subprocess.run(["xdotool", "search", "--onlyvisible", "--pid", str(pid)],
+                                 capture_output=True, text=True).stdout
+            windows += [(int(w), 0, 0) for w in out.split()]
+        return windows
+    return []
+
+
+def find_main_window(pids: Iterable[int], min_width: int = 400, min_height: int = 300) -> Optional[int]:
+    """按与 _find_and_connect_window 相同的规则选择主窗口：尺寸足够大的窗口中面积最大者"""
+    best, best_area = None, 0
+    for hwnd, width, height in enum_process_windows(pids):
+        # 非Windows平台拿不到尺寸，第一个可见窗口即视为主窗口
+        if (width == 0 and height == 0) or (width > min_width and height > min_height):
+            if best is None or width * height > best_area:
+                best, best_area = hwnd, width * height
+    return best
+
+
+def is_window_responsive(hwnd: int, timeout_ms: int = 100) -> Tuple[bool, float]:
+    """向窗口发送 WM_NULL 并等待处理完成，返回 (是否响应, 耗时秒数)
+
+    UI线程卡住时 SendMessageTimeout 在超时后返回0。
+    """
+    start = time.perf_counter()
+    if sys.platform != "win32":
+        return True, 0.0
+    result = ctypes.c_size_t()
+    ok = _user32.SendMessageTimeoutW(hwnd, WM_NULL, 0, 0, SMTO_ABORTIFHUNG, timeout_ms, ctypes.byref(result))
+    return bool(ok), time.perf_counter() - start
+
+
+def get_window_rect(hwnd: int) -> Optional[Tuple[int, int, int, int]]:
+    """返回窗口屏幕坐标 (left, top, right, bottom)，失败返回None"""
+    if sys.platform != "win32":
+        return None
+    rect = wintypes.RECT()
+    if not _user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+        return None
+    return rect.left, rect.top, rect.right, rect.bottom
+
+
+def is_window(hwnd: int) -> bool:
+    """窗口句柄是否仍然有效（窗口已关闭时返回False）"""
+    if sys.platform != "win32":
+        return True
+    return bool(_user32.IsWindow(hwnd))